@@ -0,0 +1,1203 @@
+"""Offline benchmarks for yt-music-enhanced-iv.py.
+
+Nothing here touches YouTube or a real mpv:
+
+* a local HTTP server plays YouTube's part. It answers paged search requests and per-video
+  metadata as JSON, and serves a generated WAV file (with Range support) as the audio stream,
+  optionally behind an artificial round-trip latency and bandwidth cap;
+* yt-dlp talks to it through two stand-in extractors (`ytsearch…:` and `youtube.com/watch?v=`)
+  that replace the real ones in every YoutubeDL instance the app's extractor pool creates;
+* a fake `mpv` executable speaks the JSON IPC protocol (loadfile, playlists, observed
+  properties, playback events) and reads the first chunk of each loaded URL before it reports
+  audio, like a real player probing the stream.
+
+The startup scenario runs the app under `-X importtime` and fails the run when its imports go
+over the budget, or when yt_dlp gets imported before anything needs the network.
+
+Each scenario runs a fixed number of rounds against a throwaway HOME, so caches, archive and
+downloads start empty. The results are appended to benchmark-results.jsonl together with the
+git revision, and every run is compared with the latest earlier run that used the same settings.
+
+    python yt-music-benchmark.py
+    python yt-music-benchmark.py --rounds 10 --latency-ms 50 --scenarios search,resolve
+    python yt-music-benchmark.py --fail-on-regression --threshold 0.25
+"""
+import argparse
+import array
+import asyncio
+import base64
+import contextlib
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# --- Configuration ---
+APP_SCRIPT = Path(__file__).with_name("yt-music-enhanced-iv.py")
+RESULTS_PATH = Path(__file__).with_name("benchmark-results.jsonl")
+SCENARIOS = ("startup", "search", "enrich", "resolve", "proxy", "playlist", "download_single", "download_batch", "download_pipelined", "download_resume", "dashboard", "engine", "daemon", "cold_start", "stream", "track_switch", "replay")
+DEFAULT_ROUNDS = 5
+WARMUP_ROUNDS = 1
+SEARCH_PAGE_SIZE = 20  # entries per fake search response, like YouTube's continuation pages
+SEARCH_TOTAL_RESULTS = 200
+PLAYLIST_PAGE_SIZE = 100  # entries per fake playlist continuation, like YouTube's
+PLAYLIST_SIZE = 2000
+AUDIO_SAMPLE_RATE = 22050
+AUDIO_SECONDS = 30
+STREAM_SPEED = 10.0  # playback speed the headless stream scenario fast-forwards its track at
+BATCH_SIZE = 8
+RESUME_CHUNK_SIZE = 128 * 1024  # range chunk size in the resume scenario, ~10 chunks for the default fixture track
+DASHBOARD_JOBS = 50  # running downloads on the dashboard in the dashboard scenario
+DASHBOARD_FRAMES = 20
+ENGINE_SEARCHES = 8  # cold searches the engine scenario runs at the same time
+MPV_PROBE_BYTES = 64 * 1024  # how much of a stream the fake mpv reads before it reports audio
+REGRESSION_THRESHOLD = 0.20  # a scenario regresses when its median grows by more than this fraction
+REGRESSION_MIN_MS = 2.0  # ...and by at least this many milliseconds, so sub-ms noise never counts
+STARTUP_IMPORT_BUDGET_MS = 200  # summed top-level import time of the app, as reported by -X importtime
+STARTUP_FORBIDDEN_IMPORTS = ("yt_dlp",)  # must stay lazy until a network action needs them
+
+
+# --- Fixture Server ---
+def fixture_video_id(*parts):
+    """A stable, YouTube-shaped 11 character id for the given parts."""
+    digest = hashlib.sha1("\0".join(map(str, parts)).encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")[:11]
+
+
+def build_fixture_wav(seconds=AUDIO_SECONDS, sample_rate=AUDIO_SAMPLE_RATE):
+    """A mono 16-bit 440 Hz tone, so transcoding has real samples to chew on."""
+    period = array.array("h", (int(12000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(sample_rate)))
+    samples = (period * seconds).tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples)
+    return buffer.getvalue()
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hang up mid-response on purpose (seeks, cancelled downloads); anything else is still reported
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """Local HTTP stand-in for YouTube search, watch pages and googlevideo audio streams.
+
+    GET /api/search?q=…&page=N  -> {"entries": [{"id", "title", "uploader", "duration"}], "has_more"}
+    GET /api/playlist?list=…&page=N -> {"title", "entries": [...], "has_more"}
+    GET /api/video/<id>         -> metadata plus "audio_url"
+    GET /audio/<id>.wav         -> the fixture WAV, honouring Range requests
+    """
+
+    def __init__(self, audio_bytes, latency_ms=0.0, bandwidth_kib=0, total_results=SEARCH_TOTAL_RESULTS):
+        self.audio_bytes = audio_bytes
+        self.latency = latency_ms / 1000
+        self.bandwidth = bandwidth_kib * 1024
+        self.total_results = total_results
+        self.duration = max(1, round((len(audio_bytes) - 44) / 2 / AUDIO_SAMPLE_RATE))
+        self.requests = 0
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fixture.requests += 1
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                url = urlparse(self.path)
+                try:
+                    if url.path == "/api/search":
+                        query = parse_qs(url.query)
+                        self._send_json(fixture.search_page(query.get("q", [""])[0], int(query.get("page", ["0"])[0])))
+                    elif url.path == "/api/playlist":
+                        query = parse_qs(url.query)
+                        self._send_json(fixture.playlist_page(query.get("list", [""])[0], int(query.get("page", ["0"])[0])))
+                    elif url.path.startswith("/api/video/"):
+                        self._send_json(fixture.video(url.path.rsplit("/", 1)[-1]))
+                    elif url.path.startswith("/audio/"):
+                        self._send_audio()
+                    else:
+                        self.send_error(404)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_audio(self):
+                data = fixture.audio_bytes
+                start, end = 0, len(data) - 1
+                range_header = self.headers.get("Range", "")
+                if range_header.startswith("bytes="):
+                    first, _, last = range_header[6:].split(",")[0].partition("-")
+                    start = int(first) if first else max(0, len(data) - int(last))
+                    end = min(int(last), len(data) - 1) if first and last else end
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "audio/wav")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                chunk_size = 64 * 1024
+                for offset in range(start, end + 1, chunk_size):
+                    chunk = data[offset:min(offset + chunk_size, end + 1)]
+                    self.wfile.write(chunk)
+                    if fixture.bandwidth:
+                        time.sleep(len(chunk) / fixture.bandwidth)
+
+        self.httpd = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fixture-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def search_page(self, query, page):
+        first = page * SEARCH_PAGE_SIZE
+        last = min(first + SEARCH_PAGE_SIZE, self.total_results)
+        return {
+            "entries": [{"id": fixture_video_id(query, i), "title": f"{query} — fixture track {i + 1}",
+                         "uploader": "Fixture Channel", "duration": self.duration} for i in range(first, last)],
+            "has_more": last < self.total_results,
+        }
+
+    def playlist_page(self, list_id, page):
+        first = page * PLAYLIST_PAGE_SIZE
+        last = min(first + PLAYLIST_PAGE_SIZE, PLAYLIST_SIZE)
+        return {
+            "title": f"Fixture playlist {list_id}",
+            "entries": [{"id": fixture_video_id("playlist", list_id, i), "title": f"Fixture playlist track {i + 1}",
+                         "uploader": "Fixture Channel", "duration": self.duration} for i in range(first, last)],
+            "has_more": last < PLAYLIST_SIZE,
+        }
+
+    def video(self, video_id):
+        return {
+            "id": video_id, "title": f"Fixture track {video_id}", "uploader": "Fixture Channel",
+            "duration": self.duration, "view_count": 1000,
+            # Shaped like a googlevideo URL, so the stream URL cache reads its expiry the same way
+            "audio_url": f"{self.base_url}/audio/{video_id}.wav?expire={int(time.time()) + 6 * 60 * 60}",
+            "filesize": len(self.audio_bytes),
+        }
+
+
+def build_fixture_extractors(base_url):
+    """yt-dlp extractors that answer `ytsearch…:`, YouTube watch and playlist URLs from the fixture server."""
+    from yt_dlp.extractor.common import InfoExtractor, SearchInfoExtractor
+
+    class FixtureYoutubeIE(InfoExtractor):
+        IE_NAME = "youtube"
+        _VALID_URL = r"https?://(?:www\.)?youtube\.com/watch\?v=(?P<id>[0-9A-Za-z_-]{11})"
+
+        def _real_extract(self, url):
+            video_id = self._match_id(url)
+            data = self._download_json(f"{base_url}/api/video/{video_id}", video_id, note=False)
+            return {
+                "id": video_id,
+                "title": data["title"],
+                "uploader": data["uploader"],
+                "channel": data["uploader"],
+                "duration": data["duration"],
+                "view_count": data["view_count"],
+                "webpage_url": url,
+                "formats": [{
+                    "format_id": "wav", "url": data["audio_url"], "ext": "wav",
+                    "acodec": "pcm_s16le", "vcodec": "none", "filesize": data["filesize"],
+                    "asr": AUDIO_SAMPLE_RATE, "audio_channels": 1,
+                }],
+            }
+
+    class FixtureYoutubeSearchIE(SearchInfoExtractor):
+        IE_NAME = "youtube:search"
+        _SEARCH_KEY = "ytsearch"
+
+        def _search_results(self, query):
+            for page in itertools.count():
+                data = self._download_json(f"{base_url}/api/search", query, note=False,
+                                           query={"q": query, "page": page})
+                for entry in data["entries"]:
+                    yield self.url_result(f"https://www.youtube.com/watch?v={entry['id']}", FixtureYoutubeIE.ie_key(),
+                                          entry["id"], entry["title"], duration=entry["duration"],
+                                          uploader=entry["uploader"])
+                if not data["has_more"]:
+                    return
+
+    class FixtureYoutubePlaylistIE(InfoExtractor):
+        IE_NAME = "youtube:tab"
+        _VALID_URL = r"https?://(?:www\.)?youtube\.com/playlist\?list=(?P<id>[0-9A-Za-z_-]+)"
+
+        def _real_extract(self, url):
+            list_id = self._match_id(url)
+            first_page = self._download_json(f"{base_url}/api/playlist", list_id, note=False, query={"list": list_id, "page": 0})
+
+            def entries():
+                # Continuation pages are fetched only as the consumer gets to them, like the real extractor
+                data = first_page
+                for page in itertools.count(1):
+                    for entry in data["entries"]:
+                        yield self.url_result(f"https://www.youtube.com/watch?v={entry['id']}", FixtureYoutubeIE.ie_key(),
+                                              entry["id"], entry["title"], duration=entry["duration"],
+                                              uploader=entry["uploader"])
+                    if not data["has_more"]:
+                        return
+                    data = self._download_json(f"{base_url}/api/playlist", list_id, note=False, query={"list": list_id, "page": page})
+
+            return self.playlist_result(entries(), list_id, first_page["title"])
+
+    return [FixtureYoutubeSearchIE, FixtureYoutubePlaylistIE, FixtureYoutubeIE]
+
+
+# --- Fake mpv ---
+def parse_mpv_options(text):
+    """Parses loadfile's per-file option list, including mpv's %n% length-prefixed values."""
+    data, options, i = text.encode("utf-8"), {}, 0
+    while i < len(data):
+        key_end = data.index(b"=", i)
+        key, i = data[i:key_end].decode("utf-8"), key_end + 1
+        quoted = re.match(rb"%(\d+)%", data[i:])
+        if quoted:
+            value_start = i + quoted.end()
+            value_end = value_start + int(quoted.group(1))
+        else:
+            value_start = i
+            value_end = data.find(b",", i) if data.find(b",", i) >= 0 else len(data)
+        options[key] = data[value_start:value_end].decode("utf-8")
+        i = value_end + 1
+    return options
+
+
+def run_fake_mpv(argv):
+    """Entry point of the fake mpv: a JSON IPC server on --input-ipc-server with just enough of
+    mpv's behaviour for the app's player code. It keeps a playlist with entry ids and emits
+    observed property changes and playback events. Tracks "play" for their real length divided by
+    the `speed` property and then advance. The per-file `stream-record` option is honoured."""
+    ipc_path = next(arg.split("=", 1)[1] for arg in argv if arg.startswith("--input-ipc-server="))
+    state = {"playlist-pos": -1, "idle-active": True, "pause": False, "volume": 100.0, "speed": 1.0,
+             "time-pos": None, "duration": None}
+    playlist = []  # {"id", "url", "options"}
+    entry_ids = itertools.count(1)
+    observers = []  # (writer, observe id, property name)
+    writers = []
+    lock = threading.RLock()
+    play_generation = itertools.count(1)
+    current = {"generation": 0, "entry": None}
+
+    def send(writer, message):
+        try:
+            with lock:
+                writer.write((json.dumps(message) + "\n").encode("utf-8"))
+                writer.flush()
+        except (OSError, ValueError):
+            pass
+
+    def broadcast(message):
+        for writer in list(writers):
+            send(writer, message)
+
+    def set_state(name, value):
+        with lock:
+            state[name] = value
+            for writer, observe_id, observed_name in list(observers):
+                if observed_name == name:
+                    send(writer, {"event": "property-change", "id": observe_id, "name": name, "data": value})
+
+    def end_current(reason):
+        if current["entry"] is not None:
+            broadcast({"event": "end-file", "reason": reason, "playlist_entry_id": current["entry"]["id"]})
+            current["entry"] = None
+
+    def start_playback(position):
+        with lock:
+            end_current("stop")
+            generation = next(play_generation)
+            current["generation"] = generation
+            entry = current["entry"] = playlist[position]
+        set_state("playlist-pos", position)
+        set_state("idle-active", False)
+        broadcast({"event": "start-file", "playlist_entry_id": entry["id"]})
+        threading.Thread(target=play, args=(entry, generation), daemon=True).start()
+
+    def play(entry, generation):
+        url, record_path = entry["url"], entry["options"].get("stream-record")
+        # Like mpv opening the demuxer: the first bytes of the stream must arrive before audio starts
+        try:
+            if url.startswith("http"):
+                headers = {} if record_path else {"Range": f"bytes=0-{MPV_PROBE_BYTES - 1}"}
+                response = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=10)
+                total = int(response.headers.get("Content-Range", "/0").rsplit("/", 1)[-1] or 0) or int(response.headers.get("Content-Length", 0))
+                received = [response.read(MPV_PROBE_BYTES)]
+            else:
+                total = os.path.getsize(url)
+                response, received = None, []
+        except (OSError, ValueError):
+            with lock:
+                if current["generation"] == generation:
+                    end_current("error")
+            return
+        if current["generation"] != generation:
+            return
+        duration = max(0.0, (total - 44) / 2 / AUDIO_SAMPLE_RATE)
+        broadcast({"event": "file-loaded"})
+        set_state("duration", duration)
+        set_state("time-pos", 0.0)
+        broadcast({"event": "audio-reconfig"})
+        broadcast({"event": "playback-restart"})
+        try:
+            if response is not None and record_path:
+                received.append(response.read())
+        except OSError:
+            record_path = None
+        finally:
+            if response is not None:
+                response.close()
+        position = 0.0
+        while position < duration:
+            time.sleep(0.01)
+            if current["generation"] != generation:
+                return
+            if not state["pause"]:
+                position += 0.01 * float(state["speed"] or 1.0)
+        if record_path:
+            with contextlib.suppress(OSError), open(record_path, "wb") as record_file:
+                record_file.write(b"".join(received))
+        with lock:
+            if current["generation"] != generation:
+                return
+            end_current("eof")
+            index = next((i for i, candidate in enumerate(playlist) if candidate is entry), -1)
+            if 0 <= index < len(playlist) - 1:
+                start_playback(index + 1)
+            else:
+                stop_playback(reason=None)
+
+    def stop_playback(reason="stop"):
+        with lock:
+            current["generation"] = next(play_generation)
+            if reason:
+                end_current(reason)
+            playlist.clear()
+        set_state("playlist-pos", -1)
+        set_state("idle-active", True)
+        broadcast({"event": "idle"})
+
+    def execute(command):
+        name, args = command[0], command[1:]
+        if name == "get_property":
+            if args[0] == "command-list":
+                return [{"name": "loadfile", "args": [{"name": "url"}, {"name": "flags"}, {"name": "index"}, {"name": "options"}]}]
+            if args[0] == "playlist-count":
+                return len(playlist)
+            return state.get(args[0])
+        if name == "set_property":
+            set_state(args[0], args[1])
+            return None
+        if name == "loadfile":
+            url, mode = args[0], (args[1] if len(args) > 1 else "replace")
+            entry = {"id": next(entry_ids), "url": url, "options": parse_mpv_options(args[-1]) if len(args) > 2 else {}}
+            with lock:
+                if mode == "replace":
+                    playlist[:] = [entry]
+                    start_playback(0)
+                else:
+                    playlist.append(entry)
+                    if mode == "append-play" and state["idle-active"]:
+                        start_playback(len(playlist) - 1)
+            return {"playlist_entry_id": entry["id"]}
+        if name == "playlist-next":
+            with lock:
+                position = state["playlist-pos"] + 1
+                if position >= len(playlist):
+                    if args and args[0] == "weak":
+                        raise LookupError("no next entry")
+                    stop_playback()
+                else:
+                    start_playback(position)
+            return None
+        if name == "playlist-clear":
+            with lock:
+                playing = current["entry"]
+                playlist[:] = [playing] if playing is not None else []
+                if playing is not None:
+                    set_state("playlist-pos", 0)
+            return None
+        if name == "stop":
+            stop_playback()
+            return None
+        if name == "seek":
+            broadcast({"event": "seek"})
+            broadcast({"event": "playback-restart"})
+            return None
+        if name in ("cycle", "add", "show-text"):
+            return None
+        raise LookupError(f"unsupported command {name}")
+
+    def serve(connection):
+        reader = connection.makefile("rb")
+        writer = connection.makefile("wb")
+        with lock:
+            writers.append(writer)
+        for line in reader:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            command, request_id = message.get("command", []), message.get("request_id", 0)
+            if command and command[0] == "observe_property":
+                with lock:
+                    observers.append((writer, command[1], command[2]))
+                send(writer, {"error": "success", "data": None, "request_id": request_id})
+                send(writer, {"event": "property-change", "id": command[1], "name": command[2], "data": state.get(command[2])})
+                continue
+            if command and command[0] == "quit":
+                send(writer, {"error": "success", "data": None, "request_id": request_id})
+                os._exit(0)
+            try:
+                reply = {"error": "success", "data": execute(command), "request_id": request_id}
+            except (LookupError, IndexError) as e:
+                reply = {"error": str(e) or "error running command", "request_id": request_id}
+            send(writer, reply)
+        with lock:
+            writers.remove(writer)
+            observers[:] = [observer for observer in observers if observer[0] is not writer]
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(ipc_path)
+    server.bind(ipc_path)
+    server.listen(4)
+    while True:
+        connection, _ = server.accept()
+        threading.Thread(target=serve, args=(connection,), daemon=True).start()
+
+
+def install_fake_mpv(bin_dir):
+    """Puts an `mpv` wrapper that runs run_fake_mpv() first on PATH."""
+    wrapper = Path(bin_dir) / "mpv"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" fake-mpv "$@"\n', encoding="utf-8")
+    wrapper.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+
+
+# --- Harness ---
+def load_app(home_dir, base_url):
+    """Imports the app with HOME pointed at home_dir and its extractor pool wired to the fixtures."""
+    os.environ["HOME"] = os.environ["USERPROFILE"] = str(home_dir)
+    spec = importlib.util.spec_from_file_location("yt_music_app", APP_SCRIPT)
+    app = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = app
+    spec.loader.exec_module(app)
+    app.console = Console(file=io.StringIO())
+    extractors = build_fixture_extractors(base_url)
+
+    def new_fixture_ydl(ydl_opts):
+        # auto_init=False skips the real extractors, so only the fixture ones can match
+        ydl = app.yt_dlp.YoutubeDL(dict(ydl_opts), auto_init=False)
+        for extractor in extractors:
+            ydl.add_info_extractor(extractor())
+        return ydl
+
+    app.ydl_pool._new_instance = new_fixture_ydl
+    return app
+
+
+def strip_postprocessors(app):
+    """Without ffmpeg, downloads are measured up to the raw file (no MP3 conversion)."""
+    build_download_opts = app.build_download_opts
+    app.build_download_opts = lambda download_type: {**build_download_opts(download_type), 'postprocessors': []}
+
+
+class Benchmark:
+    def __init__(self, app, rounds, warmup, batch_size, transcode, startup_budget_ms=STARTUP_IMPORT_BUDGET_MS, download_type='audio'):
+        self.app = app
+        self.rounds = rounds
+        self.warmup = warmup
+        self.batch_size = batch_size
+        self.transcode = transcode
+        self.startup_budget_ms = startup_budget_ms
+        self.download_type = download_type
+        self.samples = {}  # metric -> list of ms
+        self.warming_up = False
+        self.errors = {}
+        self.round_ids = itertools.count()
+        self.download_dir = Path(tempfile.mkdtemp(prefix="bench-downloads-"))
+
+    def measure(self, metric, function, *args):
+        """Runs function(*args) warmup + rounds times and records each timed round under metric."""
+        for round_number in range(self.warmup + self.rounds):
+            self.warming_up = round_number < self.warmup
+            started = time.perf_counter()
+            try:
+                function(*args)
+            except Exception as e:
+                self.errors[metric] = f"{type(e).__name__}: {e}"
+                return
+            self.add_sample(metric, (time.perf_counter() - started) * 1000)
+        self.warming_up = False
+
+    def add_sample(self, metric, ms):
+        """Records one timed sample; samples taken during warm-up rounds are dropped."""
+        if not self.warming_up:
+            self.samples.setdefault(metric, []).append(ms)
+
+    def fresh_videos(self, count):
+        """(title, url, id) entries nobody has resolved or downloaded yet in this run."""
+        batch = next(self.round_ids)
+        videos = []
+        for i in range(count):
+            video_id = fixture_video_id("bench", batch, i)
+            videos.append((f"Fixture track {video_id}", f"https://www.youtube.com/watch?v={video_id}", video_id))
+        return videos
+
+    # -- scenarios --
+    def scenario_startup(self):
+        """Starts the app in a fresh interpreter for a subcommand that needs no network, under -X importtime."""
+        def start_app():
+            completed = subprocess.run([sys.executable, "-X", "importtime", str(APP_SCRIPT), "trace-summary"],
+                                       capture_output=True, text=True, timeout=60)
+            import_ms, modules = parse_importtime(completed.stderr)
+            if not modules:
+                raise RuntimeError(f"no -X importtime output (exit code {completed.returncode})")
+            self.add_sample("startup_imports", import_ms)
+            eager = sorted(name for name in STARTUP_FORBIDDEN_IMPORTS if name in modules)
+            if eager:
+                raise RuntimeError(f"{', '.join(eager)} imported at startup")
+
+        self.measure("startup", start_app)
+        imports = self.samples.get("startup_imports")
+        if imports and statistics.median(imports) > self.startup_budget_ms:
+            self.errors["startup"] = (f"imports took {statistics.median(imports):.1f} ms (median), "
+                                      f"over the {self.startup_budget_ms:.0f} ms budget")
+
+    def scenario_search(self):
+        app = self.app
+
+        def cold_search():
+            query = f"bench query {next(self.round_ids)}"
+            started = time.perf_counter()
+            results = app.iter_search_youtube(query, app.MAX_SEARCH_RESULTS, use_cache=False, report_errors=False)
+            first = next(results, None)
+            if first is None:
+                raise RuntimeError("search returned no results")
+            self.add_sample("search_first_result", (time.perf_counter() - started) * 1000)
+            rest = list(results)
+            if len(rest) + 1 != app.MAX_SEARCH_RESULTS:
+                raise RuntimeError(f"search returned {len(rest) + 1} results")
+
+        def cached_search():
+            if not app.search_youtube("bench cached query"):
+                raise RuntimeError("search returned no results")
+
+        def next_page():
+            pager = app.SearchPager(f"bench pager {next(self.round_ids)}")
+            try:
+                list(pager.iter_first_page())
+                started = time.perf_counter()
+                if not pager.page(1):
+                    raise RuntimeError("second page is empty")
+                self.add_sample("search_next_page", (time.perf_counter() - started) * 1000)
+            finally:
+                pager.close()
+
+        app.search_youtube("bench cached query")
+        self.measure("search", cold_search)
+        self.measure("search_cached", cached_search)
+        self.measure("search_pager", next_page)
+
+    def scenario_resolve(self):
+        app = self.app
+
+        def resolve():
+            title, url, video_id = self.fresh_videos(1)[0]
+            if not app.get_audio_url_for_streaming(url, video_id, title, show_progress=False):
+                raise RuntimeError(f"could not resolve {url}")
+
+        title, url, video_id = self.fresh_videos(1)[0]
+        app.get_audio_url_for_streaming(url, video_id, title, show_progress=False)
+        self.measure("resolve", resolve)
+        self.measure("resolve_cached", lambda: app.get_audio_url_for_streaming(url, video_id, title, show_progress=False))
+
+    def scenario_proxy(self):
+        app = self.app
+
+        def read_range(proxy_url, first, last=""):
+            """Returns the ms the ranged request took and how many bytes it got."""
+            started = time.perf_counter()
+            request = urllib.request.Request(proxy_url, headers={"Range": f"bytes={first}-{last}"})
+            with urllib.request.urlopen(request, timeout=10) as response:
+                received = len(response.read())
+            return (time.perf_counter() - started) * 1000, received
+
+        def play_then_seek_back():
+            title, url, video_id = self.fresh_videos(1)[0]
+            stream_url = app.get_audio_url_for_streaming(url, video_id, title, show_progress=False)
+            proxy_url = app.stream_proxy.url_for(stream_url, video_id)
+            self.add_sample("proxy_first_bytes", read_range(proxy_url, 0, MPV_PROBE_BYTES - 1)[0])
+            _ms, size = read_range(proxy_url, 0)
+            # Like a backward seek into audio that was already heard; a short --audio-seconds track is
+            # smaller than a chunk, so the seek stays inside it
+            offset = min(app.PROXY_CHUNK_SIZE // 2, size // 2)
+            self.add_sample("proxy_seek_cached", read_range(proxy_url, offset, offset + MPV_PROBE_BYTES - 1)[0])
+
+        self.measure("proxy", play_then_seek_back)
+
+    def scenario_playlist(self):
+        """Lists a PLAYLIST_SIZE-entry playlist: how soon the first entry is usable, and the whole listing."""
+        app = self.app
+
+        def expand_playlist():
+            playlist_url = f"https://www.youtube.com/playlist?list=PL{fixture_video_id('playlist', next(self.round_ids))}"
+            started = time.perf_counter()
+            count = 0
+            for count, _video in enumerate(app.iter_collection_entries(playlist_url), 1):
+                if count == 1:
+                    self.add_sample("playlist_first_entry", (time.perf_counter() - started) * 1000)
+            if count != PLAYLIST_SIZE:
+                raise RuntimeError(f"listed {count} of {PLAYLIST_SIZE} playlist entries")
+
+        self.measure("playlist", expand_playlist)
+
+    def scenario_enrich(self):
+        """Fetches duration, channel and views for a page of flat search results, then again from the cache."""
+        app = self.app
+
+        def enrich(enricher, expect_fetches):
+            videos = self.fresh_videos(app.MAX_SEARCH_RESULTS) if expect_fetches else enrich.videos
+            enrich.videos = videos
+            futures = [enricher.request(video) for video in videos]
+            if expect_fetches != all(futures):
+                raise RuntimeError(f"expected {'a fetch' if expect_fetches else 'a cache hit'} for every result")
+            enricher.wait([video_id for _title, _url, video_id in videos])
+            missing = [video_id for _title, _url, video_id in videos if (enricher.get(video_id) or {}).get('view_count') is None]
+            if missing:
+                raise RuntimeError(f"{len(missing)} result(s) were not enriched")
+
+        enrich.videos = None
+        self.measure("enrich", lambda: enrich(app.metadata_enricher, True))
+        # A new enricher has an empty memory cache, so its details come from disk
+        self.measure("enrich_cached", lambda: enrich(app.MetadataEnricher(app.metadata_cache), False))
+
+    def scenario_download_single(self):
+        app = self.app
+
+        def download():
+            title, url, video_id = self.fresh_videos(1)[0]
+            path = app.fetch_media(url, self.download_type, self.download_dir, app.safe_filename_base(title, video_id))
+            if not path or not Path(path).exists():
+                raise RuntimeError(f"download of {url} produced no file")
+
+        self.measure("download_single", download)
+
+    def scenario_download_batch(self):
+        app = self.app
+
+        def download_batch():
+            jobs = [app.DownloadJob(url, self.download_type, self.download_dir, title, video_id)
+                    for title, url, video_id in self.fresh_videos(self.batch_size)]
+            app.DownloadManager(workers=app.DOWNLOAD_WORKERS).run(jobs)
+            failed = [job for job in jobs if job.status != "done"]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(jobs)} jobs ended as {failed[0].status}: {failed[0].error}")
+
+        self.measure("download_batch", download_batch)
+
+    def scenario_download_pipelined(self):
+        """A batch with the transcode stage on a process pool. Each job's archive entry must point at its own file."""
+        app = self.app
+
+        def download_pipelined():
+            jobs = [app.DownloadJob(url, self.download_type, self.download_dir, title, video_id)
+                    for title, url, video_id in self.fresh_videos(self.batch_size)]
+            app.DownloadManager(workers=app.DOWNLOAD_WORKERS, pipelined=True).run(jobs)
+            failed = [job for job in jobs if job.status != "done"]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(jobs)} jobs ended as {failed[0].status}: {failed[0].error}")
+            misfiled = [job.video_id for job in jobs
+                        if job.video_id not in Path(app.download_archive.lookup(job.video_id, self.download_type) or "").name]
+            if misfiled:
+                raise RuntimeError(f"{len(misfiled)} archive entries point at another video's file")
+            pending = {url for url, *_rest in app.download_archive.pending()} & {job.url for job in jobs}
+            if pending:
+                raise RuntimeError(f"{len(pending)} finished downloads are still listed for resuming")
+
+        self.measure("download_pipelined", download_pipelined)
+
+    def scenario_download_resume(self):
+        """Cancels each chunked download halfway, then times the run that finishes it from the chunk journal."""
+        app = self.app
+
+        def cancel_halfway(d):
+            if d["status"] == "downloading" and d.get("total_bytes") and d["downloaded_bytes"] >= d["total_bytes"] // 2:
+                raise app.yt_dlp.utils.DownloadCancelled()
+
+        def interrupt_then_resume():
+            title, url, video_id = self.fresh_videos(1)[0]
+            filename_base = app.safe_filename_base(title, video_id)
+            with contextlib.suppress(app.yt_dlp.utils.DownloadCancelled):
+                app.fetch_media(url, self.download_type, self.download_dir, filename_base, cancel_halfway)
+            if not list(self.download_dir.glob(f"{filename_base}.*.chunks.json")):
+                raise RuntimeError("the interrupted download left no chunk journal behind")
+            if not app.download_archive.pending():
+                raise RuntimeError("the interrupted download is not listed for resuming")
+            started = time.perf_counter()
+            path = app.fetch_media(url, self.download_type, self.download_dir, filename_base)
+            self.add_sample("download_resumed", (time.perf_counter() - started) * 1000)
+            if not path or not Path(path).exists():
+                raise RuntimeError(f"resumed download of {url} produced no file")
+
+        chunk_size = app.DOWNLOAD_CHUNK_SIZE
+        app.DOWNLOAD_CHUNK_SIZE = RESUME_CHUNK_SIZE
+        try:
+            self.measure("download_resume", interrupt_then_resume)
+        finally:
+            app.DOWNLOAD_CHUNK_SIZE = chunk_size
+
+    def scenario_dashboard(self):
+        """Draws download dashboard frames with DASHBOARD_JOBS jobs running and moving between frames."""
+        app = self.app
+
+        def render_frames():
+            dashboard = app.DownloadDashboard("Batch", workers=DASHBOARD_JOBS)
+            jobs = [app.DownloadJob(f"https://www.youtube.com/watch?v={fixture_video_id('dashboard', i)}", title=f"Fixture track {i + 1}")
+                    for i in range(DASHBOARD_JOBS)]
+            for job in jobs:
+                job.total_bytes = 10 * 1024 * 1024
+                dashboard.start(job)
+            frame_console = Console(file=io.StringIO(), width=120, force_terminal=True)
+            for _frame in range(DASHBOARD_FRAMES):
+                for job in jobs:
+                    job.downloaded_bytes += 64 * 1024  # what the progress hooks do between two frames
+                started = time.perf_counter()
+                frame_console.print(dashboard.render())
+                self.add_sample("dashboard_frame", (time.perf_counter() - started) * 1000)
+
+        self.measure("dashboard", render_frames)
+
+    def scenario_engine(self):
+        """Runs ENGINE_SEARCHES cold searches at once on the async engine, then times player commands
+        over its asyncio mpv IPC connection."""
+        app = self.app
+        engine = app.engine
+
+        def concurrent_searches():
+            async def search_all():
+                queries = [f"bench engine {next(self.round_ids)}" for _ in range(ENGINE_SEARCHES)]
+                return await asyncio.gather(*(engine.call(lambda query=query: list(app.iter_search_youtube(query, report_errors=False)))
+                                              for query in queries))
+
+            results = engine.run(search_all())
+            short = [len(videos) for videos in results if len(videos) != app.MAX_SEARCH_RESULTS]
+            if short:
+                raise RuntimeError(f"{len(short)} search(es) came back short")
+
+        def player_command():
+            started = time.perf_counter()
+            if engine.run(engine.player_command("get_property", "playlist-count")) is False:
+                raise RuntimeError("mpv did not answer over the asyncio IPC connection")
+            self.add_sample("engine_player_command", (time.perf_counter() - started) * 1000)
+
+        self.measure("engine_searches", concurrent_searches)
+        self.measure_with_player("engine", player_command)
+
+    def scenario_daemon(self):
+        """Talks to a MusicDaemon running on this process's warm app: a bare round trip, a search through
+        it, and a whole thin-client `search` process that finds it on the socket."""
+        app = self.app
+        daemon = app.MusicDaemon(app.DAEMON_SOCKET_PATH)
+        thread = threading.Thread(target=daemon.serve_forever, name="bench-daemon", daemon=True)
+        thread.start()
+        try:
+            deadline = time.monotonic() + 10
+            client = None
+            while client is None and time.monotonic() < deadline:
+                client = app.connect_daemon(app.DAEMON_SOCKET_PATH)
+                time.sleep(0 if client else 0.02)
+            if client is None:
+                self.errors["daemon"] = "the daemon did not come up"
+                return
+
+            def search():
+                records = client.call("search", query=f"bench daemon {next(self.round_ids)}", use_cache=False)
+                if len(records) != app.MAX_SEARCH_RESULTS:
+                    raise RuntimeError(f"search returned {len(records)} results")
+
+            def cli_search():
+                # HOME points at the benchmark's, so the client finds the daemon's socket
+                completed = subprocess.run([sys.executable, str(APP_SCRIPT), "search", "--json", "bench daemon query"],
+                                           capture_output=True, text=True, timeout=60)
+                if completed.returncode != 0 or not json.loads(completed.stdout or "[]"):
+                    raise RuntimeError(f"thin-client search failed (exit code {completed.returncode})")
+
+            with client:
+                self.measure("daemon_ping", client.call, "ping")
+                self.measure("daemon_search", search)
+            self.measure("daemon_cli_search", cli_search)
+        finally:
+            daemon.rpc_shutdown()
+            thread.join(timeout=10)
+
+    def wait_for_audio(self, action):
+        """Runs action() and returns the ms until mpv reports playback-restart."""
+        ipc = self.app.player.ipc
+        started = time.perf_counter()
+        audio_started = threading.Event()
+        handler = lambda message: audio_started.set()
+        ipc.on('playback-restart', handler)
+        try:
+            if action() is False:
+                raise RuntimeError("mpv rejected the command")
+            if not audio_started.wait(10):
+                raise RuntimeError("no playback-restart from mpv")
+        finally:
+            ipc.off('playback-restart', handler)
+        return (time.perf_counter() - started) * 1000
+
+    def measure_with_player(self, scenario, play_round):
+        """Like measure(), for rounds that drive the (fake) mpv and record their own samples."""
+        app = self.app
+        if os.name != 'posix':
+            self.errors[scenario] = "the fake mpv needs Unix sockets"
+            return
+        app.player.start()
+        try:
+            for round_number in range(self.warmup + self.rounds):
+                self.warming_up = round_number < self.warmup
+                try:
+                    play_round()
+                except Exception as e:
+                    self.errors[scenario] = f"{type(e).__name__}: {e}"
+                    return
+        finally:
+            self.warming_up = False
+            app.playback_queue.clear()
+            app.player.command("stop")
+            app.player.command("set_property", "speed", 1.0)
+
+    def scenario_cold_start(self):
+        """Plays a fresh queue on an mpv started for it, as the first stream of a session does."""
+        app = self.app
+        queue = app.playback_queue
+
+        def play_on_new_player():
+            app.player.shutdown()
+            queue.clear()
+            queue.add(self.fresh_videos(1))
+            self.add_sample("cold_start_first_audio", self.wait_for_audio(lambda: queue.play(0)))
+            # The idle-active=true a new mpv reports before anything is loaded isn't the queue finishing
+            if queue.finished.is_set():
+                raise RuntimeError("the queue counts as finished while its first track plays")
+
+        self.measure_with_player("cold_start", play_on_new_player)
+
+    def scenario_stream(self):
+        """Runs the headless `stream` command on a new mpv, fast-forwarded to STREAM_SPEED, and checks it
+        returns only once the track has played to the end."""
+        app = self.app
+        ipc = app.player.ipc
+
+        def stream_one_track():
+            app.player.shutdown()
+            title, url, video_id = self.fresh_videos(1)[0]
+            args = app.build_arg_parser().parse_args(["--no-daemon", "stream", url])
+            audio_started = []
+
+            def fast_forward(message):
+                if not audio_started:
+                    audio_started.append(time.perf_counter())
+                    # Not on the engine's loop, which has to read the command's reply
+                    threading.Thread(target=app.player.command, args=("set_property", "speed", STREAM_SPEED), daemon=True).start()
+
+            ipc.on('playback-restart', fast_forward)
+            started = time.perf_counter()
+            try:
+                exit_code = app.cli_stream(args)
+            finally:
+                ipc.off('playback-restart', fast_forward)
+            returned = time.perf_counter()
+            if exit_code != app.EXIT_OK:
+                raise RuntimeError(f"stream exited with code {exit_code}")
+            if not audio_started:
+                raise RuntimeError("stream returned before any audio played")
+            self.add_sample("stream_first_audio", (audio_started[0] - started) * 1000)
+            played = returned - audio_started[0]
+            expected = (ipc.properties.get("duration") or 0) / STREAM_SPEED
+            if played < expected * 0.9:
+                raise RuntimeError(f"stream returned {played:.2f}s into a track that plays for {expected:.2f}s")
+
+        self.measure_with_player("stream", stream_one_track)
+
+    def scenario_track_switch(self):
+        app = self.app
+        queue = app.playback_queue
+
+        def play_new_queue():
+            queue.clear()
+            queue.add(self.fresh_videos(app.QUEUE_PREFETCH_COUNT + 1))
+            self.add_sample("switch_play_unresolved", self.wait_for_audio(lambda: queue.play(0)))
+            # Give the background prefetch time to resolve and append the next track
+            deadline = time.monotonic() + 10
+            while queue.appended < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.add_sample("switch_next_prefetched", self.wait_for_audio(queue.next))
+
+        self.measure_with_player("track_switch", play_new_queue)
+
+    def scenario_replay(self):
+        app = self.app
+        queue = app.playback_queue
+
+        def play_twice():
+            video = self.fresh_videos(1)[0]
+            queue.clear()
+            queue.add([video])
+            # The first play streams and records the track; fast-forward it to the end so it gets cached
+            app.player.command("set_property", "speed", 100.0)
+            self.wait_for_audio(lambda: queue.play(0))
+            deadline = time.monotonic() + 10
+            while app.audio_cache.lookup(video[2]) is None:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("the streamed track never reached the audio cache")
+                time.sleep(0.01)
+            app.player.command("set_property", "speed", 1.0)
+            queue.clear()
+            queue.add([video])
+            if queue.tracks[0]['id'] is not None:
+                raise RuntimeError("the replay was not served from the audio cache")
+            self.add_sample("replay_cached", self.wait_for_audio(lambda: queue.play(0)))
+
+        self.measure_with_player("replay", play_twice)
+
+    def run(self, scenarios):
+        for scenario in scenarios:
+            console.print(f"[cyan]Running[/cyan] {scenario}...")
+            getattr(self, f"scenario_{scenario}")()
+
+    def close(self):
+        self.app.playback_queue.shutdown()
+        self.app.metadata_enricher.shutdown()
+        self.app.player.shutdown()
+        self.app.engine.shutdown()
+        self.app.stream_proxy.close()
+        self.app.ydl_pool.close()
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+
+# --- Results ---
+def parse_importtime(output):
+    """Sums the cumulative time of top-level imports in -X importtime output.
+    Returns (milliseconds, set of every imported module name)."""
+    total_us, modules = 0, set()
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|", 2)
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # the column header
+        cumulative_us, name = int(fields[1]), fields[2][1:]
+        modules.add(name.strip())
+        if not name.startswith(" "):
+            total_us += cumulative_us
+    return total_us / 1000, modules
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {"n": len(ordered), "median": round(statistics.median(ordered), 3), "mean": round(statistics.fmean(ordered), 3),
+            "min": round(ordered[0], 3), "max": round(ordered[-1], 3)}
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_SCRIPT.parent,
+                                  capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", APP_SCRIPT.name], cwd=APP_SCRIPT.parent,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return f"{revision}{'-dirty' if dirty else ''}" if revision else None
+
+
+def load_previous_run(path, settings):
+    """The latest stored run made with the same settings, or None."""
+    previous = None
+    try:
+        with open(path, encoding="utf-8") as results_file:
+            for line in results_file:
+                try:
+                    run = json.loads(line)
+                except ValueError:
+                    continue
+                if run.get("settings") == settings:
+                    previous = run
+    except OSError:
+        return None
+    return previous
+
+
+def find_regressions(results, previous, threshold):
+    regressions = []
+    for metric, summary in results.items():
+        before = (previous or {}).get("results", {}).get(metric)
+        if not before:
+            continue
+        growth = summary["median"] - before["median"]
+        if growth > REGRESSION_MIN_MS and growth > before["median"] * threshold:
+            regressions.append(metric)
+    return regressions
+
+
+def print_results(run, previous, regressions, errors, threshold):
+    title = f"Benchmark {run['label'] or run['revision'] or ''} (ms, {run['settings']['rounds']} rounds)".replace("  ", " ")
+    table = Table(title=title, header_style="bold magenta", border_style="dim blue")
+    table.add_column("Metric", style="cyan")
+    for column in ("Median", "Mean", "Min", "Max"):
+        table.add_column(column, justify="right")
+    table.add_column(f"vs {previous.get('label') or previous.get('revision')}" if previous else "vs previous", justify="right")
+    for metric, summary in sorted(run["results"].items()):
+        before = (previous or {}).get("results", {}).get(metric)
+        change = "-"
+        if before and before["median"]:
+            ratio = summary["median"] / before["median"] - 1
+            style = "red" if metric in regressions else ("green" if ratio < -0.05 else "white")
+            change = f"[{style}]{ratio:+.0%}[/{style}]"
+        table.add_row(metric, *(f"{summary[key]:.1f}" for key in ("median", "mean", "min", "max")), change)
+    console.print(table)
+    for scenario, error in errors.items():
+        console.print(f"[bold red]❌ {scenario} failed:[/bold red] {error}")
+    if regressions:
+        console.print(f"[bold red]Regressed by more than {threshold:.0%}:[/bold red] {', '.join(regressions)}")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for yt-music-enhanced-iv.py against local stand-ins for YouTube and mpv.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="timed rounds per scenario")
+    parser.add_argument("--warmup", type=int, default=WARMUP_ROUNDS, help="untimed rounds before the timed ones")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="artificial round-trip delay per HTTP request")
+    parser.add_argument("--bandwidth", type=int, default=0, metavar="KIB_PER_S", help="cap audio transfers (0 = unlimited)")
+    parser.add_argument("--audio-seconds", type=int, default=AUDIO_SECONDS, help="length of the fixture track")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="jobs in the batch download scenario")
+    parser.add_argument("--startup-budget-ms", type=float, default=STARTUP_IMPORT_BUDGET_MS, help="fail if app imports take longer than this")
+    parser.add_argument("--download-type", choices=("audio", "native", "video"), default="audio",
+                        help="download type for the download scenarios (audio = MP3, native = no re-encode)")
+    parser.add_argument("--no-transcode", action="store_true", help="skip MP3 conversion even if ffmpeg is installed")
+    parser.add_argument("--results", type=Path, default=RESULTS_PATH, help="JSON lines file the runs are appended to")
+    parser.add_argument("--label", default="", help="name for this run (defaults to the git revision)")
+    parser.add_argument("--no-save", action="store_true", help="compare with earlier runs but don't store this one")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="relative median growth that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if any metric regressed")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["fake-mpv"]:
+        run_fake_mpv(argv[1:])
+        return 0
+    args = build_arg_parser().parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        console.print(f"[bold red]Unknown scenario(s):[/bold red] {', '.join(unknown)}")
+        return 2
+    transcode = not args.no_transcode and shutil.which("ffmpeg") is not None
+    if not transcode and not args.no_transcode and any(name.startswith("download") for name in scenarios):
+        console.print("[orange3]ffmpeg not found; download scenarios stop at the raw file.[/orange3]")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="yt-music-bench-"))
+    (work_dir / "bin").mkdir()
+    (work_dir / "home").mkdir()
+    if os.name == 'posix':
+        install_fake_mpv(work_dir / "bin")
+    server = FixtureServer(build_fixture_wav(args.audio_seconds), args.latency_ms, args.bandwidth).start()
+    benchmark = None
+    try:
+        app = load_app(work_dir / "home", server.base_url)
+        if not transcode:
+            strip_postprocessors(app)
+        benchmark = Benchmark(app, max(1, args.rounds), max(0, args.warmup), args.batch_size, transcode, args.startup_budget_ms,
+                              args.download_type)
+        benchmark.run(scenarios)
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Benchmark interrupted; nothing stored.[/yellow]")
+        return 130
+    finally:
+        if benchmark is not None:
+            benchmark.close()
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    settings = {"scenarios": scenarios, "rounds": benchmark.rounds, "latency_ms": args.latency_ms,
+                "bandwidth_kib": args.bandwidth, "audio_seconds": args.audio_seconds,
+                "batch_size": args.batch_size, "transcode": transcode, "download_type": args.download_type}
+    run = {
+        "ts": time.time(), "revision": git_revision(), "label": args.label,
+        "python": platform.python_version(), "yt_dlp": benchmark.app.yt_dlp.version.__version__,
+        "platform": platform.platform(), "settings": settings,
+        "results": {metric: summarize(values) for metric, values in benchmark.samples.items()},
+        "errors": benchmark.errors,
+    }
+    previous = load_previous_run(args.results, settings)
+    regressions = find_regressions(run["results"], previous, args.threshold)
+    print_results(run, previous, regressions, benchmark.errors, args.threshold)
+    if not args.no_save:
+        with open(args.results, "a", encoding="utf-8") as results_file:
+            results_file.write(json.dumps(run) + "\n")
+        console.print(f"[green]Stored in {args.results}[/green]")
+    if benchmark.errors:
+        return 1
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
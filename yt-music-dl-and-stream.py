@@ -1,5 +1,8 @@
 import yt_dlp
 import subprocess
+import re
+import time
+from urllib.parse import urlparse, parse_qs
 import os
 
 def search_youtube(query, max_results=5):
@@ -59,10 +62,35 @@ def sanitize_filename(name):
     return "".join(c for c in name if c.isalnum() or c in ' -_').rstrip()
 
 
+STREAM_FORMAT = 'bestaudio/best'
+STREAM_URL_EXPIRY_MARGIN = 5 * 60  # seconds before its expiry that a stream URL is no longer reused
+VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+stream_urls = {}  # (video id, format) -> (stream URL, expiry time)
+
+
+def video_id_from_url(url):
+    """The 11-character id in watch, youtu.be, music.youtube.com and shorts links, or None."""
+    match = VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def stream_url_expiry(stream_url):
+    """Unix time the stream URL expires, from ?expire=... or a manifest's /expire/.../ path; 30 minutes if neither."""
+    parsed = urlparse(stream_url)
+    expire = parse_qs(parsed.query).get('expire', [None])[0]
+    if expire is None:
+        match = re.search(r"/expire/(\d+)", parsed.path)
+        expire = match.group(1) if match else None
+    return float(expire) if expire and expire.isdigit() else time.time() + 30 * 60
+
+
 def get_audio_url(video_url):
-    """Extract the best audio URL using yt-dlp."""
+    """Extract the best audio URL using yt-dlp, or reuse the one found earlier for the same video."""
+    cached = stream_urls.get((video_id_from_url(video_url), STREAM_FORMAT))
+    if cached and cached[1] - STREAM_URL_EXPIRY_MARGIN > time.time():
+        return cached[0]
     ydl_opts = {
-        'format': 'bestaudio/best',
+        'format': STREAM_FORMAT,
         'quiet': True,
         'noplaylist': True
     }
@@ -70,10 +98,13 @@ def get_audio_url(video_url):
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
             info = ydl.extract_info(video_url, download=False)
-            return info['url']
+            audio_url = info['url']
         except Exception as e:
             print(f"❌ Error extracting audio URL: {e}")
             return None
+    if info.get('id'):
+        stream_urls[(info['id'], STREAM_FORMAT)] = (audio_url, stream_url_expiry(audio_url))
+    return audio_url
 
 
 def play_song(audio_url):
@@ -17,7 +17,9 @@ from rich.progress import (
 from rich.panel import Panel
 from rich.text import Text
 from rich.align import Align
+import re
 import time
+from urllib.parse import urlparse, parse_qs
 import traceback
 
 console = Console()
@@ -26,6 +28,11 @@ console = Console()
 MAX_SEARCH_RESULTS = 10
 STREAMING_MPV_PLAYER_ARGS = ["--no-video", "--force-window=no", "--no-input-terminal", "--really-quiet"]
 DOWNLOAD_PATH = Path.home() / "Downloads" / "MusicStreamerCLI"
+STREAM_AUDIO_FORMAT = 'bestaudio/best'
+STREAM_URL_EXPIRY_MARGIN = 5 * 60  # stop reusing a resolved stream URL this many seconds before it expires
+STREAM_URL_DEFAULT_TTL = 30 * 60  # for a stream URL that names no expiry
+
+resolved_stream_urls = {}  # (video id, format) -> (stream URL, expiry time), for this session
 
 # Ensure download path exists
 DOWNLOAD_PATH.mkdir(parents=True, exist_ok=True)
@@ -77,9 +84,23 @@ def search_youtube(query, max_results=MAX_SEARCH_RESULTS):
     return videos
 
 
-def get_audio_url_for_streaming(video_url, video_title=""):
+def stream_url_expiry(stream_url):
+    """Returns when a googlevideo URL expires (its `expire` query parameter or /expire/<time>/ path
+    segment), or STREAM_URL_DEFAULT_TTL from now if it names neither."""
+    parsed = urlparse(stream_url)
+    expire = parse_qs(parsed.query).get('expire', [None])[0]
+    if expire is None:
+        match = re.search(r"/expire/(\d+)", parsed.path)
+        expire = match.group(1) if match else None
+    return float(expire) if expire and expire.isdigit() else time.time() + STREAM_URL_DEFAULT_TTL
+
+
+def get_audio_url_for_streaming(video_url, video_id, video_title=""):
+    cached = resolved_stream_urls.get((video_id, STREAM_AUDIO_FORMAT))
+    if cached and cached[1] - STREAM_URL_EXPIRY_MARGIN > time.time():
+        return cached[0]
     ydl_opts = {
-        'format': 'bestaudio/best',
+        'format': STREAM_AUDIO_FORMAT,
         'quiet': True,
         'noplaylist': True,
         'extract_flat': False,
@@ -95,7 +116,10 @@ def get_audio_url_for_streaming(video_url, video_title=""):
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(video_url, download=False)
-                return info.get('url')
+                stream_url = info.get('url')
+                if stream_url:
+                    resolved_stream_urls[(info.get('id') or video_id, STREAM_AUDIO_FORMAT)] = (stream_url, stream_url_expiry(stream_url))
+                return stream_url
         except Exception as e:
             console.print(f"[bold red]❌ Error extracting audio URL for streaming:[/bold red] {e}")
             return None
@@ -295,9 +319,9 @@ def handle_search_and_stream():
     if not results: time.sleep(2); return
     selected_media = select_media_from_results(results, action_verb="stream")
     if selected_media:
-        selected_title, selected_url, _ = selected_media
+        selected_title, selected_url, selected_id = selected_media
         console.print(f"\n[bold blue]▶️ Selected for streaming:[/bold blue] [italic]{selected_title}[/italic]")
-        audio_url = get_audio_url_for_streaming(selected_url, selected_title)
+        audio_url = get_audio_url_for_streaming(selected_url, selected_id, selected_title)
         if audio_url: play_song_with_mpv(audio_url, selected_title)
         else: console.print("[red]❌ Could not retrieve audio for streaming.[/red]"); time.sleep(3)
 
@@ -1,266 +1,3345 @@
-import yt_dlp
+import importlib.util
 import subprocess
 import os
 from pathlib import Path
-from rich.console import Console
-from rich.prompt import Prompt, IntPrompt
-from rich.table import Table
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    TextColumn,
-    DownloadColumn,
-    TransferSpeedColumn,
-    TimeRemainingColumn,
-    BarColumn
-)
+from rich.console import Console, Group
+from rich.prompt import Prompt, IntPrompt, Confirm
 from rich.panel import Panel
 from rich.text import Text
 from rich.align import Align
 import time
 import signal
+import socket
+import threading
+import itertools
+import concurrent.futures
+import contextlib
+import queue
+import collections
+import hashlib
+import math
 import uuid
 import traceback
 import tempfile
 import json
+import sys
+import argparse
+import sqlite3
+import re
+from urllib.parse import urlparse, parse_qs, urljoin
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Importing yt_dlp loads every extractor module, which makes it the slowest part of startup. Deferring
+    it means the menu and the headless subcommands that don't hit the network come up without it.
+    Unlike importlib's LazyLoader this is safe when several worker threads touch the module first.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+def lazy_import(name):
+    """Returns module `name`, or a LazyModule for it if it hasn't been imported yet. Raises
+    ModuleNotFoundError right away if it isn't installed."""
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return LazyModule(name)
+
+
+yt_dlp = lazy_import("yt_dlp")
+rich_progress = lazy_import("rich.progress")
+rich_table = lazy_import("rich.table")
+rich_live = lazy_import("rich.live")
+http_client = lazy_import("http.client")
+http_server = lazy_import("http.server")
+asyncio = lazy_import("asyncio")
+socketserver = lazy_import("socketserver")
+inspect = lazy_import("inspect")
 
 console = Console()
 
-# --- Configuration ---
-MAX_SEARCH_RESULTS = 10
-DOWNLOAD_PATH = Path.home() / "Downloads" / "MusicStreamerCLI"
-DOWNLOAD_PATH.mkdir(parents=True, exist_ok=True)
+# --- Configuration ---
+MAX_SEARCH_RESULTS = 10
+DOWNLOAD_PATH = Path.home() / "Downloads" / "MusicStreamerCLI"
+DOWNLOAD_PATH.mkdir(parents=True, exist_ok=True)
+CACHE_PATH = Path.home() / ".cache" / "MusicStreamerCLI"
+CACHE_PATH.mkdir(parents=True, exist_ok=True)
+SEARCH_CACHE_TTL = 6 * 60 * 60  # seconds
+SEARCH_CACHE_MAX_ENTRIES = 500
+STREAM_AUDIO_FORMAT = 'bestaudio/best'
+STREAM_URL_EXPIRY_MARGIN = 5 * 60  # drop resolved URLs this many seconds before googlevideo expires them
+STREAM_URL_DEFAULT_TTL = 30 * 60  # used when a resolved URL carries no expire parameter
+MPV_STARTUP_TIMEOUT = 5  # seconds to wait for the mpv IPC server to come up
+MPV_IPC_TIMEOUT = 5  # seconds to wait for a reply to an IPC command
+MPV_IPC_LINE_LIMIT = 4 * 1024 * 1024  # longest IPC message read (a long playlist property can be large)
+QUEUE_PREFETCH_COUNT = 3  # upcoming queue entries to resolve ahead of time
+QUEUE_PREFETCH_WORKERS = 3
+YDL_POOL_MAX_IDLE = 8  # warm YoutubeDL instances kept per option profile; a new one spends tens of ms loading CA certificates
+DOWNLOAD_WORKERS = 4  # concurrent jobs in a batch download
+TRACE_PATH = CACHE_PATH / "latency_traces.jsonl"  # one JSON line per measured stage
+TRACE_ENABLED = True
+TRACE_MAX_BYTES = 8 * 1024 * 1024  # the trace file is rotated at this size, keeping one older generation
+PIPELINE_QUEUE_SIZE = 8  # downloaded files allowed to wait for the transcode stage
+AUDIO_CACHE_PATH = CACHE_PATH / "audio"  # streamed tracks kept for instant replays
+AUDIO_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 0 turns the streamed-audio cache off
+STREAM_PROXY_ENABLED = True  # route mpv's stream requests through the local caching proxy
+PROXY_CACHE_PATH = CACHE_PATH / "ranges"
+PROXY_CACHE_MAX_BYTES = 512 * 1024 * 1024
+PROXY_CHUNK_SIZE = 1024 * 1024  # upstream requests are this big, however little mpv asks for
+PROXY_READ_AHEAD_CHUNKS = 2  # chunks fetched ahead of the one mpv is reading
+PROXY_READ_SIZE = 64 * 1024
+PROXY_FETCH_WORKERS = 4
+PROXY_UPSTREAM_CONNECTIONS = 4  # idle keep-alive connections kept per CDN host
+PROXY_UPSTREAM_TIMEOUT = 15
+PROXY_OPEN_STREAMS = 8  # cached streams kept open between reads; idle ones beyond this are closed, least recently used first
+PROXY_KNOWN_STREAMS = 256  # proxy URLs that stay playable, for tracks queued in mpv long before they are reached
+DOWNLOAD_CONNECTIONS = 4  # parallel range requests per downloaded file; 1 leaves it to yt-dlp's single connection
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # files no bigger than one chunk are fetched in a single request
+DOWNLOAD_CHUNK_RETRIES = 3
+PENDING_DOWNLOAD_MAX_AGE = 7 * 24 * 60 * 60  # interrupted downloads older than this are no longer offered for resume
+DASHBOARD_FPS = 8  # download dashboard redraws per second, however often yt-dlp reports progress
+DASHBOARD_RUNNING_ROWS = 12  # running jobs shown one per row; the rest are summed up in a single line
+PLAYLIST_FEED_BATCH = 25  # expanded playlist entries handed to the playback queue at a time
+PLAYLIST_FEED_AHEAD = 50  # a playlist is listed only this many tracks past the play position; the rest waits
+BATCH_FINISHED_ROWS = 5  # finished jobs left on screen during a batch; older rows make room for new ones
+BATCH_SUMMARY_MAX_ROWS = 50  # longer batches list only the jobs that didn't succeed
+METADATA_WORKERS = 4  # search results whose duration, channel and views are fetched at the same time
+METADATA_CACHE_TTL = 7 * 24 * 60 * 60  # view counts go stale; durations and channels don't
+DAEMON_SOCKET_PATH = CACHE_PATH / "daemon.sock"
+DAEMON_LOG_PATH = CACHE_PATH / "daemon.log"
+DAEMON_CONNECT_TIMEOUT = 0.2  # a client that can't reach the daemon this fast runs the command itself
+DAEMON_STARTUP_TIMEOUT = 15  # seconds `daemon start` waits for the new daemon to answer
+DAEMON_POLL_INTERVAL = 0.5  # how often a download client asks the daemon for progress
+ENGINE_WORKERS = 8  # threads the async engine runs blocking yt-dlp work on
+ENGINE_SEARCH_TIMEOUT = 30  # seconds before the engine gives up on a search
+ENGINE_RESOLVE_TIMEOUT = 30  # ...on resolving a stream URL and handing it to mpv
+
+
+# --- Caches ---
+class CacheDB:
+    """A SQLite database in CACHE_PATH with one connection per thread.
+
+    Search, enrichment, download, daemon and engine threads all write to the caches. On a shared
+    connection one thread's BEGIN/ROLLBACK would take in another thread's statements, so each thread
+    opens its own and SQLite's file locking (WAL) orders them, as it does between CLI instances.
+    """
+
+    def __init__(self, name):
+        self.path = CACHE_PATH / name
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def execute(self, sql, parameters=()):
+        return self.connection().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.connection().executemany(sql, seq_of_parameters)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Runs the block's statements as one write transaction on this thread's connection."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            with contextlib.suppress(sqlite3.Error):
+                conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class SearchCache:
+    """On-disk cache of search_youtube results keyed by (normalized query, max_results), with TTL and LRU eviction."""
+
+    def __init__(self, db_name="search_cache.sqlite3", ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.conn = CacheDB(db_name)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, results TEXT NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL, fetch_seconds REAL NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, hits INTEGER NOT NULL, "
+            "misses INTEGER NOT NULL, saved_seconds REAL NOT NULL)")
+
+    @staticmethod
+    def make_key(query, max_results):
+        query = " ".join(query.split())
+        # URLs contain case-sensitive video ids, plain search terms do not
+        if "://" not in query:
+            query = query.lower()
+        return f"{max_results}:{query}"
+
+    def _record(self, hit, saved_seconds=0.0):
+        if hit:
+            self.hits += 1
+            self.saved_seconds += saved_seconds
+        else:
+            self.misses += 1
+        try:
+            self.conn.execute(
+                "INSERT INTO cache_stats (name, hits, misses, saved_seconds) VALUES ('search', ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses, "
+                "saved_seconds = saved_seconds + excluded.saved_seconds",
+                (int(hit), int(not hit), saved_seconds))
+        except sqlite3.Error:
+            pass
+
+    def get(self, query, max_results):
+        key = self.make_key(query, max_results)
+        now = time.time()
+        try:
+            row = self.conn.execute(
+                "SELECT results, created, fetch_seconds FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self.conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._record(hit=False)
+                return None
+            self.conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            self.misses += 1
+            return None
+        self._record(hit=True, saved_seconds=row[2])
+        return [tuple(video) for video in json.loads(row[0])]
+
+    def put(self, query, max_results, videos, fetch_seconds):
+        key = self.make_key(query, max_results)
+        now = time.time()
+        try:
+            with self.conn.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, results, created, last_access, fetch_seconds) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, json.dumps(videos), now, now, fetch_seconds))
+                conn.execute("DELETE FROM search_cache WHERE created < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM search_cache WHERE key NOT IN "
+                    "(SELECT key FROM search_cache ORDER BY last_access DESC LIMIT ?)", (self.max_entries,))
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """Returns (session_hits, session_misses, session_saved_seconds, total_hits, total_misses, total_saved_seconds)."""
+        try:
+            row = self.conn.execute("SELECT hits, misses, saved_seconds FROM cache_stats WHERE name = 'search'").fetchone()
+        except sqlite3.Error:
+            row = None
+        return (self.hits, self.misses, self.saved_seconds) + (row or (0, 0, 0.0))
+
+
+search_cache = SearchCache()
+
+
+def stream_url_expiry(stream_url):
+    """Returns the unix time embedded in a googlevideo URL's `expire` parameter, or None."""
+    parsed = urlparse(stream_url)
+    expire = parse_qs(parsed.query).get('expire', [None])[0]
+    if expire is None:
+        # Manifest-style URLs carry their parameters as path segments: .../expire/1700000000/...
+        match = re.search(r"/expire/(\d+)", parsed.path)
+        expire = match.group(1) if match else None
+    try:
+        return float(expire) if expire is not None else None
+    except ValueError:
+        return None
+
+
+class StreamUrlCache:
+    """On-disk cache of resolved direct audio URLs keyed by (video id, format), honouring googlevideo expiry."""
+
+    def __init__(self, db_name="stream_urls.sqlite3", expiry_margin=STREAM_URL_EXPIRY_MARGIN):
+        self.expiry_margin = expiry_margin
+        self.hits = 0
+        self.misses = 0
+        self.conn = CacheDB(db_name)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS stream_urls (video_id TEXT NOT NULL, format TEXT NOT NULL, "
+            "url TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (video_id, format))")
+
+    def get(self, video_id, audio_format=STREAM_AUDIO_FORMAT):
+        try:
+            row = self.conn.execute("SELECT url, expires FROM stream_urls WHERE video_id = ? AND format = ?",
+                                    (video_id, audio_format)).fetchone()
+            if row and row[1] - self.expiry_margin <= time.time():
+                self.conn.execute("DELETE FROM stream_urls WHERE video_id = ? AND format = ?", (video_id, audio_format))
+                row = None
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, video_id, stream_url, audio_format=STREAM_AUDIO_FORMAT):
+        expires = stream_url_expiry(stream_url) or time.time() + STREAM_URL_DEFAULT_TTL
+        if expires - self.expiry_margin <= time.time():
+            return
+        try:
+            self.conn.execute("INSERT OR REPLACE INTO stream_urls (video_id, format, url, expires) VALUES (?, ?, ?, ?)",
+                              (video_id, audio_format, stream_url, expires))
+            self.conn.execute("DELETE FROM stream_urls WHERE expires - ? <= ?", (self.expiry_margin, time.time()))
+        except sqlite3.Error:
+            pass
+
+
+stream_url_cache = StreamUrlCache()
+
+
+class MetadataCache:
+    """On-disk cache of per-video details (duration, channel, view count) keyed by video id, with TTL."""
+
+    FIELDS = ('duration', 'channel', 'view_count')
+
+    def __init__(self, db_name="video_metadata.sqlite3", ttl=METADATA_CACHE_TTL):
+        self.ttl = ttl
+        self.conn = CacheDB(db_name)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS video_metadata (video_id TEXT PRIMARY KEY, duration REAL, "
+            "channel TEXT, view_count INTEGER, fetched REAL NOT NULL)")
+
+    def get(self, video_id):
+        try:
+            row = self.conn.execute("SELECT duration, channel, view_count, fetched FROM video_metadata WHERE video_id = ?",
+                                    (video_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or time.time() - row[3] > self.ttl:
+            return None
+        return dict(zip(self.FIELDS, row[:3]))
+
+    def put(self, video_id, metadata):
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO video_metadata (video_id, duration, channel, view_count, fetched) VALUES (?, ?, ?, ?, ?)",
+                (video_id, *(metadata.get(field) for field in self.FIELDS), time.time()))
+            self.conn.execute("DELETE FROM video_metadata WHERE fetched < ?", (time.time() - self.ttl,))
+        except sqlite3.Error:
+            pass
+
+
+metadata_cache = MetadataCache()
+
+
+YOUTUBE_ID_RE = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+COLLECTION_URL_RE = re.compile(r"[?&]list=|/playlist(?:[/?#]|$)|/(?:@|channel/|c/|user/)[^/?#]+/?(?:(?:videos|shorts|streams|releases)/?)?(?:[?#]|$)")
+ARCHIVE_FILENAME_RE = re.compile(r"_([A-Za-z0-9_-]{11})\.([A-Za-z0-9]+)$")
+VIDEO_EXTENSIONS = {'mp4', 'mkv', 'mov', 'avi'}
+AUDIO_EXTENSIONS = {'mp3', 'm4a', 'opus', 'ogg', 'oga', 'webm', 'flac', 'wav', 'aac'}
+DOWNLOAD_TYPES = ('audio', 'native', 'video')  # MP3, audio in its original codec, MP4
+
+
+def download_format_for_extension(ext):
+    """Which download type produced a file with this extension: only the MP3 path writes .mp3."""
+    ext = ext.lower()
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    return 'audio' if ext == 'mp3' else 'native'
+
+
+def video_id_from_url(url):
+    """Extracts the video id from common YouTube URL forms without any network access."""
+    match = YOUTUBE_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def is_collection_url(url, watch_lists=True):
+    """True for playlist, mix (`list=`) and channel URLs, which stand for many videos rather than one.
+    A watch URL that also names a list (`watch?v=...&list=...`) counts only with watch_lists; otherwise
+    it stands for its one video, as yt-dlp's noplaylist treats it."""
+    if "://" not in (url or "") or not COLLECTION_URL_RE.search(url):
+        return False
+    return watch_lists or video_id_from_url(url) is None
+
+
+def file_checksum(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as media_file:
+        for chunk in iter(lambda: media_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadArchive:
+    """Persistent index of finished downloads: (video id, format) -> path, size, checksum, timestamp.
+
+    Looked up before any network call so a known id is skipped immediately instead of being
+    re-downloaded or found by globbing the download folder.
+    """
+
+    def __init__(self, db_name="download_archive.sqlite3"):
+        self.conn = CacheDB(db_name)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS downloads (video_id TEXT NOT NULL, format TEXT NOT NULL, path TEXT NOT NULL, "
+            "size INTEGER NOT NULL, checksum TEXT, downloaded_at REAL NOT NULL, PRIMARY KEY (video_id, format))")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_downloads (url TEXT NOT NULL, format TEXT NOT NULL, path TEXT NOT NULL, "
+            "filename_base TEXT, video_id TEXT, started_at REAL NOT NULL, PRIMARY KEY (url, format))")
+
+    def lookup(self, video_id, download_format):
+        """Returns the archived file Path if it is still on disk with the recorded size, else None."""
+        if not video_id:
+            return None
+        try:
+            row = self.conn.execute("SELECT path, size FROM downloads WHERE video_id = ? AND format = ?",
+                                    (video_id, download_format)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        file_path = Path(row[0])
+        try:
+            if file_path.stat().st_size == row[1]:
+                return file_path
+        except OSError:
+            pass
+        self.remove(video_id, download_format)
+        return None
+
+    def record(self, video_id, download_format, file_path, checksum=True):
+        """Adds or replaces the entry for a completed download in a single (atomic) statement."""
+        if not video_id or not file_path:
+            return
+        file_path = Path(file_path)
+        try:
+            size = file_path.stat().st_size
+            digest = file_checksum(file_path) if checksum else None
+            self.conn.execute(
+                "INSERT OR REPLACE INTO downloads (video_id, format, path, size, checksum, downloaded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, download_format, str(file_path.resolve()), size, digest, time.time()))
+        except (OSError, sqlite3.Error) as e:
+            console.print(f"[orange3]Could not record {file_path.name} in the download archive: {e}[/orange3]")
+
+    def remove(self, video_id, download_format):
+        try:
+            self.conn.execute("DELETE FROM downloads WHERE video_id = ? AND format = ?", (video_id, download_format))
+        except sqlite3.Error:
+            pass
+
+    def mark_pending(self, url, download_format, download_path, filename_base=None, video_id=None):
+        """Remembers a download that has started, so it can be resumed if the app dies before it finishes."""
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO pending_downloads (url, format, path, filename_base, video_id, started_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, download_format, str(Path(download_path).resolve()), filename_base, video_id or video_id_from_url(url), time.time()))
+        except sqlite3.Error:
+            pass
+
+    def finish_pending(self, url, download_format):
+        try:
+            self.conn.execute("DELETE FROM pending_downloads WHERE url = ? AND format = ?", (url, download_format))
+        except sqlite3.Error:
+            pass
+
+    def pending(self, max_age=PENDING_DOWNLOAD_MAX_AGE):
+        """Returns (url, format, path, filename_base, video_id) of downloads that were started but never finished."""
+        try:
+            self.conn.execute("DELETE FROM pending_downloads WHERE started_at < ?", (time.time() - max_age,))
+            return self.conn.execute(
+                "SELECT url, format, path, filename_base, video_id FROM pending_downloads ORDER BY started_at").fetchall()
+        except sqlite3.Error:
+            return []
+
+    def count(self):
+        try:
+            return self.conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def rebuild(self, *directories, checksum=False):
+        """Re-creates the index from `{title}_{id}.{ext}` files in the given folders. Returns the entry count."""
+        entries = []
+        for directory in directories:
+            for file_path in Path(directory).iterdir():
+                match = ARCHIVE_FILENAME_RE.search(file_path.name)
+                if not match or not file_path.is_file():
+                    continue
+                video_id, ext = match.groups()
+                if ext.lower() not in VIDEO_EXTENSIONS | AUDIO_EXTENSIONS:
+                    continue
+                download_format = download_format_for_extension(ext)
+                entries.append((video_id, download_format, str(file_path.resolve()), file_path.stat().st_size,
+                                file_checksum(file_path) if checksum else None, file_path.stat().st_mtime))
+        with self.conn.transaction() as conn:
+            conn.execute("DELETE FROM downloads")
+            conn.executemany(
+                "INSERT OR REPLACE INTO downloads (video_id, format, path, size, checksum, downloaded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                entries)
+        return len(entries)
+
+
+download_archive = DownloadArchive()
+
+
+def is_local_media(media_url):
+    return bool(media_url) and not str(media_url).startswith(("http://", "https://")) and os.path.exists(media_url)
+
+
+class LocalLibrary:
+    """SQLite FTS5 index over titles, uploaders and tags of the files already downloaded."""
+
+    def __init__(self, db_name="library.sqlite3"):
+        self.conn = CacheDB(db_name)
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS library USING fts5("
+            "title, uploader, tags, video_id UNINDEXED, format UNINDEXED, path UNINDEXED, tokenize='unicode61 remove_diacritics 2')")
+
+    def add(self, video_id, download_format, file_path, title, uploader="", tags=()):
+        if not video_id or not file_path:
+            return
+        try:
+            with self.conn.transaction() as conn:
+                conn.execute("DELETE FROM library WHERE video_id = ? AND format = ?", (video_id, download_format))
+                conn.execute("INSERT INTO library (title, uploader, tags, video_id, format, path) VALUES (?, ?, ?, ?, ?, ?)",
+                             (title or "", uploader or "", " ".join(tags or ()), video_id, download_format, str(file_path)))
+        except sqlite3.Error as e:
+            console.print(f"[orange3]Could not add {Path(file_path).name} to the local library: {e}[/orange3]")
+
+    @staticmethod
+    def _match_expression(query):
+        # Every word must match as a prefix; quoting keeps FTS syntax characters in the query harmless
+        words = re.findall(r"\w+", query, flags=re.UNICODE)
+        return " ".join(f'"{word}"*' for word in words)
+
+    def search(self, query, limit=MAX_SEARCH_RESULTS, download_format=None):
+        """Returns (title, path, id) tuples for local files matching query, best match first."""
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        sql = "SELECT title, path, video_id FROM library WHERE library MATCH ?"
+        params = [expression]
+        if download_format:
+            sql += " AND format = ?"
+            params.append(download_format)
+        sql += " ORDER BY bm25(library, 10.0, 2.0, 1.0) LIMIT ?"
+        try:
+            rows = self.conn.execute(sql, params + [limit * 2]).fetchall()
+        except sqlite3.Error:
+            return []
+        hits, seen_ids = [], set()
+        for title, path, video_id in rows:
+            if video_id in seen_ids or not os.path.exists(path):
+                continue
+            seen_ids.add(video_id)
+            hits.append((title, path, video_id))
+        return hits[:limit]
+
+    def rebuild(self, *directories):
+        """Re-creates the index from `{title}_{id}.{ext}` filenames. Uploader and tags aren't in the filename, so they stay empty."""
+        entries = []
+        for directory in directories:
+            for file_path in Path(directory).iterdir():
+                match = ARCHIVE_FILENAME_RE.search(file_path.name)
+                if not match or not file_path.is_file():
+                    continue
+                video_id, ext = match.groups()
+                if ext.lower() not in VIDEO_EXTENSIONS | AUDIO_EXTENSIONS:
+                    continue
+                download_format = download_format_for_extension(ext)
+                title = file_path.name[:match.start()].replace("_", " ").strip()
+                entries.append((title, "", "", video_id, download_format, str(file_path.resolve())))
+        with self.conn.transaction() as conn:
+            conn.execute("DELETE FROM library")
+            conn.executemany("INSERT INTO library (title, uploader, tags, video_id, format, path) VALUES (?, ?, ?, ?, ?, ?)", entries)
+        return len(entries)
+
+
+local_library = LocalLibrary()
+
+
+def record_download(info, download_format, file_path):
+    """Adds a finished download to the archive index and the local library."""
+    if not info or not file_path:
+        return
+    download_archive.record(info.get('id'), download_format, file_path)
+    download_archive.finish_pending(info.get('original_url') or info.get('webpage_url'), download_format)
+    local_library.add(info.get('id'), download_format, Path(file_path).resolve(), info.get('title'),
+                      info.get('uploader') or info.get('channel'), info.get('tags') or ())
+
+
+class AudioCache:
+    """Size-bounded on-disk cache of streamed audio keyed by (video id, format), evicting least recently played.
+
+    mpv records each streamed track to a partial file (its `stream-record` option remuxes the packets
+    it receives into Matroska, so nothing is downloaded twice). The partial file is committed only when
+    the track played through to the end without seeking, since a seek leaves a hole in the recording.
+    """
+
+    RECORDING_SUFFIX = ".recording.mka"
+
+    def __init__(self, directory=AUDIO_CACHE_PATH, max_bytes=AUDIO_CACHE_MAX_BYTES, db_name="audio_cache.sqlite3"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.conn = CacheDB(db_name)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS audio_cache (video_id TEXT NOT NULL, format TEXT NOT NULL, "
+            "path TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (video_id, format))")
+        self._remove_stale_recordings()
+
+    def _file_stem(self, video_id, audio_format):
+        return f"{video_id}.{hashlib.sha1(audio_format.encode('utf-8')).hexdigest()[:8]}"
+
+    def _remove_stale_recordings(self, max_age=24 * 60 * 60):
+        # Left behind by tracks that never finished in a session that crashed
+        for recording in self.directory.glob(f"*{self.RECORDING_SUFFIX}"):
+            try:
+                if recording.stat().st_mtime < time.time() - max_age:
+                    recording.unlink()
+            except OSError:
+                pass
+
+    def lookup(self, video_id, audio_format=STREAM_AUDIO_FORMAT):
+        """Returns the cached file for video_id and marks it as just used, or None."""
+        if not video_id or self.max_bytes <= 0:
+            return None
+        try:
+            row = self.conn.execute("SELECT path FROM audio_cache WHERE video_id = ? AND format = ?",
+                                    (video_id, audio_format)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row[0]):
+                self.conn.execute("DELETE FROM audio_cache WHERE video_id = ? AND format = ?", (video_id, audio_format))
+                return None
+            self.conn.execute("UPDATE audio_cache SET last_used = ? WHERE video_id = ? AND format = ?",
+                              (time.time(), video_id, audio_format))
+        except sqlite3.Error:
+            return None
+        return Path(row[0])
+
+    def recording_path(self, video_id, audio_format=STREAM_AUDIO_FORMAT):
+        """Where mpv should record the stream of video_id while it plays."""
+        if not video_id or self.max_bytes <= 0:
+            return None
+        return self.directory / f"{self._file_stem(video_id, audio_format)}.{uuid.uuid4().hex[:8]}{self.RECORDING_SUFFIX}"
+
+    def commit(self, video_id, recording, audio_format=STREAM_AUDIO_FORMAT):
+        """Moves a complete recording into the cache and evicts the least recently used tracks over budget."""
+        recording = Path(recording)
+        try:
+            size = recording.stat().st_size
+        except OSError:
+            return None
+        if size == 0 or size > self.max_bytes:
+            self.discard(recording)
+            return None
+        final_path = self.directory / f"{self._file_stem(video_id, audio_format)}.mka"
+        try:
+            os.replace(recording, final_path)
+            self.conn.execute("INSERT OR REPLACE INTO audio_cache (video_id, format, path, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                              (video_id, audio_format, str(final_path), size, time.time()))
+        except (OSError, sqlite3.Error):
+            self.discard(recording)
+            return None
+        self.evict()
+        return final_path
+
+    def discard(self, recording):
+        try:
+            Path(recording).unlink()
+        except OSError:
+            pass  # mpv may still hold it open on Windows; _remove_stale_recordings gets it later
+
+    def evict(self):
+        try:
+            rows = self.conn.execute("SELECT video_id, format, path, size FROM audio_cache ORDER BY last_used DESC").fetchall()
+        except sqlite3.Error:
+            return
+        total = 0
+        for video_id, audio_format, path, size in rows:
+            total += size
+            if total <= self.max_bytes:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            try:
+                self.conn.execute("DELETE FROM audio_cache WHERE video_id = ? AND format = ?", (video_id, audio_format))
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        """Returns (cached tracks, total bytes)."""
+        try:
+            count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio_cache").fetchone()
+        except sqlite3.Error:
+            return 0, 0
+        return count, size
+
+    def clear(self):
+        try:
+            paths = [row[0] for row in self.conn.execute("SELECT path FROM audio_cache").fetchall()]
+            self.conn.execute("DELETE FROM audio_cache")
+        except sqlite3.Error:
+            return
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+audio_cache = AudioCache()
+
+
+# --- Latency Tracing ---
+class LatencyTracer:
+    """Records how long each stage between a query and the first audio frame takes, as JSON lines.
+
+    A trace starts when the user submits a query (begin()); stages recorded after that carry its
+    trace id. Each line looks like
+    {"ts": ..., "session": ..., "trace": ..., "stage": "resolve", "ms": 812.4, "cached": false}.
+    """
+
+    def __init__(self, path=TRACE_PATH, enabled=TRACE_ENABLED, max_bytes=TRACE_MAX_BYTES):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.session_id = uuid.uuid4().hex[:12]
+        self.trace_id = None
+        self.trace_started = None
+        self.selection_ms = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self, kind="stream"):
+        """Starts a new query-to-audio trace."""
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.trace_started = time.perf_counter()
+        self.selection_ms = 0.0
+        self.record("trace_start", 0.0, kind=kind)
+
+    def record(self, stage, duration_ms, **attrs):
+        if not self.enabled:
+            return
+        line = json.dumps({"ts": time.time(), "session": self.session_id, "trace": self.trace_id,
+                           "stage": stage, "ms": round(duration_ms, 3), **attrs}, default=str)
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as trace_file:
+                    trace_file.write(line + "\n")
+                    size = trace_file.tell()
+                if size > self.max_bytes:
+                    os.replace(self.path, rotated_trace_path(self.path))
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def span(self, stage, **attrs):
+        """Times the enclosed block; attrs may be updated inside it (e.g. attrs['cached'] = True)."""
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000, **attrs)
+
+    def record_selection(self, duration_ms):
+        self.selection_ms += duration_ms
+        self.record("selection", duration_ms)
+
+    def watch_first_audio(self, ipc):
+        """Records the time until mpv's first playback-restart / audio-reconfig event after a loadfile.
+        Returns a function that stops watching, for when the loadfile fails."""
+        if not self.enabled:
+            return lambda: None
+        loaded_at = time.perf_counter()
+        trace_started, selection_ms = self.trace_started, self.selection_ms
+        done = threading.Event()
+
+        def unwatch():
+            ipc.off('playback-restart', on_first_audio)
+            ipc.off('audio-reconfig', on_first_audio)
+
+        def on_first_audio(message):
+            if done.is_set():
+                return
+            done.set()
+            unwatch()
+            now = time.perf_counter()
+            self.record("load_to_first_audio", (now - loaded_at) * 1000, event=message.get('event'))
+            if trace_started is not None:
+                total_ms = (now - trace_started) * 1000
+                self.record("time_to_first_audio", total_ms)
+                self.record("time_to_first_audio_excl_selection", total_ms - selection_ms)
+
+        ipc.on('playback-restart', on_first_audio)
+        ipc.on('audio-reconfig', on_first_audio)
+        return unwatch
+
+
+def rotated_trace_path(path):
+    path = Path(path)
+    return path.with_name(path.name + ".1")
+
+
+tracer = LatencyTracer()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_traces(path=TRACE_PATH):
+    """Returns {stage: sorted durations in ms} across the sessions in the trace file and its rotated predecessor."""
+    durations = {}
+    for trace_path in (rotated_trace_path(path), Path(path)):
+        try:
+            with open(trace_path, encoding="utf-8") as trace_file:
+                for line in trace_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("stage") == "trace_start" or entry.get("error"):
+                        continue
+                    stage = entry["stage"] + (" (cached)" if entry.get("cached") else "")
+                    durations.setdefault(stage, []).append(float(entry["ms"]))
+        except OSError:
+            continue
+    return {stage: sorted(values) for stage, values in durations.items()}
+
+
+def print_trace_summary(path=TRACE_PATH, output_console=None):
+    durations = summarize_traces(path)
+    if not durations:
+        console.print(f"[orange3]No latency traces recorded yet in {path}.[/orange3]")
+        return False
+    table = rich_table.Table(title="Latency per stage (ms, all sessions)", header_style="bold magenta", border_style="dim blue")
+    table.add_column("Stage", style="cyan")
+    for column in ("Count", "p50", "p95", "p99"):
+        table.add_column(column, justify="right")
+    for stage, values in sorted(durations.items()):
+        table.add_row(stage, str(len(values)), *(f"{percentile(values, q):.1f}" for q in (0.50, 0.95, 0.99)))
+    (output_console or console).print(table)
+    return True
+
+
+# --- Extractor Pool ---
+class YdlPool:
+    """Keeps configured YoutubeDL instances warm, one idle stack per option profile.
+
+    Reusing an instance keeps its initialized extractors, YouTube player JS / signature caches and
+    the HTTP keep-alive connections of its request director. A YoutubeDL isn't safe to share
+    between threads, so each borrower gets an instance to itself; concurrent borrowers of the same
+    profile get extra instances, and up to max_idle of them are kept for reuse.
+    """
+
+    def __init__(self, max_idle=YDL_POOL_MAX_IDLE):
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _profile_key(ydl_opts):
+        return json.dumps(ydl_opts, sort_keys=True, default=repr)
+
+    def _new_instance(self, ydl_opts):
+        return yt_dlp.YoutubeDL(dict(ydl_opts))
+
+    def _create(self, ydl_opts):
+        ydl = self._new_instance(ydl_opts)
+        # A single permanent hook that forwards to whoever currently holds the instance
+        ydl._pool_progress_hook = None
+        ydl.add_progress_hook(lambda d: ydl._pool_progress_hook and ydl._pool_progress_hook(d))
+        # Plain HTTP formats are fetched as parallel, resumable range chunks; everything else keeps yt-dlp's downloaders
+        yt_dlp_dl = ydl.dl
+        ydl.dl = lambda name, info, subtitle=False, test=False: chunked_dl(ydl, yt_dlp_dl, name, info, subtitle, test)
+        return ydl
+
+    @contextlib.contextmanager
+    def borrow(self, ydl_opts, progress_hook=None, outtmpl=None):
+        """Lends out a YoutubeDL built from ydl_opts. progress_hook and outtmpl apply only to this loan."""
+        key = self._profile_key(ydl_opts)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            ydl = idle.pop() if idle else None
+            if ydl is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if ydl is None:
+            ydl = self._create(ydl_opts)
+        ydl._pool_progress_hook = progress_hook
+        profile_outtmpl = ydl.params['outtmpl'].get('default')
+        if outtmpl is not None:
+            ydl.params['outtmpl']['default'] = outtmpl
+        healthy = False
+        try:
+            yield ydl
+            healthy = True
+        finally:
+            ydl._pool_progress_hook = None
+            # The next borrower of this profile gets the profile's own template back
+            if profile_outtmpl is None:
+                ydl.params['outtmpl'].pop('default', None)
+            else:
+                ydl.params['outtmpl']['default'] = profile_outtmpl
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                keep = healthy and len(idle) < self.max_idle
+                if keep:
+                    idle.append(ydl)
+            if not keep:
+                ydl.close()
+
+    def close(self):
+        with self._lock:
+            idle_instances = [ydl for idle in self._idle.values() for ydl in idle]
+            self._idle = {}
+        for ydl in idle_instances:
+            ydl.close()
+
+
+ydl_pool = YdlPool()
+
+
+# --- Stream Proxy ---
+class UpstreamPool:
+    """Keep-alive HTTP(S) connections to the CDN, reused across chunk fetches, one idle stack per host."""
+
+    def __init__(self, max_idle_per_host=PROXY_UPSTREAM_CONNECTIONS, timeout=PROXY_UPSTREAM_TIMEOUT):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, scheme, netloc):
+        connection_class = http_client.HTTPSConnection if scheme == "https" else http_client.HTTPConnection
+        connection = connection_class(netloc, timeout=self.timeout)
+        connection._pool_key = (scheme, netloc)
+        return connection
+
+    def _connect(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(scheme, netloc), False
+
+    def release(self, connection, response):
+        """Returns a connection for reuse once its response has been read to the end."""
+        parts = getattr(connection, '_pool_key', None)
+        if parts is None or response.will_close or not response.isclosed():
+            connection.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(parts, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def get(self, url, headers, max_redirects=3):
+        """Sends a GET and returns (connection, response); hand both back to release() when done."""
+        for _ in range(max_redirects + 1):
+            parts = urlparse(url)
+            path = parts.path + (f"?{parts.query}" if parts.query else "")
+            connection, reused = self._connect(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            except (OSError, http_client.HTTPException):
+                connection.close()
+                if not reused:
+                    raise
+                # The CDN closed the idle connection; one retry on a fresh one
+                connection = self._new_connection(parts.scheme, parts.netloc)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                response.read()
+                self.release(connection, response)
+                continue
+            return connection, response
+        raise http_client.HTTPException(f"too many redirects for {url}")
+
+    def close(self):
+        with self._lock:
+            idle_connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle = {}
+        for connection in idle_connections:
+            connection.close()
+
+
+class CachedStream:
+    """One upstream audio stream, mirrored into a sparse file in fixed-size chunks.
+
+    Readers ask for any byte offset. A chunk that isn't on disk yet is fetched from upstream as a
+    whole (read-ahead: far more than mpv asks for at once). Bytes are handed to readers as they
+    arrive, so the first audio doesn't wait for the full chunk. Finished chunks are listed in a
+    JSON sidecar, so repeat plays and backward seeks are served from disk, even in later sessions.
+    """
+
+    def __init__(self, key, upstream_url, directory, chunk_size, upstream_pool, fetch_executor):
+        self.key = key
+        self.upstream_url = upstream_url
+        self.chunk_size = chunk_size
+        self.data_path = Path(directory) / f"{key}.data"
+        self.meta_path = Path(directory) / f"{key}.json"
+        self.upstream_pool = upstream_pool
+        self.fetch_executor = fetch_executor
+        self.size = None
+        self.content_type = "application/octet-stream"
+        self.chunks = set()
+        self._filling = {}  # chunk index -> bytes received so far
+        self._errors = {}
+        self.readers = 0  # requests being served from this stream; StreamProxy keeps it open while nonzero
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._load_meta()
+        self._file = open(self.data_path, "r+b" if self.data_path.exists() else "w+b")
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return
+        if meta.get("chunk_size") == self.chunk_size and self.data_path.exists():
+            self.size = meta.get("size")
+            self.content_type = meta.get("content_type") or self.content_type
+            self.chunks = set(meta.get("chunks", []))
+
+    def _save_meta(self):
+        meta = {"chunk_size": self.chunk_size, "size": self.size, "content_type": self.content_type, "chunks": sorted(self.chunks)}
+        try:
+            with open(self.meta_path, "w", encoding="utf-8") as meta_file:
+                json.dump(meta, meta_file)
+        except OSError:
+            pass
+
+    @property
+    def chunk_count(self):
+        return math.ceil(self.size / self.chunk_size) if self.size else 0
+
+    def _chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def ensure_size(self):
+        """Learns the total length (from chunk 0's Content-Range) if it isn't known yet."""
+        if self.size is None:
+            self.read(0, 1)
+        return self.size
+
+    def read(self, position, max_length):
+        """Returns up to max_length bytes at position (fewer at a chunk boundary), fetching upstream if needed."""
+        index, offset = divmod(position, self.chunk_size)
+        with self._cond:
+            while True:
+                if self.size is not None and position >= self.size:
+                    return b""
+                if index in self.chunks:
+                    available = self._chunk_length(index)
+                    break
+                if index in self._errors:
+                    raise self._errors.pop(index)
+                if index in self._filling:
+                    if self._filling[index] > offset:
+                        available = self._filling[index]
+                        break
+                else:
+                    self._start_fetch(index)
+                self._cond.wait()
+        with self._io_lock:
+            self._file.seek(position)
+            return self._file.read(min(max_length, available - offset))
+
+    def prefetch(self, first_index, count):
+        """Starts fetching the chunks after the one being read, so playback stays ahead of a slow CDN."""
+        with self._cond:
+            for index in range(first_index, min(first_index + count, self.chunk_count)):
+                if index not in self.chunks and index not in self._filling:
+                    self._start_fetch(index)
+
+    def _start_fetch(self, index):
+        # Called with self._cond held
+        self._filling[index] = 0
+        try:
+            self.fetch_executor.submit(self._fetch, index)
+        except RuntimeError as e:  # executor already shut down
+            del self._filling[index]
+            self._errors[index] = OSError(str(e))
+
+    def _fetch(self, index):
+        start = index * self.chunk_size
+        end = start + self.chunk_size - 1 if self.size is None else start + self._chunk_length(index) - 1
+        connection = response = None
+        try:
+            connection, response = self.upstream_pool.get(self.upstream_url, {"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"})
+            if response.status not in (200, 206):
+                raise OSError(f"upstream answered HTTP {response.status}")
+            if response.status == 200 and start > 0:
+                raise OSError("upstream ignored the Range header")
+            with self._cond:
+                if self.size is None:
+                    content_range = response.getheader("Content-Range") or ""
+                    total = content_range.rsplit("/", 1)[-1]
+                    self.size = int(total) if total.isdigit() else int(response.getheader("Content-Length") or 0)
+                    self.content_type = response.getheader("Content-Type") or self.content_type
+            expected = self._chunk_length(index)
+            received = 0
+            while received < expected:
+                piece = response.read(min(PROXY_READ_SIZE, expected - received))
+                if not piece:
+                    raise OSError(f"upstream closed after {received} of {expected} bytes")
+                with self._io_lock:
+                    self._file.seek(start + received)
+                    self._file.write(piece)
+                received += len(piece)
+                with self._cond:
+                    self._filling[index] = received
+                    self._cond.notify_all()
+            if response.status == 206:
+                response.read()  # drain, so the connection can go back to the pool
+            with self._io_lock:
+                self._file.flush()
+            with self._cond:
+                self._filling.pop(index, None)
+                self.chunks.add(index)
+                self._save_meta()
+                self._cond.notify_all()
+        except (OSError, ValueError, http_client.HTTPException) as e:
+            with self._cond:
+                self._filling.pop(index, None)
+                self._errors[index] = e if isinstance(e, OSError) else OSError(str(e))
+                self._cond.notify_all()
+        finally:
+            if connection is not None:
+                if response is None or not response.isclosed():
+                    connection.close()
+                else:
+                    self.upstream_pool.release(connection, response)
+
+    def fetching(self):
+        with self._cond:
+            return bool(self._filling)
+
+    def close(self):
+        with self._io_lock:
+            self._file.close()
+
+
+class StreamProxy:
+    """Localhost HTTP proxy between mpv and googlevideo with a sparse, chunked disk cache.
+
+    url_for() maps a resolved stream URL to http://127.0.0.1:<port>/stream/<key>, keyed by video id
+    and format, so a fresh URL for the same track reuses what is already on disk. mpv's range
+    requests are answered chunk by chunk from CachedStream. Seeking back into audio that has
+    already been heard never goes to the network.
+
+    Only PROXY_OPEN_STREAMS idle streams stay open; the rest are closed and reopened from disk when
+    mpv asks for them again, so a long-running session doesn't pile up file descriptors.
+    """
+
+    def __init__(self, directory=PROXY_CACHE_PATH, chunk_size=PROXY_CHUNK_SIZE, read_ahead=PROXY_READ_AHEAD_CHUNKS,
+                 max_bytes=PROXY_CACHE_MAX_BYTES, max_open_streams=PROXY_OPEN_STREAMS):
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.read_ahead = read_ahead
+        self.max_bytes = max_bytes
+        self.max_open_streams = max_open_streams
+        self.streams = collections.OrderedDict()  # key -> open CachedStream, least recently used first
+        self.upstream_urls = collections.OrderedDict()  # key -> latest upstream URL, to (re)open the stream from
+        self._lock = threading.Lock()
+        self._server = None
+        self._upstream_pool = None
+        self._fetch_executor = None
+
+    def _start(self):
+        # Called with self._lock held
+        if self._server is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._upstream_pool = UpstreamPool()
+        self._fetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PROXY_FETCH_WORKERS, thread_name_prefix="proxy-fetch")
+        proxy = self
+
+        class StreamRequestHandler(http_server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+            def do_GET(self):
+                self._respond(send_body=True)
+
+            def _respond(self, send_body):
+                stream = proxy.open_stream(self.path.rsplit("/", 1)[-1]) if self.path.startswith("/stream/") else None
+                if stream is None:
+                    self.send_error(404)
+                    return
+                try:
+                    self._send_stream(stream, send_body)
+                finally:
+                    proxy.release_stream(stream)
+
+            def _send_stream(self, stream, send_body):
+                try:
+                    size = stream.ensure_size()
+                except OSError as e:
+                    self.send_error(502, explain=str(e))
+                    return
+                start, end = 0, size - 1
+                range_match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+                if range_match and (range_match.group(1) or range_match.group(2)):
+                    if range_match.group(1):
+                        start = int(range_match.group(1))
+                        end = min(int(range_match.group(2)), size - 1) if range_match.group(2) else size - 1
+                    else:
+                        start = max(0, size - int(range_match.group(2)))
+                    if start >= size or start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", stream.content_type)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                if not send_body:
+                    return
+                position = start
+                try:
+                    while position <= end:
+                        data = stream.read(position, min(PROXY_READ_SIZE, end - position + 1))
+                        if not data:
+                            break
+                        stream.prefetch(position // stream.chunk_size + 1, proxy.read_ahead)
+                        self.wfile.write(data)
+                        position += len(data)
+                except (OSError, ValueError):
+                    # mpv hung up (usually a seek) or upstream failed; either way this response is over
+                    self.close_connection = True
+
+        self._server = http_server.ThreadingHTTPServer(("127.0.0.1", 0), StreamRequestHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stream-proxy", daemon=True).start()
+
+    def url_for(self, upstream_url, video_id, audio_format=STREAM_AUDIO_FORMAT):
+        """Returns the localhost URL mpv should play instead of upstream_url."""
+        key = f"{video_id}.{hashlib.sha1(audio_format.encode('utf-8')).hexdigest()[:8]}"
+        with self._lock:
+            self._start()
+            self.upstream_urls[key] = upstream_url
+            self.upstream_urls.move_to_end(key)
+            while len(self.upstream_urls) > PROXY_KNOWN_STREAMS:
+                self.upstream_urls.popitem(last=False)
+            stream = self.streams.get(key)
+            if stream is not None:
+                stream.upstream_url = upstream_url  # a freshly resolved URL replaces an expired one
+            port = self._server.server_address[1]
+        return f"http://127.0.0.1:{port}/stream/{key}"
+
+    def open_stream(self, key):
+        """The CachedStream behind a proxy URL, opened if needed and held open until release_stream()."""
+        with self._lock:
+            stream = self.streams.get(key)
+            if stream is None:
+                upstream_url = self.upstream_urls.get(key)
+                if upstream_url is None or self._server is None:
+                    return None
+                self._evict(keep=key)
+                try:
+                    stream = CachedStream(key, upstream_url, self.directory, self.chunk_size, self._upstream_pool, self._fetch_executor)
+                except OSError:
+                    return None
+                self.streams[key] = stream
+            self.streams.move_to_end(key)
+            stream.readers += 1
+            self._close_idle()
+            return stream
+
+    def release_stream(self, stream):
+        with self._lock:
+            stream.readers -= 1
+            self._close_idle()
+
+    def _close_idle(self):
+        # Called with self._lock held
+        excess = len(self.streams) - self.max_open_streams
+        for key, stream in list(self.streams.items()):
+            if excess <= 0:
+                break
+            if stream.readers or stream.fetching():
+                continue
+            stream.close()
+            del self.streams[key]
+            excess -= 1
+
+    def _evict(self, keep):
+        """Deletes the least recently used cached streams until the directory fits in max_bytes.
+        Called with self._lock held; streams being read or fetched are left alone."""
+        entries = []
+        for meta_path in self.directory.glob("*.json"):
+            data_path = meta_path.with_suffix(".data")
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path, data_path,
+                                data_path.stat().st_size if data_path.exists() else 0))
+            except OSError:
+                continue
+        total = sum(entry[3] for entry in entries)
+        for _mtime, meta_path, data_path, size in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if meta_path.stem == keep:
+                continue
+            stream = self.streams.get(meta_path.stem)
+            if stream is not None:
+                if stream.readers or stream.fetching():
+                    continue
+                stream.close()
+                del self.streams[meta_path.stem]
+            for path in (meta_path, data_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+
+    def close(self):
+        with self._lock:
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+            if self._fetch_executor is not None:
+                self._fetch_executor.shutdown(wait=False, cancel_futures=True)
+            if self._upstream_pool is not None:
+                self._upstream_pool.close()
+            for stream in self.streams.values():
+                stream.close()
+            self.streams.clear()
+            self.upstream_urls.clear()
+
+
+stream_proxy = StreamProxy()
+
+
+# --- Chunked Downloads ---
+class ChunkedDownload:
+    """One HTTP(S) file fetched as byte-range chunks over several connections at once.
+
+    YouTube throttles each connection, so DOWNLOAD_CONNECTIONS ranges are in flight together.
+    Chunks are written at their offset into the `.part` file yt-dlp would use, and every finished
+    chunk is added to a JSON journal next to it. A download stopped by Ctrl+C, a crash or a network
+    error continues from the journal the next time the same file is requested, even with a freshly
+    resolved URL; only the chunks that were in flight are fetched again.
+    """
+
+    def __init__(self, url, filename, headers=None, size=None, chunk_size=DOWNLOAD_CHUNK_SIZE, connections=DOWNLOAD_CONNECTIONS):
+        self.url = url
+        self.filename = Path(filename)
+        self.part_path = Path(f"{filename}.part")
+        self.journal_path = Path(f"{filename}.part.chunks.json")
+        self.headers = {**(headers or {}), "Accept-Encoding": "identity"}
+        self.size = size
+        self.chunk_size = chunk_size
+        self.connections = max(1, connections)
+        self.chunks = set()
+        self.downloaded_bytes = 0
+        self.resumed_bytes = 0
+        self.upstream_pool = UpstreamPool(max_idle_per_host=self.connections)
+        self._file = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def chunk_count(self):
+        return math.ceil(self.size / self.chunk_size) if self.size else 0
+
+    def _chunk_range(self, index):
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size) - 1
+
+    def _load_journal(self):
+        """Picks up the chunks of an earlier attempt at the same file. Returns True if there were any."""
+        try:
+            with open(self.journal_path, encoding="utf-8") as journal_file:
+                journal = json.load(journal_file)
+        except (OSError, ValueError):
+            journal = None
+        if journal and self.part_path.exists() and journal.get("chunk_size") == self.chunk_size \
+                and journal.get("size") and journal.get("size") == (self.size or journal.get("size")):
+            self.size = journal["size"]
+            self.chunks = set(journal.get("chunks", []))
+        elif journal is None and self.size and self.part_path.exists():
+            # A .part left behind by yt-dlp's own downloader: its bytes are contiguous from the start
+            complete = min(self.part_path.stat().st_size, self.size) // self.chunk_size
+            self.chunks = set(range(complete)) if complete < self.chunk_count else set()
+        self.resumed_bytes = self.downloaded_bytes = sum(self._chunk_range(index)[1] - self._chunk_range(index)[0] + 1
+                                                         for index in self.chunks)
+        return bool(self.chunks)
+
+    def _save_journal(self):
+        # Called with self._lock held. Written to a temporary file first, so a crash never leaves half a journal.
+        journal = {"size": self.size, "chunk_size": self.chunk_size, "chunks": sorted(self.chunks)}
+        temp_path = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as journal_file:
+            json.dump(journal, journal_file)
+        os.replace(temp_path, self.journal_path)
+
+    def _probe(self):
+        """Asks for one byte to learn the size and whether the server honours ranges at all."""
+        connection, response = self.upstream_pool.get(self.url, {**self.headers, "Range": "bytes=0-0"})
+        try:
+            if response.status != 206:
+                return False
+            total = (response.getheader("Content-Range") or "").rsplit("/", 1)[-1]
+            if not total.isdigit():
+                return False
+            self.size = int(total)
+            response.read()
+            return True
+        finally:
+            if response.isclosed():
+                self.upstream_pool.release(connection, response)
+            else:
+                connection.close()
+
+    def _fetch_chunk(self, index):
+        start, end = self._chunk_range(index)
+        for attempt in range(DOWNLOAD_CHUNK_RETRIES + 1):
+            connection = response = None
+            received = 0
+            try:
+                connection, response = self.upstream_pool.get(self.url, {**self.headers, "Range": f"bytes={start}-{end}"})
+                if response.status != 206:
+                    raise OSError(f"upstream answered HTTP {response.status} to a range request")
+                total = (response.getheader("Content-Range") or "").rsplit("/", 1)[-1]
+                if total.isdigit() and int(total) != self.size:
+                    raise OSError(f"upstream file is now {total} bytes, expected {self.size}")
+                while start + received <= end:
+                    if self._stop.is_set():
+                        return
+                    piece = response.read(min(PROXY_READ_SIZE, end - start - received + 1))
+                    if not piece:
+                        raise OSError(f"upstream closed after {received} of {end - start + 1} bytes")
+                    with self._lock:
+                        self._file.seek(start + received)
+                        self._file.write(piece)
+                        self.downloaded_bytes += len(piece)
+                    received += len(piece)
+                response.read()  # drain, so the connection can go back to the pool
+                with self._lock:
+                    self._file.flush()
+                    self.chunks.add(index)
+                    self._save_journal()
+                return
+            except (OSError, http_client.HTTPException) as e:
+                with self._lock:
+                    self.downloaded_bytes -= received
+                if attempt == DOWNLOAD_CHUNK_RETRIES or self._stop.is_set():
+                    raise OSError(f"chunk {index} (bytes {start}-{end}): {e}") from e
+                time.sleep(0.5 * 2 ** attempt)
+            finally:
+                if connection is not None:
+                    if response is None or not response.isclosed():
+                        connection.close()
+                    else:
+                        self.upstream_pool.release(connection, response)
+
+    def run(self, progress_callback=None, progress_interval=0.25):
+        """Fetches the missing chunks and renames the .part file into place.
+
+        Returns False, before writing anything, if the server doesn't do range requests. Errors,
+        KeyboardInterrupt and exceptions raised by progress_callback stop the workers and propagate;
+        the journal keeps what was finished for the next attempt.
+        """
+        try:
+            if not self._load_journal() and not self._probe():
+                return False
+            self._file = open(self.part_path, "r+b" if self.chunks else "w+b")
+            with self._lock:
+                self._save_journal()
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="download-chunk")
+            try:
+                pending = {executor.submit(self._fetch_chunk, index) for index in range(self.chunk_count) if index not in self.chunks}
+                while pending:
+                    # Progress goes out whenever a chunk finishes, and at least every progress_interval
+                    done, pending = concurrent.futures.wait(pending, timeout=progress_interval,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    if progress_callback is not None:
+                        progress_callback(self)
+            except BaseException:
+                self._stop.set()
+                raise
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+                self._file.close()
+        finally:
+            self.upstream_pool.close()
+        os.replace(self.part_path, self.filename)
+        try:
+            self.journal_path.unlink()
+        except OSError:
+            pass
+        return True
+
+
+def chunked_dl(ydl, yt_dlp_dl, name, info, subtitle=False, test=False):
+    """YoutubeDL.dl for pooled instances: routes plain HTTP(S) formats bigger than one chunk through
+    ChunkedDownload and hands everything else (HLS/DASH fragments, subtitles, stdout, tests) to
+    yt-dlp, which already uses concurrent_fragment_downloads and resumes its own .part files."""
+    size = info.get('filesize')
+    if (DOWNLOAD_CONNECTIONS < 2 or subtitle or test or name == '-' or info.get('requested_formats')
+            or info.get('protocol') not in ('http', 'https') or info.get('is_live')
+            or (size and size <= DOWNLOAD_CHUNK_SIZE) or os.path.isfile(name)):
+        return yt_dlp_dl(name, info, subtitle=subtitle, test=test)
+    download = ChunkedDownload(info['url'], name, info.get('http_headers'), size, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_CONNECTIONS)
+    started = time.monotonic()
+
+    def report_progress(download, status='downloading'):
+        hook = ydl._pool_progress_hook
+        if hook is None:
+            return
+        elapsed = time.monotonic() - started
+        speed = (download.downloaded_bytes - download.resumed_bytes) / elapsed if elapsed > 0 else None
+        hook({'status': status, 'filename': name, 'tmpfilename': str(download.part_path), 'info_dict': info,
+              'downloaded_bytes': download.downloaded_bytes, 'total_bytes': download.size, 'elapsed': elapsed,
+              'speed': speed, 'eta': (download.size - download.downloaded_bytes) / speed if speed else None})
+
+    try:
+        completed = download.run(report_progress)
+    except (OSError, http_client.HTTPException) as e:
+        raise yt_dlp.utils.DownloadError(f"Chunked download of {Path(name).name} failed: {e}") from e
+    if not completed:
+        if download.journal_path.exists():
+            # The .part is sparse, so yt-dlp must not append to it
+            for path in (download.part_path, download.journal_path):
+                with contextlib.suppress(OSError):
+                    path.unlink()
+        return yt_dlp_dl(name, info, subtitle=subtitle, test=test)
+    report_progress(download, 'finished')
+    return True, True
+
+
+# --- Core YouTube Functions ---
+def _entry_to_video(entry):
+    """Turns a yt-dlp (flat) entry into the (title, url, id) tuple used throughout the app."""
+    if not entry or not entry.get('title') or not entry.get('id'):
+        return None
+    video_id = entry.get('id')
+    video_url = entry.get('webpage_url') or entry.get('url')
+    if not video_url or 'watch?v=' not in str(video_url):
+        video_url = f"https://www.youtube.com/watch?v={video_id}"
+    return (entry['title'], video_url, video_id)
+
+
+def iter_search_youtube(query, max_results=MAX_SEARCH_RESULTS, use_cache=True, report_errors=True):
+    """Yields (title, url, id) tuples as yt-dlp's flat extraction produces them, so callers can show
+    the first results while later ones are still being fetched."""
+    if use_cache:
+        cached_videos = search_cache.get(query, max_results)
+        if cached_videos:
+            tracer.record("search", 0.0, cached=True, results=len(cached_videos))
+            yield from cached_videos
+            return
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+    }
+    # process=False leaves `entries` as yt-dlp's lazy generator instead of a fully resolved list
+    search_target = query.strip() if "://" in query else f"ytsearch{max_results}:{query}"
+    videos = []
+    search_started = time.monotonic()
+    try:
+        with ydl_pool.borrow(ydl_opts) as ydl:
+            search_results = ydl.extract_info(search_target, download=False, process=False)
+            if search_results and search_results.get('entries') is not None:
+                for entry in search_results['entries']:
+                    video = _entry_to_video(entry)
+                    if video:
+                        metadata_enricher.note_flat(entry)
+                        videos.append(video)
+                        if len(videos) == 1:
+                            tracer.record("search_first_result", (time.monotonic() - search_started) * 1000)
+                        yield video
+                        if len(videos) >= max_results:
+                            break
+            else:
+                video = _entry_to_video(search_results)
+                if video:
+                    videos.append(video)
+                    yield video
+    except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError) as e:
+        if report_errors:
+            console.print(f"[bold red]❌ Error fetching results:[/bold red] {e}")
+        return
+    except Exception as e:
+        if report_errors:
+            console.print(f"[bold red]❌ An unexpected error occurred during search:[/bold red] {e}")
+        return
+
+    if not videos:
+        if report_errors:
+            console.print(f"[orange3]No videos found for '[italic]{query}[/italic]'. Try a different search term.[/orange3]")
+    else:
+        tracer.record("search", (time.monotonic() - search_started) * 1000, results=len(videos))
+        if use_cache:
+            search_cache.put(query, max_results, videos, time.monotonic() - search_started)
+
+
+def search_youtube(query, max_results=MAX_SEARCH_RESULTS, use_cache=True):
+    with rich_progress.Progress(
+        rich_progress.SpinnerColumn(spinner_name="dots12"),
+        rich_progress.TextColumn("[progress.description]{task.description}"),
+        transient=True,
+        console=console
+    ) as progress_bar:
+        search_task = progress_bar.add_task(description="[bold green]Searching YouTube...", total=None)
+        try:
+            return list(iter_search_youtube(query, max_results, use_cache))
+        finally:
+            progress_bar.update(search_task, completed=True)
+
 
+def _iter_collection(ydl, result, depth=0):
+    if not result:
+        return
+    if result.get('entries') is not None:
+        for entry in result['entries']:
+            yield from _iter_collection(ydl, entry, depth + 1)
+        return
+    # A channel URL resolves to its tabs (Videos, Shorts, Live), each a playlist of its own
+    if result.get('_type') in ('url', 'url_transparent') and (result.get('ie_key') == 'YoutubeTab' or is_collection_url(result.get('url'))):
+        if depth < 3:
+            yield from _iter_collection(ydl, ydl.extract_info(result['url'], download=False, process=False), depth + 1)
+        return
+    video = _entry_to_video(result)
+    if video:
+        yield video
 
-# --- Core YouTube Functions ---
-def search_youtube(query, max_results=MAX_SEARCH_RESULTS):
+
+def iter_collection_entries(url, report_errors=True):
+    """Yields (title, url, id) for every video of a playlist, mix or channel URL.
+
+    Flat extraction with process=False leaves yt-dlp's entries as a lazy generator that fetches one
+    continuation page at a time, so the first video comes out after a single request and memory
+    stays the same for a 20-entry playlist and a 5,000-video channel.
+    """
+    ydl_opts = {'quiet': True, 'extract_flat': 'in_playlist', 'skip_download': True, 'noplaylist': False}
+    count = 0
+    started = time.monotonic()
+    try:
+        with ydl_pool.borrow(ydl_opts) as ydl:
+            for video in _iter_collection(ydl, ydl.extract_info(url, download=False, process=False)):
+                count += 1
+                if count == 1:
+                    tracer.record("playlist_first_entry", (time.monotonic() - started) * 1000)
+                yield video
+    except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError) as e:
+        if report_errors:
+            console.print(f"[bold red]❌ Error listing {url}:[/bold red] {e}")
+    if not count and report_errors:
+        console.print(f"[orange3]No videos found in [italic]{url}[/italic].[/orange3]")
+
+
+class SearchPager:
+    """Cursor over search results beyond MAX_SEARCH_RESULTS, one page at a time.
+
+    A single lazy `ytsearchall:` extraction is kept open, so each new page continues where the last
+    one stopped instead of searching again from the top. Fetched results stay in memory, so going
+    back a page is free, and prefetch() pulls the next page on the engine while the user reads the
+    current one. The first page goes through the search cache like search_youtube.
+    """
+
+    def __init__(self, query, page_size=MAX_SEARCH_RESULTS):
+        self.query = query
+        self.page_size = page_size
+        self.results = []
+        self.exhausted = False
+        self.error = None
+        self._entries = None
+        self._skip = 0
+        self._lock = threading.Lock()
+        self._prefetching = {}
+
+    def _entry_stream(self):
+        ydl_opts = {'quiet': True, 'extract_flat': 'in_playlist', 'skip_download': True}
+        search_target = self.query.strip() if "://" in self.query else f"ytsearchall:{self.query}"
+        with ydl_pool.borrow(ydl_opts) as ydl:
+            search_results = ydl.extract_info(search_target, download=False, process=False)
+            if search_results and search_results.get('entries') is not None:
+                for entry in search_results['entries']:
+                    video = _entry_to_video(entry)
+                    if video:
+                        metadata_enricher.note_flat(entry)
+                        yield video
+            else:
+                video = _entry_to_video(search_results)
+                if video:
+                    yield video
+
+    def _pull_one(self):
+        with self._lock:
+            if self.exhausted:
+                return None
+            if self._entries is None:
+                self._entries = self._entry_stream()
+            try:
+                while True:
+                    video = next(self._entries)
+                    if self._skip:
+                        self._skip -= 1
+                        continue
+                    self.results.append(video)
+                    return video
+            except StopIteration:
+                self.exhausted = True
+            except Exception as e:
+                self.exhausted = True
+                self.error = e
+            return None
+
+    def iter_first_page(self):
+        """Yields the first page as it arrives."""
+        cached_videos = search_cache.get(self.query, self.page_size)
+        if cached_videos:
+            self.results = list(cached_videos)
+            self._skip = len(cached_videos)
+            tracer.record("search", 0.0, cached=True, results=len(cached_videos))
+            yield from cached_videos
+            return
+        search_started = time.monotonic()
+        for index in range(self.page_size):
+            video = self._pull_one()
+            if video is None:
+                break
+            if index == 0:
+                tracer.record("search_first_result", (time.monotonic() - search_started) * 1000)
+            yield video
+        if self.error is not None:
+            console.print(f"[bold red]❌ Error fetching results:[/bold red] {self.error}")
+        elif not self.results:
+            console.print(f"[orange3]No videos found for '[italic]{self.query}[/italic]'. Try a different search term.[/orange3]")
+        else:
+            tracer.record("search", (time.monotonic() - search_started) * 1000, results=len(self.results))
+            search_cache.put(self.query, self.page_size, self.results[:self.page_size], time.monotonic() - search_started)
+
+    def page(self, index):
+        """Returns page `index` (0-based), fetching it if needed. An empty list means there are no more results."""
+        end = (index + 1) * self.page_size
+        while len(self.results) < end and self._pull_one() is not None:
+            pass
+        return self.results[index * self.page_size:end]
+
+    def has_page(self, index):
+        return len(self.results) > index * self.page_size or not self.exhausted
+
+    def prefetch(self, index):
+        if len(self.results) >= (index + 1) * self.page_size or self.exhausted or index in self._prefetching:
+            return
+        self._prefetching[index] = engine.submit(engine.call(self.page, index, timeout=ENGINE_SEARCH_TIMEOUT))
+
+    def close(self):
+        for future in self._prefetching.values():
+            future.cancel()
+        # Don't wait for an in-flight background page; an unclosed generator is cleaned up when collected
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._entries is not None:
+                    self._entries.close()
+            finally:
+                self._lock.release()
+        self.exhausted = True
+
+
+class MetadataEnricher:
+    """Fills in duration, channel and view count for flat search results on a bounded background pool.
+
+    Flat extraction keeps search fast but drops most of each result's details. Whatever a flat
+    entry does carry is kept by note_flat() and shown at once; request() fetches the rest with a
+    full extraction, METADATA_WORKERS at a time, as rows are put on screen. Details are cached by
+    video id in memory and in MetadataCache, so no video is fetched twice, and the stream URL the
+    full extraction resolves goes into the stream URL cache, so playing an enriched result is instant.
+    """
+
+    def __init__(self, cache, workers=METADATA_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self.known = {}  # video id -> {'duration', 'channel', 'view_count', 'complete'}
+        self._pending = {}  # video id -> Future of its fetch (or of storing complete flat details)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @staticmethod
+    def _details(info):
+        return {'duration': info.get('duration'), 'channel': info.get('channel') or info.get('uploader'),
+                'view_count': info.get('view_count')}
+
+    def note_flat(self, entry):
+        video_id = entry.get('id') if entry else None
+        if not video_id or video_id in self.known:
+            return
+        metadata = self._details(entry)
+        metadata['complete'] = all(value is not None for value in metadata.values())
+        with self._lock:
+            self.known.setdefault(video_id, metadata)
+
+    def get(self, video_id):
+        return self.known.get(video_id)
+
+    def is_pending(self, video_id):
+        return video_id in self._pending
+
+    def _submit(self, video_id, function, *args):
+        # Called with self._lock held
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="metadata")
+        future = self._executor.submit(function, *args)
+        self._pending[video_id] = future
+        return future
+
+    def request(self, video):
+        """Makes sure a (title, url, id) result's details are known or on their way; returns the pending Future, if any."""
+        _title, video_url, video_id = video
+        with self._lock:
+            metadata = self.known.get(video_id)
+            if video_id in self._pending or (metadata and metadata.get('stored')):
+                return self._pending.get(video_id)
+            if metadata and metadata['complete']:
+                # A flat entry had it all; store it so a cached search shows it without a fetch
+                metadata['stored'] = True
+                return self._submit(video_id, self._store, video_id, metadata)
+        cached = self.cache.get(video_id)
+        with self._lock:
+            if cached:
+                self.known[video_id] = dict(cached, complete=True, stored=True)
+                return None
+            if is_local_media(video_url) or video_id in self._pending:
+                return self._pending.get(video_id)
+            return self._submit(video_id, self._fetch, video_url, video_id)
+
+    def _store(self, video_id, metadata):
+        try:
+            self.cache.put(video_id, metadata)
+        finally:
+            with self._lock:
+                self._pending.pop(video_id, None)
+        return metadata
+
+    def _fetch(self, video_url, video_id):
+        ydl_opts = {'format': STREAM_AUDIO_FORMAT, 'quiet': True, 'noplaylist': True, 'extract_flat': False}
+        info = None
+        try:
+            with tracer.span("enrich"), ydl_pool.borrow(ydl_opts) as ydl:
+                info = ydl.extract_info(video_url, download=False)
+        except Exception:
+            pass
+        if info:
+            metadata = self._details(info)
+            self.cache.put(video_id, metadata)
+            if info.get('url'):
+                stream_url_cache.put(info.get('id') or video_id, info['url'])
+            metadata.update(complete=True, stored=True)
+        else:
+            # Keep what the flat entry had and don't retry this session
+            metadata = dict(self.known.get(video_id) or {}, complete=True, stored=True)
+        with self._lock:
+            self.known[video_id] = metadata
+            self._pending.pop(video_id, None)
+        return metadata
+
+    def wait(self, video_ids, timeout=None):
+        """Waits up to timeout seconds for the given videos' pending fetches; returns True if none is left."""
+        with self._lock:
+            futures = [self._pending[video_id] for video_id in video_ids if video_id in self._pending]
+        if not futures:
+            return True
+        _done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        return not not_done
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            self._pending.clear()
+
+
+metadata_enricher = MetadataEnricher(metadata_cache)
+
+
+def get_audio_url_for_streaming(video_url, video_id, video_title="", audio_format=STREAM_AUDIO_FORMAT, show_progress=True):
+    cached_url = stream_url_cache.get(video_id, audio_format)
+    if cached_url:
+        tracer.record("resolve", 0.0, cached=True, background=not show_progress)
+        return cached_url
     ydl_opts = {
+        'format': audio_format,
         'quiet': True,
-        'extract_flat': 'in_playlist',
-        'skip_download': True,
-        'default_search': f"ytsearch{max_results}",
+        'noplaylist': True,
+        'extract_flat': False,
     }
-    videos = []
-    with Progress(
-        SpinnerColumn(spinner_name="dots12"),
-        TextColumn("[progress.description]{task.description}"),
+    with rich_progress.Progress(
+        rich_progress.SpinnerColumn(spinner_name="earth"),
+        rich_progress.TextColumn("[progress.description]{task.description}"),
         transient=True,
-        console=console
+        console=console,
+        disable=not show_progress
     ) as progress_bar:
-        search_task = progress_bar.add_task(description="[bold green]Searching YouTube...", total=None)
+        task_description = f"Fetching audio stream for: [cyan]{video_title[:40]}{'...' if len(video_title) > 40 else ''}[/cyan]"
+        fetch_task = progress_bar.add_task(task_description, total=None)
+        try:
+            with tracer.span("resolve", cached=False, background=not show_progress), ydl_pool.borrow(ydl_opts) as ydl:
+                info = ydl.extract_info(video_url, download=False)
+        except Exception as e:
+            if show_progress:
+                console.print(f"[bold red]❌ Error extracting audio URL for streaming:[/bold red] {e}")
+            return None
+        finally:
+            progress_bar.update(fetch_task, completed=True)
+    stream_url = info.get('url') if info else None
+    if stream_url:
+        stream_url_cache.put(info.get('id') or video_id, stream_url, audio_format)
+    return stream_url
+
+
+class MpvIpcError(Exception):
+    pass
+
+
+class MpvIpcClient:
+    """A persistent, bidirectional connection to mpv's JSON IPC server, on the async engine's loop.
+
+    A single asyncio stream connection is opened lazily and reused. A reader task matches replies
+    to commands by request_id, so many commands can be in flight at once, each waiting on its own
+    future with its own timeout, and dispatches events / observed property changes to subscribers.
+    Coroutines on the engine await command_async(); other threads call command(), which runs it
+    on the loop and waits. Subscribers are called on the loop, so they must return quickly and
+    never wait for a command reply. If mpv drops the connection it is re-opened on the next command.
+    """
+
+    def __init__(self, ipc_path, timeout=MPV_IPC_TIMEOUT):
+        self.ipc_path = ipc_path
+        self.timeout = timeout
+        self.properties = {}
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._loop = None
+        self._pending = {}
+        self._request_ids = itertools.count(1)
+        self._observe_ids = itertools.count(1)
+        self._observed = {}
+        self._event_handlers = {}
+
+    # -- connection --
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _open(self):
+        if os.name == 'nt':
+            # mpv's IPC server is a named pipe there; the default (proactor) loop can connect to one
+            loop = asyncio.get_running_loop()
+            reader = asyncio.StreamReader(limit=MPV_IPC_LINE_LIMIT, loop=loop)
+            protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+            transport, _protocol = await loop.create_pipe_connection(lambda: protocol, self.ipc_path)
+            return reader, asyncio.StreamWriter(transport, protocol, reader, loop)
+        return await asyncio.open_unix_connection(self.ipc_path, limit=MPV_IPC_LINE_LIMIT)
+
+    async def connect_async(self):
+        """Opens the connection if it isn't open. Raises OSError if mpv isn't listening (yet)."""
+        if self.connected() and self._loop is asyncio.get_running_loop():
+            return
+        self._drop(MpvIpcError("reconnecting"))
+        reader, writer = await asyncio.wait_for(self._open(), self.timeout)
+        self._reader, self._writer, self._loop = reader, writer, asyncio.get_running_loop()
+        self._reader_task = self._loop.create_task(self._read_loop(reader, writer))
+        # Re-establish property observers on a fresh connection
+        for observe_id, name in self._observed.items():
+            self._write(["observe_property", observe_id, name], next(self._request_ids))
+        await writer.drain()
+
+    def connect(self):
+        engine.run(self.connect_async())
+
+    def _drop(self, error):
+        """Forgets the connection and fails the commands waiting on it. Runs on the loop."""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        if self._reader_task is not None and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._reader_task = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def close(self):
+        loop = self._loop
+        if loop is not None and self._writer is not None and loop.is_running():
+            loop.call_soon_threadsafe(self._drop, MpvIpcError("connection closed"))
+        elif loop is None or not loop.is_running():
+            # The engine's loop is gone, and its tasks and futures with it
+            self._reader = self._writer = self._reader_task = None
+            self._pending = {}
+
+    async def _read_loop(self, reader, writer):
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if 'request_id' in message and 'event' not in message:
+                    future = self._pending.pop(message['request_id'], None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+                elif 'event' in message:
+                    self._dispatch(message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            if self._writer is writer:
+                self._drop(MpvIpcError("mpv closed the IPC connection"))
+
+    def _dispatch(self, message):
+        event = message['event']
+        if event == 'property-change':
+            self.properties[message.get('name')] = message.get('data')
+        for handler in list(self._event_handlers.get(event, [])) + list(self._event_handlers.get('*', [])):
+            try:
+                handler(message)
+            except Exception as e:
+                console.print(f"[red]Error in mpv event handler for {event}: {e}[/red]")
+
+    # -- commands --
+    def _write(self, args, request_id):
+        self._writer.write((json.dumps({"command": list(args), "request_id": request_id}) + '\n').encode('utf-8'))
+
+    async def command_async(self, *args, timeout=None):
+        """Runs an mpv input command and returns its `data`. Raises MpvIpcError on failure."""
+        try:
+            await self.connect_async()
+        except (OSError, asyncio.TimeoutError) as e:
+            raise MpvIpcError(f"could not connect to mpv: {e}") from e
+        request_id = next(self._request_ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = future
+        try:
+            self._write(args, request_id)
+            await self._writer.drain()
+            reply = await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise MpvIpcError(f"mpv did not answer {args[0]!r} in time")
+        except (OSError, AttributeError) as e:  # AttributeError: the connection was dropped meanwhile
+            self._drop(MpvIpcError("connection closed"))
+            raise MpvIpcError(f"could not send command to mpv: {e}") from e
+        finally:
+            self._pending.pop(request_id, None)
+        if reply.get('error') != 'success':
+            raise MpvIpcError(f"{args[0]}: {reply.get('error')}")
+        return reply.get('data')
+
+    def command(self, *args, timeout=None):
+        """command_async() for threads other than the engine's. Raises MpvIpcError on failure."""
+        return engine.run(self.command_async(*args, timeout=timeout))
+
+    def try_command(self, *args):
+        """Like command(), but returns False instead of raising."""
+        try:
+            result = self.command(*args)
+        except MpvIpcError:
+            return False
+        return True if result is None else result
+
+    # -- events --
+    def on(self, event, handler):
+        """Subscribes handler(message) to an mpv event name ('*' for every event)."""
+        self._event_handlers.setdefault(event, []).append(handler)
+
+    def off(self, event, handler):
+        handlers = self._event_handlers.get(event, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def wait_for_event(self, event, timeout=None):
+        """Blocks until mpv emits `event` and returns the message, or None on timeout."""
+        received = concurrent.futures.Future()
+        def handler(message):
+            if not received.done(): received.set_result(message)
+        self.on(event, handler)
+        try:
+            return received.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+        finally:
+            self.off(event, handler)
+
+    def observe_property(self, name):
+        """Asks mpv to push changes of `name`; the latest value is kept in self.properties."""
+        if name in self._observed.values():
+            return
+        observe_id = next(self._observe_ids)
+        self._observed[observe_id] = name
+        self.command("observe_property", observe_id, name)
+
+    # -- command set --
+    def get_property(self, name):
+        return self.command("get_property", name)
+
+    def set_property(self, name, value):
+        return self.command("set_property", name, value)
+
+    def loadfile(self, url, mode="replace"):
+        return self.command("loadfile", url, mode)
+
+    def toggle_pause(self):
+        return self.command("cycle", "pause")
+
+    def stop(self):
+        return self.command("stop")
+
+    def seek(self, seconds, mode="relative"):
+        return self.command("seek", seconds, mode)
+
+    def set_volume(self, volume):
+        return self.set_property("volume", max(0, min(130, volume)))
+
+    def add_volume(self, delta):
+        return self.command("add", "volume", delta)
+
+    def playlist_next(self):
+        return self.command("playlist-next", "weak")
+
+    def playlist_prev(self):
+        return self.command("playlist-prev", "weak")
+
+    def playlist_clear(self):
+        return self.command("playlist-clear")
+
+    def playlist_remove(self, index="current"):
+        return self.command("playlist-remove", index)
+
+    def playlist_move(self, index1, index2):
+        return self.command("playlist-move", index1, index2)
+
+    async def _quit(self):
+        await self.connect_async()
+        self._write(["quit"], next(self._request_ids))  # mpv exits without necessarily replying
+        await self._writer.drain()
+
+    def quit(self):
+        try:
+            engine.run(self._quit())
+        except (OSError, AttributeError, asyncio.TimeoutError, MpvIpcError):
+            pass
+        self.close()
+
+
+class MpvPlayer:
+    """A single long-lived mpv instance started in --idle mode and fed tracks over its IPC socket."""
+
+    OBSERVED_PROPERTIES = ("time-pos", "duration", "pause", "cache-buffering-state", "demuxer-cache-duration",
+                           "playlist-pos", "idle-active")
+
+    def __init__(self):
+        self.process = None
+        pipe_name = f"mpv_socket_{uuid.uuid4().hex}"
+        # Use the correct Windows named pipe format or a standard path for other OSes
+        if os.name == 'nt':
+            self.ipc_pipe_path = f"\\\\.\\pipe\\{pipe_name}"
+        else:
+            self.ipc_pipe_path = os.path.join(tempfile.gettempdir(), pipe_name)
+        self.ipc = MpvIpcClient(self.ipc_pipe_path)
+        self._loadfile_has_index = False
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Starts mpv if it isn't already running. Raises FileNotFoundError if mpv isn't installed."""
+        if self.is_running():
+            return
+        self.ipc.close()
+        mpv_command = [
+            "mpv",
+            "--idle=yes",
+            "--no-video",
+            "--really-quiet",
+            "--no-input-terminal",
+            "--ytdl-format=bestaudio",
+            "--prefetch-playlist=yes",
+            f"--input-ipc-server={self.ipc_pipe_path}",
+        ]
+        spawn_started = time.perf_counter()
+        self.process = subprocess.Popen(mpv_command, stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Wait only as long as it takes the IPC server to come up
+        deadline = time.monotonic() + MPV_STARTUP_TIMEOUT
+        while time.monotonic() < deadline and self.process.poll() is None:
+            try:
+                self.ipc.connect()
+                break
+            except OSError:
+                time.sleep(0.02)
+        tracer.record("mpv_spawn", (time.perf_counter() - spawn_started) * 1000, connected=self.ipc.connected())
+        for name in self.OBSERVED_PROPERTIES:
+            try: self.ipc.observe_property(name)
+            except MpvIpcError: pass
+        # mpv 0.38 inserted an `index` argument before loadfile's per-file options
+        try:
+            commands = self.ipc.get_property("command-list") or []
+            loadfile = next((c for c in commands if c.get("name") == "loadfile"), {})
+            self._loadfile_has_index = any(arg.get("name") == "index" for arg in loadfile.get("args", []))
+        except MpvIpcError:
+            pass
+
+    def command(self, *args):
+        return self.is_running() and self.ipc.try_command(*args)
+
+    def load(self, media_url, title="", use_ytdl=True, mode="replace", record_path=None):
+        """Loads a track ("replace") or adds it to mpv's playlist ("append"/"append-play"), with its title
+        and ytdl setting as per-file options. mpv is already running, so this is a single IPC round trip.
+        With record_path, mpv also writes the stream it receives to that file.
+        Returns the command's reply data (mpv 0.33+ reports the new playlist_entry_id), or False."""
+        self.start()
+        title = title.replace('"', '')
+        # %n% quoting lets the title contain commas and '=' inside the option list
+        options = f"ytdl={'yes' if use_ytdl else 'no'},force-media-title=%{len(title.encode('utf-8'))}%{title}"
+        if record_path:
+            options += f",stream-record=%{len(str(record_path).encode('utf-8'))}%{record_path}"
+        if self._loadfile_has_index:
+            return self.command("loadfile", media_url, mode, -1, options)
+        return self.command("loadfile", media_url, mode, options)
+
+    def status_line(self):
+        props = self.ipc.properties
+        position, duration = props.get("time-pos"), props.get("duration")
+        parts = []
+        if position is not None:
+            parts.append(f"{int(position) // 60}:{int(position) % 60:02d}"
+                         + (f" / {int(duration) // 60}:{int(duration) % 60:02d}" if duration else ""))
+        if props.get("demuxer-cache-duration") is not None:
+            parts.append(f"buffered {props['demuxer-cache-duration']:.1f}s")
+        if props.get("cache-buffering-state") not in (None, 100):
+            parts.append(f"buffering {props['cache-buffering-state']}%")
+        if props.get("pause"):
+            parts.append("paused")
+        return " | ".join(parts)
+
+    def shutdown(self):
+        if self.is_running():
+            self.ipc.quit()
+            try:
+                self.process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                console.print("[orange3]MPV did not terminate gracefully, forcing kill...[/orange3]")
+                self.process.kill()
+                self.process.wait()
+        self.ipc.close()
+        if self.process and self.process.returncode not in [0, -9, -15, 130]:
+            console.print(f"[yellow]MPV exited with code: {self.process.returncode}[/yellow]")
+        self.process = None
+        if os.name == 'posix' and os.path.exists(self.ipc_pipe_path):
+            os.remove(self.ipc_pipe_path)
+
+
+player = MpvPlayer()
+
+
+class PlaybackQueue:
+    """Tracks queued for playback. While one track plays, the next few are resolved on a worker pool
+    and appended to mpv's own playlist, so mpv can prefetch them and move on without waiting."""
+
+    def __init__(self, player, prefetch_count=QUEUE_PREFETCH_COUNT, workers=QUEUE_PREFETCH_WORKERS, feed_ahead=PLAYLIST_FEED_AHEAD):
+        self.player = player
+        self.prefetch_count = prefetch_count
+        self.feed_ahead = feed_ahead
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.tracks = []  # dicts: title, url, id, future
+        self.appended = 0  # tracks[:appended] are in mpv's playlist, in the same order
+        self.lock = threading.RLock()
+        self._feed_wakeup = threading.Event()  # set when the play position moves or the queue is cleared
+        self.finished = threading.Event()  # set when mpv goes idle after playing what play() loaded
+        self._started = False  # a start-file arrived since play(); mpv was idle before that, not finished
+        self.recordings = {}  # mpv playlist_entry_id -> {'id', 'path', 'seeked'} of tracks being tee'd to audio_cache
+        self._playing_entry = None
+        self._feed_generation = 0  # bumped by clear(), which retires any add_lazily() feed
+        player.ipc.on('property-change', self._on_property_change)
+        player.ipc.on('start-file', self._on_start_file)
+        player.ipc.on('seek', self._on_seek)
+        player.ipc.on('end-file', self._on_end_file)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def current_index(self):
+        position = self.player.ipc.properties.get("playlist-pos")
+        return position if isinstance(position, int) and 0 <= position < len(self.tracks) else None
+
+    def current(self):
+        index = self.current_index
+        return self.tracks[index] if index is not None else None
+
+    def clear(self):
+        with self.lock:
+            for track in self.tracks:
+                if track['future'] and not track['future'].done():
+                    track['future'].cancel()
+            self.tracks = []
+            self.appended = 0
+            self._feed_generation += 1
+            # playlist-clear keeps the playing entry; the others will never start, so won't record either.
+            # The IPC handlers pop from this same dict without the lock, so it is pruned in place.
+            for entry in list(self.recordings):
+                if entry != self._playing_entry:
+                    self.recordings.pop(entry, None)
+            self.player.command("playlist-clear")
+            self._feed_wakeup.set()
+
+    def add(self, entries):
+        """Queues (title, url, id) entries after the existing ones."""
+        with self.lock:
+            for title, url, video_id in entries:
+                # Local files and tracks already in the audio cache play straight from disk; there is nothing to resolve
+                cached_path = None if is_local_media(url) else audio_cache.lookup(video_id)
+                if cached_path:
+                    tracer.record("resolve", 0.0, cached=True, source="audio_cache")
+                    url = str(cached_path)
+                self.tracks.append({'title': title, 'url': url, 'id': None if is_local_media(url) else video_id, 'future': None})
+        self._schedule_prefetch()
+
+    def add_lazily(self, entries, batch_size=PLAYLIST_FEED_BATCH):
+        """Queues entries from a slow, possibly very long iterator (an expanding playlist) on a
+        background thread: the first entry on its own, the rest batch_size at a time. Returns an
+        Event that is set as soon as the first entry is queued, or the iterator turned out empty.
+
+        The iterator is pulled only while fewer than feed_ahead tracks wait past the play position,
+        so a playlist with thousands of entries is listed (and held in memory) as playback gets to it.
+        """
+        first_queued = threading.Event()
+        generation = self._feed_generation
+
+        def feed():
+            batch = []
+            try:
+                for entry in entries:
+                    batch.append(entry)
+                    if first_queued.is_set() and len(batch) < batch_size:
+                        continue
+                    with self.lock:
+                        if self._feed_generation != generation:
+                            return
+                        self.add(batch)
+                    batch = []
+                    first_queued.set()
+                    while True:
+                        with self.lock:
+                            if self._feed_generation != generation:
+                                return
+                            if len(self.tracks) - (self.current_index or 0) < self.feed_ahead:
+                                break
+                            self._feed_wakeup.clear()
+                        self._feed_wakeup.wait(timeout=1.0)  # the timeout covers a wakeup that raced the clear()
+                with self.lock:
+                    if batch and self._feed_generation == generation:
+                        self.add(batch)
+            except Exception:
+                pass  # the entry source reports its own errors; whatever was queued keeps playing
+            finally:
+                first_queued.set()
+                if hasattr(entries, 'close'):
+                    entries.close()
+
+        threading.Thread(target=feed, name="queue-feed", daemon=True).start()
+        return first_queued
+
+    def play(self, index=0):
+        """Starts playback at `index`, resolving that track in the foreground if it wasn't prefetched."""
+        with self.lock:
+            self.finished.clear()
+            self._started = False
+            track = self.tracks[index]
+            # Everything before the new starting point is dropped, so playlist indices keep matching ours
+            self.tracks = self.tracks[index:]
+            self.appended = 0
+        stream_url = self._resolved_url(track, wait=True)
+        with self.lock:
+            if not self.tracks or self.tracks[0] is not track:
+                return False  # the queue was cleared (start cancelled) while the track was resolving
+        self.player.start()
+        unwatch = tracer.watch_first_audio(self.player.ipc)
+        loaded = False
+        try:
+            loaded = self._load(track, stream_url)
+        finally:
+            if not loaded:
+                unwatch()  # no playback-restart is coming for this load; a later one must not be counted
+        with self.lock:
+            self.appended = 1 if loaded else 0
+        self._schedule_prefetch()
+        return loaded
+
+    def next(self):
+        return self.player.command("playlist-next", "weak")
+
+    def _resolved_url(self, track, wait=False):
+        future = track['future']
+        if future is None:
+            if not wait:
+                return None
+            return get_audio_url_for_streaming(track['url'], track['id'], track['title']) if track['id'] else None
+        try:
+            return future.result() if wait or future.done() else None
+        except Exception:
+            return None
+
+    def _schedule_prefetch(self):
+        with self.lock:
+            position = self.current_index or 0
+            for track in self.tracks[position:position + 1 + self.prefetch_count]:
+                if track['future'] is None and track['id']:
+                    track['future'] = self.executor.submit(
+                        get_audio_url_for_streaming, track['url'], track['id'], track['title'], show_progress=False)
+                    track['future'].add_done_callback(lambda _future: self._append_ready())
+        self._append_ready()
+
+    def _append_ready(self):
+        """Appends resolved tracks to mpv's playlist strictly in queue order."""
+        with self.lock:
+            if self.appended == 0:
+                return
+            while self.appended < len(self.tracks):
+                track = self.tracks[self.appended]
+                if track['future'] is not None and not track['future'].done():
+                    break
+                if track['future'] is None and track['id']:
+                    break
+                stream_url = self._resolved_url(track)
+                if not self._load(track, stream_url, mode="append"):
+                    break
+                self.appended += 1
+
+    def _load(self, track, stream_url, mode="replace"):
+        """Hands a track to mpv; streamed tracks are recorded for audio_cache on the way."""
+        record_path = audio_cache.recording_path(track['id']) if track['id'] else None
+        media_url = stream_url or track['url']
+        if stream_url and STREAM_PROXY_ENABLED:
+            media_url = stream_proxy.url_for(stream_url, track['id'])
+        loaded = self.player.load(media_url, track['title'], use_ytdl=not stream_url,
+                                  mode=mode, record_path=record_path)
+        entry_id = loaded.get('playlist_entry_id') if isinstance(loaded, dict) else None
+        if record_path and entry_id is not None:
+            with self.lock:
+                self.recordings[entry_id] = {'id': track['id'], 'path': record_path, 'seeked': False}
+        return loaded
+
+    def _on_start_file(self, message):
+        self._playing_entry = message.get('playlist_entry_id')
+        self._started = True
+
+    def _on_seek(self, message):
+        recording = self.recordings.get(self._playing_entry)
+        if recording:
+            recording['seeked'] = True
+
+    # The _on_* handlers run on the engine's loop, which reads mpv's replies. They must never wait for
+    # self.lock: whoever holds it may be waiting for a command reply that only the loop can read. Such
+    # work goes to the pool.
+    def _in_pool(self, function, *args):
+        try:
+            self.executor.submit(function, *args)
+        except RuntimeError:
+            pass  # shut down
+
+    def _on_end_file(self, message):
+        recording = self.recordings.pop(message.get('playlist_entry_id'), None)
+        if recording is None:
+            return
+        if message.get('reason') == 'eof' and not recording['seeked']:
+            self._in_pool(audio_cache.commit, recording['id'], recording['path'])
+        else:
+            self._in_pool(audio_cache.discard, recording['path'])
+
+    def _on_property_change(self, message):
+        if message.get('name') == "playlist-pos" and isinstance(message.get('data'), int) and message['data'] >= 0:
+            self._in_pool(self._schedule_prefetch)
+            self._feed_wakeup.set()
+        elif message.get('name') == "idle-active" and message.get('data') and self._started:
+            # A fresh mpv reports idle-active=true as soon as it is observed, before anything was loaded
+            self.finished.set()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+playback_queue = PlaybackQueue(player)
+
+
+def play_song_with_mpv(video_url, title="", video_id=None):
+    playback_queue.clear()
+    playback_queue.add([(title, video_url, video_id)])
+    run_playback_queue()
+
+
+def run_playback_queue(start_index=0):
+    first_track = playback_queue.tracks[start_index]
+    console.rule(f"[bold green]🎵 Now Streaming: [cyan]{first_track['title']}[/cyan] 🎵[/bold green]", style="green")
+    console.print(Align.center(f"[italic grey70](Player is now active in the background.)[/italic grey70]"))
+
+    def control(*args):
+        return engine.run(engine.player_command(*args))
+
+    try:
+        # Resolving runs on the engine, so Ctrl+C (or the timeout) gives the prompt back at once
+        try:
+            started = engine.run(engine.call(playback_queue.play, start_index, timeout=ENGINE_RESOLVE_TIMEOUT))
+        except (KeyboardInterrupt, asyncio.TimeoutError) as e:
+            playback_queue.clear()  # a resolve still in flight won't load its track now
+            console.print("[yellow]⏹️ Start cancelled.[/yellow]" if isinstance(e, KeyboardInterrupt)
+                          else "[red]❌ Timed out resolving the stream.[/red]")
+            return
+        if not started:
+            console.print("[red]❌ Player process terminated prematurely.[/red]")
+            return
+
+        last_index = playback_queue.current_index
+        while player.is_running() and not playback_queue.finished.is_set():
+            if playback_queue.current_index not in (None, last_index):
+                last_index = playback_queue.current_index
+                console.rule(f"[bold green]🎵 Now Streaming: [cyan]{playback_queue.current()['title']}[/cyan] 🎵[/bold green]", style="green")
+            status = player.status_line()
+            if status:
+                console.print(f"[grey70]{status}[/grey70]")
+            console.print("\n[bold]Player Controls:[/bold] [yellow]P[/yellow]ause/Play | [yellow]N[/yellow]ext | [yellow]F[/yellow]orward/[yellow]B[/yellow]ack 10s | "
+                          "Volume [yellow]+[/yellow]/[yellow]-[/yellow] | [yellow]A[/yellow]dd to queue | [yellow]L[/yellow]ist queue | "
+                          "[yellow]I[/yellow]nfo | [yellow]S[/yellow]top | [yellow]Q[/yellow]uit App")
+            choice = Prompt.ask("\n[bold yellow]Enter command[/bold yellow]", choices=["p", "n", "f", "b", "+", "-", "a", "l", "i", "s", "q"],
+                                show_choices=False, default="q")
+            if playback_queue.finished.is_set():
+                console.print("[green]Queue finished.[/green]")
+                break
+
+            if choice == "p":
+                if control("cycle", "pause"):
+                    console.print("[green]▶️ Toggled playback.[/green]")
+                else:
+                    console.print("[red]❌ Player process terminated prematurely.[/red]")
+                    break
+            elif choice == "n":
+                if not playback_queue.next():
+                    console.print("[orange3]No more tracks in the queue.[/orange3]")
+            elif choice in ("f", "b"):
+                control("seek", 10 if choice == "f" else -10, "relative")
+            elif choice in ("+", "-"):
+                control("add", "volume", 5 if choice == "+" else -5)
+                volume = control("get_property", "volume")
+                if volume is not False:
+                    console.print(f"[green]🔊 Volume: {volume:.0f}%[/green]")
+            elif choice == "a":
+                query = Prompt.ask("[bold yellow]Enter song name or YouTube URL to queue[/bold yellow]")
+                selected_media = select_media_from_results(engine.stream(iter_search_youtube(query)), action_verb="queue") if query.strip() else None
+                if selected_media:
+                    playback_queue.add([selected_media])
+                    console.print(f"[green]➕ Queued:[/green] [italic]{selected_media[0]}[/italic]")
+            elif choice == "l":
+                current_index = playback_queue.current_index
+                for i, track in enumerate(playback_queue.tracks):
+                    marker = "▶️" if i == current_index else f"{i + 1}."
+                    ready = " [dim](ready)[/dim]" if track['future'] and track['future'].done() else ""
+                    console.print(f"  {marker} {track['title']}{ready}")
+            elif choice == "i":
+                continue
+            elif choice == "s":
+                if control("stop"):
+                    console.print("[yellow]⏹️ Stopping playback...[/yellow]")
+                else:
+                    console.print("[red]❌ Player process terminated prematurely.[/red]")
+                break
+            elif choice == "q":
+                console.print("[red]🛑 Exiting app...[/red]")
+                control("stop")
+                break
+
+    except FileNotFoundError:
+        console.print("[bold red]❌ MPV or yt-dlp not found. Please ensure they are installed and in your system's PATH.[/bold red]")
+        time.sleep(3)
+    finally:
+        console.print("\n[green]Returning to menu...[/green]")
+        time.sleep(1)
+
+def safe_filename_base(video_title, video_id):
+    safe_title = "".join(c if c.isalnum() or c in " .-_()" else "_" for c in video_title)
+    safe_title = safe_title[:100]
+    return f"{safe_title}_{video_id}"
+
+
+def build_download_opts(download_type):
+    ydl_opts_base = {
+        'noplaylist': True, 'noprogress': True,
+        'quiet': True, 'ignoreerrors': True, 'verbose': False, 'no_warnings': True,
+        # For what ChunkedDownload doesn't handle: parallel HLS/DASH fragments, chunked requests, resumed .part files
+        'continuedl': True, 'concurrent_fragment_downloads': DOWNLOAD_CONNECTIONS, 'http_chunk_size': DOWNLOAD_CHUNK_SIZE,
+        'retries': 10, 'fragment_retries': 10,
+    }
+    if download_type == 'audio':
+        return {**ydl_opts_base, 'format': 'bestaudio/best',
+                'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'},
+                                   {'key': 'EmbedThumbnail', 'already_have_thumbnail': False}]}
+    elif download_type == 'native':
+        # 'best' keeps the downloaded codec: Opus is copied into .opus, AAC into .m4a, nothing is re-encoded
+        return {**ydl_opts_base, 'format': 'bestaudio/best',
+                'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'},
+                                   {'key': 'FFmpegMetadata'},
+                                   {'key': 'EmbedThumbnail', 'already_have_thumbnail': False}]}
+    elif download_type == 'video':
+        return {**ydl_opts_base, 'format': 'bestvideo+bestaudio/best',
+                'postprocessors': [{'key': 'FFmpegVideoConvertor', 'preferedformat': 'mp4'},
+                                   {'key': 'EmbedThumbnail', 'already_have_thumbnail': False}]}
+    raise ValueError(f"Invalid download type: {download_type!r}")
+
+
+def extract_and_download(ydl, video_url, download_type, download_path, filename_base=None):
+    """Extracts video_url, then downloads it. The download is marked pending for resume only once
+    extraction has succeeded, so an unavailable or private video isn't offered again at every start."""
+    info = ydl.extract_info(video_url, download=False)
+    if not info:
+        return None
+    download_archive.mark_pending(video_url, download_type, download_path, filename_base, info.get('id'))
+    return ydl.process_ie_result(info, download=True)
+
+
+def fetch_media(video_url, download_type='audio', download_path=DOWNLOAD_PATH, filename_base=None, progress_hook=None):
+    """Downloads and post-processes one URL, returning the final file path. Raises yt_dlp DownloadError on failure."""
+    outtmpl = str(download_path / (f'{filename_base}.%(ext)s' if filename_base else '%(title).100B_%(id)s.%(ext)s'))
+    with ydl_pool.borrow(build_download_opts(download_type), progress_hook=progress_hook, outtmpl=outtmpl) as ydl:
+        info = extract_and_download(ydl, video_url, download_type, download_path, filename_base)
+    if not info:
+        raise yt_dlp.utils.DownloadError(f"Download of {video_url} failed")
+    requested = info.get('requested_downloads') or [{}]
+    final_filepath = requested[-1].get('filepath') or info.get('filepath')
+    if final_filepath:
+        final_filepath = Path(final_filepath)
+    else:
+        actual_files = list(download_path.glob(f"{filename_base or '*_' + info.get('id', '')}.*"))
+        final_filepath = actual_files[0] if actual_files else None
+    record_download(info, download_type, final_filepath)
+    return final_filepath
+
+
+def fetch_raw_media(video_url, download_type='audio', download_path=DOWNLOAD_PATH, filename_base=None, progress_hook=None):
+    """Stage one of a pipelined download: fetches the raw stream(s) and thumbnail without any
+    post-processing and returns a picklable info dict for postprocess_media()."""
+    outtmpl = str(download_path / (f'{filename_base}.%(ext)s' if filename_base else '%(title).100B_%(id)s.%(ext)s'))
+    raw_opts = {**build_download_opts(download_type), 'postprocessors': [], 'writethumbnail': True}
+    with ydl_pool.borrow(raw_opts, progress_hook=progress_hook, outtmpl=outtmpl) as ydl:
+        info = extract_and_download(ydl, video_url, download_type, download_path, filename_base)
+        if not info:
+            raise yt_dlp.utils.DownloadError(f"Download of {video_url} failed")
+        info = ydl.sanitize_info(info)
+    requested = info.get('requested_downloads') or [{}]
+    info['filepath'] = requested[-1].get('filepath') or info.get('filepath')
+    return info
+
+
+def postprocess_media(info, download_type):
+    """Stage two of a pipelined download: runs the conversion and thumbnail postprocessors on an
+    already-downloaded file. Runs in a worker process, so it only takes and returns plain data."""
+    postprocess_opts = {'quiet': True, 'no_warnings': True, 'postprocessors': build_download_opts(download_type)['postprocessors']}
+    with yt_dlp.YoutubeDL(postprocess_opts) as ydl:
+        info = ydl.post_process(info['filepath'], info)
+    return info.get('filepath')
+
+
+def download_media(video_url, video_title, video_id, download_type='audio', download_path=DOWNLOAD_PATH):
+    console.print(f"\n[cyan]Preparing to download {download_type}:[/cyan] [italic]{video_title}[/italic]")
+
+    if download_type not in DOWNLOAD_TYPES:
+        console.print("[red]Invalid download type specified.[/red]"); return
+
+    archived_path = download_archive.lookup(video_id, download_type)
+    if archived_path:
+        console.print(f"[bold green]✅ Already downloaded:[/bold green] [italic underline]{archived_path}[/italic underline]")
+        time.sleep(2); return
+
+    filename_base = safe_filename_base(video_title, video_id)
+    job = DownloadJob(video_url, download_type, download_path, title=video_title, video_id=video_id, filename_base=filename_base)
+
+    def ydl_progress_hook(d):
+        # Called for every chunk: only the numbers are stored, the dashboard redraws on its own clock
+        if d['status'] == 'downloading':
+            job.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or job.total_bytes
+            job.downloaded_bytes = d.get('downloaded_bytes', 0)
+        elif d['status'] == 'finished':
+            job.activity = "Processing"
+
+    expected_ext = {'audio': 'mp3', 'native': 'opus', 'video': 'mp4'}[download_type]
+    final_filepath_guess = download_path / f'{filename_base}.{expected_ext}'
+    with DownloadDashboard(f"{download_type.capitalize()} download") as dashboard:
+        job.status = "downloading"
+        job.started = time.monotonic()
+        dashboard.listed = 1
+        dashboard.start(job)
+        try:
+            final_filepath_guess = fetch_media(video_url, download_type, download_path, filename_base, ydl_progress_hook) or final_filepath_guess
+            job.status, job.filepath = "done", final_filepath_guess
+        except yt_dlp.utils.DownloadError as e:
+            error_msg = str(e).split('\n')[-1]
+            job.status, job.error = "failed", f"Download Error: {error_msg}"
+        except Exception as e:
+            job.status, job.error = "failed", f"An unexpected error occurred during download: {e}"
+        finally:
+            job.finished = time.monotonic()
+            job.activity = None
+            dashboard.finish(job)
+    if job.status == "done":
+        console.print(f"\n[bold green]✅ Download complete![/bold green] Saved to: [italic underline]{job.filepath or download_path}[/italic underline]")
+    else:
+        console.print(f"\n[bold red]❌ {job.error}[/bold red]")
+    console.print(Panel(f"Find your downloads in: {download_path}", title="[b]Download Location[/b]", border_style="blue", expand=False))
+    time.sleep(2)
+
+
+# --- Batch Downloads ---
+class DownloadJob:
+    """One (url, type, path) entry of a batch download, plus its progress and outcome."""
+
+    def __init__(self, url, download_type='audio', download_path=DOWNLOAD_PATH, title=None, video_id=None, filename_base=None):
+        self.url = url
+        self.download_type = download_type
+        self.download_path = Path(download_path)
+        self.title = title
+        self.video_id = video_id
+        self.filename_base = filename_base
+        self.status = "pending"  # pending, downloading, processing, done, skipped, failed, cancelled
+        self.activity = None  # what a running job is busy with, for the dashboard (e.g. "Transcoding")
+        self.filepath = None
+        self.error = None
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def name(self):
+        return self.title or self.url
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+
+class DownloadDashboard:
+    """A single Rich Live view of any number of concurrent DownloadJobs, redrawn at a fixed frame rate.
+
+    Progress hooks never render: they only store byte counts on their DownloadJob, which is a plain
+    attribute write. The only locked operations are start() and finish(), once per job. Live's
+    refresh thread calls render() `fps` times a second, and render() derives the speeds and ETAs
+    from how far the counters moved since the previous frame. Only running jobs and the last few
+    finished ones get a row, and at most running_rows running ones, so a frame costs about the same
+    with 5 jobs or 500.
+    """
+
+    def __init__(self, title="Download", workers=None, fps=DASHBOARD_FPS, finished_rows=BATCH_FINISHED_ROWS,
+                 running_rows=DASHBOARD_RUNNING_ROWS):
+        self.title = title
+        self.workers = workers
+        self.fps = fps
+        self.running_rows = running_rows
+        self.listed = 0
+        self.listing_done = True
+        self._lock = threading.Lock()
+        self._active = []  # running jobs, oldest first
+        self._finished = collections.deque(maxlen=finished_rows)
+        self._finished_count = 0
+        self._finished_bytes = 0
+        self._finished_total = 0
+        self._samples = {}  # job -> (downloaded bytes at the last frame, smoothed bytes/s)
+        self._last_frame = None
+        self._total_sample = (0, 0.0)
+        self._live = None
+
+    def start(self, job):
+        with self._lock:
+            self._active.append(job)
+
+    def finish(self, job):
+        """Moves a job from the running rows to the finished ones and into the totals."""
+        with self._lock:
+            if job in self._active:
+                self._active.remove(job)
+            self._finished.append(job)
+            self._finished_count += 1
+            self._finished_bytes += job.downloaded_bytes
+            self._finished_total += job.total_bytes or job.downloaded_bytes
+
+    def __enter__(self):
+        self._live = rich_live.Live(get_renderable=self.render, console=console, refresh_per_second=self.fps, transient=False)
+        self._live.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._live.__exit__(*exc_info)
+
+    @staticmethod
+    def _smoothed(previous_bytes, previous_speed, current_bytes, elapsed):
+        if elapsed <= 0 or current_bytes < previous_bytes:
+            return previous_speed
+        return 0.3 * (current_bytes - previous_bytes) / elapsed + 0.7 * previous_speed
+
+    def render(self):
+        now = time.monotonic()
+        elapsed = now - self._last_frame if self._last_frame is not None else 0.0
+        self._last_frame = now
+        with self._lock:
+            active = list(self._active)
+            finished = list(self._finished)
+            finished_count, completed, total = self._finished_count, self._finished_bytes, self._finished_total
+        completed += sum(job.downloaded_bytes for job in active)
+        total += sum(job.total_bytes or job.downloaded_bytes for job in active)
+        self._total_sample = (completed, self._smoothed(*self._total_sample, completed, elapsed))
+        speed = self._total_sample[1]
+
+        samples = {}
+        table = rich_table.Table(box=None, show_header=False, padding=(0, 1), expand=False)
+        table.add_column(no_wrap=True)
+        table.add_column(style="cyan", max_width=36, no_wrap=True, overflow="ellipsis")
+        table.add_column()
+        table.add_column(justify="right", no_wrap=True)
+        table.add_column(justify="right", no_wrap=True)
+        table.add_column(justify="right", no_wrap=True)
+        for job in finished:
+            style = {"done": "green", "skipped": "blue", "failed": "red"}.get(job.status, "yellow")
+            table.add_row(f"[{style}]{job.status.capitalize()}[/{style}]", job.name,
+                          rich_progress.ProgressBar(total=1, completed=1, width=20), format_size(job.downloaded_bytes), "", "")
+        for row, job in enumerate(active):
+            previous_bytes, previous_speed = self._samples.get(job, (job.downloaded_bytes, 0.0))
+            job_speed = self._smoothed(previous_bytes, previous_speed, job.downloaded_bytes, elapsed)
+            samples[job] = (job.downloaded_bytes, job_speed)
+            if row >= self.running_rows:
+                continue
+            size = f"{format_size(job.downloaded_bytes)}/{format_size(job.total_bytes)}" if job.total_bytes else format_size(job.downloaded_bytes)
+            eta = (job.total_bytes - job.downloaded_bytes) / job_speed if job.total_bytes and job_speed > 0 else None
+            table.add_row(f"[yellow]{job.activity or 'Downloading'}[/yellow]", job.name,
+                          rich_progress.ProgressBar(total=job.total_bytes, completed=job.downloaded_bytes, width=20),
+                          size, f"{format_size(job_speed)}/s", format_eta(eta))
+        self._samples = samples
+        if len(active) > self.running_rows:
+            table.add_row("", f"[dim]… and {len(active) - self.running_rows} more running[/dim]", "", "", "", "")
+
+        listed = f"{self.listed}" if self.listing_done else f"{self.listed}+"
+        jobs = f": {finished_count}/{listed} jobs" if self.listed != 1 or not self.listing_done else ""
+        jobs += f" ({self.workers} workers)" if self.workers else ""
+        eta = (total - completed) / speed if total > completed and speed > 0 else None
+        header = Text.from_markup(f"[bold]{self.title}{jobs}[/bold] — {format_size(completed)}"
+                                  f"{' of ' + format_size(total) if total else ''}, {format_size(speed)}/s, ETA {format_eta(eta)}")
+        return Group(header, table)
+
+
+def format_size(num_bytes):
+    """Human-readable binary size: '812 B', '3.4 MiB', '1.2 GiB'."""
+    num_bytes = num_bytes or 0
+    for unit in ("B", "KiB", "MiB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GiB"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "-:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class DownloadManager:
+    """Runs many DownloadJobs on a bounded thread pool, shown on a DownloadDashboard.
+
+    Workers are threads: the download itself is network-bound and yt-dlp hands the transcode to an
+    ffmpeg subprocess, so the GIL isn't the limit. Ctrl+C (or cancel()) stops queued jobs from
+    starting and aborts running ones at their next progress callback.
+
+    With pipelined=True the work is split in two stages: the download threads only fetch raw
+    streams (plus thumbnails) and push them onto a bounded queue, and a process pool sized to the
+    CPU cores runs the MP3/MP4 conversion and thumbnail embedding. The network keeps downloading
+    the next files while earlier ones transcode; when transcoding falls behind, the full queue
+    holds the downloaders back.
+    """
+
+    def __init__(self, workers=DOWNLOAD_WORKERS, pipelined=False, transcode_workers=None, queue_size=PIPELINE_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.pipelined = pipelined
+        self.transcode_workers = max(1, transcode_workers or os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.cancel_event = threading.Event()
+        self.jobs = []
+        self._transcode_queue = None
+        self._dashboard = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _make_progress_hook(self, job):
+        def job_progress_hook(d):
+            # Runs for every chunk yt-dlp reports: record the numbers, the dashboard does the rest
+            if self.cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled()
+            if d['status'] == 'downloading':
+                job.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or job.total_bytes
+                job.downloaded_bytes = d.get('downloaded_bytes', 0)
+            elif d['status'] == 'finished':
+                job.activity = "Processing"
+        return job_progress_hook
+
+    def _run_job(self, job):
+        if self.cancel_event.is_set():
+            job.status = "cancelled"
+            return job
+        archived_path = download_archive.lookup(job.video_id or video_id_from_url(job.url), job.download_type)
+        if archived_path:
+            job.status = "skipped"
+            job.filepath = archived_path
+            job.started = time.monotonic()
+            self._finish_job(job)
+            return job
+        job.status = "downloading"
+        job.started = time.monotonic()
+        self._dashboard.start(job)
+        job_progress_hook = self._make_progress_hook(job)
+
+        handed_off = False
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                search_results = ydl.extract_info(query, download=False)
-        except yt_dlp.utils.DownloadError as e:
-            console.print(f"[bold red]❌ Error fetching results:[/bold red] {e}")
-            return []
+            filename_base = job.filename_base or (safe_filename_base(job.title, job.video_id) if job.title and job.video_id else None)
+            if self.pipelined:
+                info = fetch_raw_media(job.url, job.download_type, job.download_path, filename_base, job_progress_hook)
+                job.status = "processing"
+                job.activity = "Queued"
+                # Blocks while the queue is full, which throttles the download stage to the CPU stage
+                while not self.cancel_event.is_set():
+                    try:
+                        self._transcode_queue.put((job, info), timeout=0.2)
+                        handed_off = True
+                        break
+                    except queue.Full:
+                        continue
+                if not handed_off:
+                    job.status = "cancelled"
+            else:
+                job.filepath = fetch_media(job.url, job.download_type, job.download_path, filename_base, job_progress_hook)
+                job.status = "done"
+        except yt_dlp.utils.DownloadCancelled:
+            job.status = "cancelled"
         except Exception as e:
-            console.print(f"[bold red]❌ An unexpected error occurred during search:[/bold red] {e}")
-            return []
+            job.status = "failed"
+            job.error = str(e).split('\n')[-1]
         finally:
-            progress_bar.update(search_task, completed=True)
+            if not handed_off:
+                self._finish_job(job)
+        return job
 
-    if search_results and 'entries' in search_results:
-        for entry in search_results.get('entries', []):
-            if entry and entry.get('title') and entry.get('id'):
-                video_id = entry.get('id')
-                video_url = entry.get('url')
-                if not video_url or 'watch?v=' not in str(video_url):
-                    video_url = f"https://www.youtube.com/watch?v={video_id}"
-                videos.append((entry['title'], video_url, video_id))
-    elif search_results and search_results.get('title') and search_results.get('id'):
-        video_id = search_results.get('id')
-        video_url = search_results.get('webpage_url') or f"https://www.youtube.com/watch?v={video_id}"
-        videos.append((search_results['title'], video_url, video_id))
+    def _finish_job(self, job):
+        job.finished = time.monotonic()
+        job.activity = None
+        self._dashboard.finish(job)
 
-    if not videos:
-        console.print(f"[orange3]No videos found for '[italic]{query}[/italic]'. Try a different search term.[/orange3]")
-    return videos
+    def _dispatch_transcodes(self, transcode_pool):
+        """Moves downloaded items from the queue onto the process pool, never more than it has workers."""
+        slots = threading.Semaphore(self.transcode_workers)
+        while True:
+            item = self._transcode_queue.get()
+            if item is None:
+                break
+            job, info = item
+            slots.acquire()
+            if self.cancel_event.is_set():
+                slots.release()
+                job.status = "cancelled"
+                self._finish_job(job)
+                continue
+            job.activity = "Transcoding"
 
+            def on_transcoded(future, job=job, info=info):
+                slots.release()
+                if future.cancelled():
+                    job.status = "cancelled"
+                elif future.exception() is not None:
+                    job.status = "failed"
+                    job.error = str(future.exception()).split('\n')[-1]
+                else:
+                    job.filepath = Path(future.result()) if future.result() else None
+                    job.status = "done"
+                    record_download(info, job.download_type, job.filepath)
+                self._finish_job(job)
 
-def send_mpv_command(pipe_path, command):
-    """Sends a command to the running MPV process via its named pipe."""
-    try:
-        # Construct the JSON command based on the input string
-        if command == "cycle pause":
-            cmd_json = {"command": ["cycle", "pause"]}
-        elif command == "stop":
-            cmd_json = {"command": ["stop"]}
+            try:
+                transcode_pool.submit(postprocess_media, info, job.download_type).add_done_callback(on_transcoded)
+            except RuntimeError:
+                slots.release()
+                job.status = "cancelled"
+                self._finish_job(job)
+
+    def run_single(self, job):
+        """Runs one job on the calling thread without drawing anything, for callers that show its
+        progress themselves (AsyncEngine's background downloads). cancel() works as in run()."""
+        self.jobs = [job]
+        self._dashboard = DownloadDashboard(job.name, workers=1)
+        return self._run_job(job)
+
+    def run(self, jobs):
+        """Runs all jobs and returns them with their final status.
+
+        `jobs` may be a lazy iterator, such as an expanding playlist: it is pulled only a couple of
+        jobs ahead of the workers, so the first downloads start while the rest is still being listed.
+        Jobs that arrive with a status other than "pending" (a search that found nothing) are only
+        counted.
+        """
+        self.jobs = []
+        self.cancel_event.clear()
+        self._dashboard = DownloadDashboard("Batch", workers=self.workers)
+        self._dashboard.listing_done = False
+        with self._dashboard:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download")
+            transcode_pool = dispatcher = None
+            if self.pipelined:
+                self._transcode_queue = queue.Queue(maxsize=self.queue_size)
+                transcode_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.transcode_workers)
+                dispatcher = threading.Thread(target=self._dispatch_transcodes, args=(transcode_pool,),
+                                              name="transcode-dispatcher", daemon=True)
+                dispatcher.start()
+            job_iter = iter(jobs)
+            try:
+                in_flight = set()
+                while True:
+                    while not self._dashboard.listing_done and len(in_flight) < 2 * self.workers and not self.cancel_event.is_set():
+                        job = next(job_iter, None)
+                        if job is None:
+                            self._dashboard.listing_done = True
+                            break
+                        self.jobs.append(job)
+                        self._dashboard.listed = len(self.jobs)
+                        if job.status != "pending":
+                            self._dashboard.finish(job)
+                            continue
+                        in_flight.add(executor.submit(self._run_job, job))
+                    if not in_flight:
+                        break
+                    done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                if dispatcher is not None:
+                    self._transcode_queue.put(None)
+                    dispatcher.join()
+                    transcode_pool.shutdown(wait=True)
+            except KeyboardInterrupt:
+                console.print("\n[yellow]⏹️ Cancelling batch download...[/yellow]")
+                self.cancel()
+            finally:
+                if hasattr(job_iter, 'close'):
+                    job_iter.close()  # stops a playlist listing that was cut short
+                executor.shutdown(wait=True, cancel_futures=True)
+                if dispatcher is not None and dispatcher.is_alive():
+                    self._transcode_queue.put(None)
+                    dispatcher.join(timeout=5)
+                if transcode_pool is not None:
+                    transcode_pool.shutdown(wait=True, cancel_futures=True)
+        for job in self.jobs:
+            if job.status in ("pending", "downloading", "processing"):
+                job.status = "cancelled"
+        return self.jobs
+
+    def print_summary(self):
+        table = rich_table.Table(title="Batch Download Summary", header_style="bold magenta", border_style="dim blue")
+        table.add_column("Status")
+        table.add_column("Item", style="cyan", overflow="fold")
+        table.add_column("Size", justify="right")
+        table.add_column("Time", justify="right")
+        table.add_column("Saved to / Error", overflow="fold")
+        listed_jobs = self.jobs
+        if len(self.jobs) > BATCH_SUMMARY_MAX_ROWS:
+            listed_jobs = [job for job in self.jobs if job.status not in ("done", "skipped")]
+            table.caption = f"{len(self.jobs) - len(listed_jobs)} downloaded or already present item(s) not listed"
+        for job in listed_jobs:
+            style = {"done": "green", "skipped": "blue", "failed": "red"}.get(job.status, "yellow")
+            size = f"{job.downloaded_bytes / 1048576:.1f} MiB" if job.downloaded_bytes else "-"
+            table.add_row(f"[{style}]{job.status}[/{style}]", job.name, size, f"{job.elapsed:.1f}s",
+                          str(job.filepath or "") if job.status in ("done", "skipped") else (job.error or ""))
+        console.print(table)
+        counts = {status: sum(1 for job in self.jobs if job.status == status) for status in ("done", "skipped", "failed", "cancelled")}
+        total_bytes = sum(job.downloaded_bytes for job in self.jobs)
+        started = [job.started for job in self.jobs if job.started]
+        finished = [job.finished for job in self.jobs if job.finished]
+        wall_time = (max(finished) - min(started)) if started and finished else 0.0
+        throughput = f", {total_bytes / 1048576 / wall_time:.2f} MiB/s" if wall_time > 0 else ""
+        console.print(f"[bold]{counts['done']} done[/bold], [blue]{counts['skipped']} already downloaded[/blue], [red]{counts['failed']} failed[/red], [yellow]{counts['cancelled']} cancelled[/yellow] "
+                      f"— {total_bytes / 1048576:.1f} MiB in {wall_time:.1f}s{throughput}")
+
+
+def iter_download_jobs(items, download_type, download_path, whole_lists=False):
+    """Turns video URLs, playlist/channel URLs and search terms (first result) into DownloadJobs.
+    Lazy: a playlist is listed page by page as DownloadManager pulls jobs, never all at once.
+    A `watch?v=...&list=...` URL is just its video unless whole_lists is set."""
+    for item in items:
+        if is_collection_url(item, watch_lists=whole_lists):
+            for title, url, video_id in iter_collection_entries(item):
+                yield DownloadJob(url, download_type, download_path, title=title, video_id=video_id)
+        elif "://" in item:
+            yield DownloadJob(item, download_type, download_path)
         else:
-            return False
+            # Run to the end (it stops after one result) so the YoutubeDL goes back to the pool and the result is cached
+            results = list(iter_search_youtube(item, 1))
+            if not results:
+                job = DownloadJob(item, download_type, download_path)
+                job.status, job.error = "failed", "no search results"
+                yield job
+                continue
+            title, url, video_id = results[0]
+            yield DownloadJob(url, download_type, download_path, title=title, video_id=video_id)
 
-        # Convert the Python dictionary to a JSON string and add a newline
-        cmd_string = json.dumps(cmd_json) + '\n'
 
-        with open(pipe_path, 'w') as pipe:
-            pipe.write(cmd_string)
-    except FileNotFoundError:
-        return False
-    except Exception as e:
-        print(f"Error sending command: {e}")
-        return False
-    return True
+def pending_download_jobs():
+    """DownloadJobs for the downloads an earlier run started but never finished, set up to reuse
+    their file names so the partial files and chunk journals are picked up where they stopped."""
+    return [DownloadJob(url, download_format, path, title=filename_base, video_id=video_id, filename_base=filename_base)
+            for url, download_format, path, filename_base, video_id in download_archive.pending()]
 
 
-def play_song_with_mpv(video_url, title=""):
-    console.rule(f"[bold green]🎵 Now Streaming: [cyan]{title}[/cyan] 🎵[/bold green]", style="green")
-    console.print(Align.center(f"[italic grey70](Player is now active in the background.)[/italic grey70]"))
+def read_url_file(file_path):
+    """Reads one URL per line, skipping blanks and '#' comments."""
+    with open(file_path, encoding='utf-8') as url_file:
+        return [line.strip() for line in url_file if line.strip() and not line.lstrip().startswith('#')]
 
-    pipe_name = f"mpv_socket_{uuid.uuid4().hex}"
-    # Use the correct Windows named pipe format or a standard path for other OSes
-    if os.name == 'nt':
-        ipc_pipe_path = f"\\\\.\\pipe\\{pipe_name}"
-    else:
-        ipc_pipe_path = os.path.join(tempfile.gettempdir(), pipe_name)
-    
-    mpv_command = [
-        "mpv",
-        "--no-video",
-        "--really-quiet",
-        "--force-media-title=" + title.replace('"', ''),
-        "--ytdl",
-        "--ytdl-format=bestaudio",
-        f"--input-ipc-server={ipc_pipe_path}",
-        video_url
-    ]
-
-    mpv_process = None
-    try:
-        mpv_process = subprocess.Popen(mpv_command, stderr=subprocess.DEVNULL)
-        
-        time.sleep(1)
 
-        while mpv_process.poll() is None:
-            console.print("\n[bold]Player Controls:[/bold] [yellow]P[/yellow]ause/Play | [yellow]S[/yellow]top | [yellow]Q[/yellow]uit App")
-            choice = Prompt.ask("\n[bold yellow]Enter command[/bold yellow]", choices=["p", "s", "q"], show_choices=False, default="q")
-            
-            if choice == "p":
-                if send_mpv_command(ipc_pipe_path, "cycle pause"):
-                    console.print("[green]▶️ Toggled playback.[/green]")
-                else:
-                    console.print("[red]❌ Player process terminated prematurely.[/red]")
-                    break
-            elif choice == "s":
-                if send_mpv_command(ipc_pipe_path, "stop"):
-                    console.print("[yellow]⏹️ Stopping playback...[/yellow]")
-                else:
-                    console.print("[red]❌ Player process terminated prematurely.[/red]")
-                break
-            elif choice == "q":
-                console.print("[red]🛑 Exiting app...[/red]")
-                break
-                
-    except FileNotFoundError:
-        console.print("[bold red]❌ MPV or yt-dlp not found. Please ensure they are installed and in your system's PATH.[/bold red]")
-        time.sleep(3)
-    finally:
-        if mpv_process and mpv_process.poll() is None:
-            mpv_process.terminate()
-            try:
-                mpv_process.wait(timeout=3)
-                console.print("[green]MPV terminated gracefully.[/green]")
-            except subprocess.TimeoutExpired:
-                console.print("[orange3]MPV did not terminate gracefully, forcing kill...[/orange3]")
-                mpv_process.kill()
-                mpv_process.wait()
-                console.print("[green]MPV killed.[/green]")
-        
-        if os.name == 'posix' and os.path.exists(ipc_pipe_path):
-            os.remove(ipc_pipe_path)
-            
-        if mpv_process and mpv_process.returncode not in [0, -9, -15, 130]:
-            console.print(f"[yellow]MPV exited with code: {mpv_process.returncode}[/yellow]")
-        console.print("\n[green]Returning to menu...[/green]")
-        time.sleep(1)
+# --- Async Engine ---
+class EngineTask:
+    """A named operation on the AsyncEngine, as listed in the Background Tasks view."""
 
-def download_media(video_url, video_title, video_id, download_type='audio', download_path=DOWNLOAD_PATH):
-    console.print(f"\n[cyan]Preparing to download {download_type}:[/cyan] [italic]{video_title}[/italic]")
+    def __init__(self, kind, name, future, job=None):
+        self.kind = kind
+        self.name = name
+        self.future = future
+        self.job = job
+        self.started = time.monotonic()
 
-    safe_title = "".join(c if c.isalnum() or c in " .-_()" else "_" for c in video_title)
-    safe_title = safe_title[:100]
-    filename_base = f"{safe_title}_{video_id}"
+    @property
+    def running(self):
+        return not self.future.done()
 
-    progress_hook_active = False
-    download_progress = Progress(
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(), DownloadColumn(), TransferSpeedColumn(), TimeRemainingColumn(),
-        SpinnerColumn(spinner_name="line", finished_text="✅"),
-        console=console, transient=False
-    )
+    @property
+    def status(self):
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.done():
+            error = self.future.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                return "timed out"
+            return "failed" if error else (self.job.status if self.job else "done")
+        return self.job.status if self.job and self.job.status != "pending" else "running"
 
-    def ydl_progress_hook(d):
-        nonlocal progress_hook_active
-        if not download_progress.tasks: return
-        task_id = download_progress.tasks[0].id
 
-        if not progress_hook_active and d['status'] in ['downloading', 'finished']:
-            if download_progress.tasks[task_id].completed == 0:
-                 download_progress.start_task(task_id)
-            progress_hook_active = True
+class AsyncEngine:
+    """An asyncio event loop on a background thread that runs the app's network work side by side.
 
-        if d['status'] == 'downloading':
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            downloaded_bytes = d.get('downloaded_bytes', 0)
-            filename_from_hook = d.get('filename') or d.get('info_dict', {}).get('_filename')
-            display_name = Path(filename_from_hook).name if filename_from_hook else "file"
-            if total_bytes:
-                download_progress.update(task_id, total=total_bytes, completed=downloaded_bytes, description=f"Downloading [cyan]{display_name}[/cyan]")
-            else:
-                download_progress.update(task_id, description=f"Downloading [cyan]{display_name}[/cyan] (size unknown)")
-        elif d['status'] == 'finished':
-            final_filename = d.get('filename') or d.get('info_dict', {}).get('_filename')
-            display_name = Path(final_filename).name if final_filename else filename_base
-            total = download_progress.tasks[0].total or downloaded_bytes
-            download_progress.update(task_id, completed=total, total=total, description=f"[green]Finished [cyan]{display_name}[/cyan]")
-        elif d['status'] == 'error':
-            download_progress.update(task_id, description=f"[red]Error during {d.get('fragment_index', 'download') if d.get('fragment_count') else 'download'}[/red]")
+    mpv's IPC connection lives on the loop (MpvIpcClient), so player commands are native
+    coroutines. yt-dlp and the caches are blocking, so searches, resolves and downloads run on the
+    loop's executor (ENGINE_WORKERS threads) and are awaited there with a timeout. Cancelling a
+    task stops the wait at once; a download also stops transferring at its next progress callback,
+    and a search or resolve already inside yt-dlp finishes in the background with its result dropped.
 
-    ydl_opts_base = {
-        'progress_hooks': [ydl_progress_hook], 'noplaylist': True, 'noprogress': True,
-        'quiet': True, 'outtmpl': str(download_path / f'{filename_base}.%(ext)s'),
-        'ignoreerrors': True, 'verbose': False, 'no_warnings': True,
-    }
+    The menu thread never runs yt-dlp itself: it submits work and waits on a future or a queue of
+    results, so Ctrl+C there cancels just that operation, and a download running here never keeps
+    it from searching.
+    """
 
-    if download_type == 'audio':
-        ydl_opts = {**ydl_opts_base, 'format': 'bestaudio/best',
-                    'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'},
-                                     {'key': 'EmbedThumbnail', 'already_have_thumbnail': False}]}
-    elif download_type == 'video':
-        ydl_opts = {**ydl_opts_base, 'format': 'bestvideo+bestaudio/best',
-                    'postprocessors': [{'key': 'FFmpegVideoConvertor', 'preferedformat': 'mp4'},
-                                     {'key': 'EmbedThumbnail', 'already_have_thumbnail': False}]}
-    else:
-        console.print("[red]Invalid download type specified.[/red]"); return
+    def __init__(self, workers=ENGINE_WORKERS):
+        self.workers = workers
+        self.tasks = []  # EngineTasks submitted with a name, for the Background Tasks view
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._managers = set()  # DownloadManagers of downloads in flight, so shutdown can stop them
+        self._lock = threading.Lock()
 
-    with download_progress:
-        task = download_progress.add_task(f"Preparing {download_type} download of '{video_title[:30]}...' ", total=1)
-        download_progress.stop_task(task)
-        final_filepath_guess = None
-        try:
-            expected_ext = 'mp3' if download_type == 'audio' else 'mp4'
-            final_filepath_guess = download_path / f'{filename_base}.{expected_ext}'
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-            actual_files = list(download_path.glob(f"{filename_base}.*"))
-            if actual_files: final_filepath_guess = actual_files[0]
-            if progress_hook_active and not download_progress.tasks[task].finished:
-                 download_progress.update(task, completed=download_progress.tasks[task].total or 1,
-                                         description=f"[green]Completed: {Path(final_filepath_guess).name if final_filepath_guess else filename_base}[/green]")
-            console.print(f"\n[bold green]✅ Download complete![/bold green] Saved to: [italic underline]{final_filepath_guess or download_path}[/italic underline]")
-        except yt_dlp.utils.DownloadError as e:
-            error_msg = str(e).split('\n')[-1]
-            console.print(f"\n[bold red]❌ Download Error:[/bold red] {error_msg}")
-            if not progress_hook_active or not download_progress.tasks[task].finished :
-                 download_progress.update(task, description="[red]Download failed[/red]", completed=download_progress.tasks[task].total or 1)
-        except Exception as e:
-            console.print(f"\n[bold red]❌ An unexpected error occurred during download:[/bold red] {e}")
-            if not progress_hook_active or not download_progress.tasks[task].finished :
-                download_progress.update(task, description="[red]Download failed unexpectedly[/red]", completed=download_progress.tasks[task].total or 1)
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="engine")
+                self._loop.set_default_executor(self._executor)
+                self._thread = threading.Thread(target=self._loop.run_forever, name="async-engine", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coroutine, name=None, kind="task", job=None):
+        """Schedules a coroutine on the loop from any other thread. Returns a concurrent.futures.Future
+        whose cancel() cancels the task. Named tasks are kept in self.tasks."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        if name:
+            with self._lock:
+                self.tasks.append(EngineTask(kind, name, future, job))
+        return future
+
+    def run(self, coroutine):
+        """Runs a coroutine on the loop and waits for its result. Ctrl+C cancels it and is re-raised."""
+        if self._thread is threading.current_thread():
+            coroutine.close()
+            raise RuntimeError("engine.run() called on the engine's own loop; await the coroutine instead")
+        future = self.submit(coroutine)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+
+    def stream(self, iterable, timeout=ENGINE_SEARCH_TIMEOUT, poll_interval=0.2):
+        """Pulls a blocking iterator (a search's results) on the engine and yields its items on the
+        calling thread as they arrive. The caller only waits on a queue, so Ctrl+C there, or closing
+        this generator, cancels the pull at once. Gives up after timeout seconds in all."""
+        items = queue.Queue()
+        finished = object()
+        future = self.submit(self._pull(iter(iterable), items, finished, timeout))
+        try:
+            while True:
+                try:
+                    item = items.get(timeout=poll_interval)  # a timeout keeps Ctrl+C responsive on Windows
+                except queue.Empty:
+                    continue
+                if item is finished:
+                    break
+                yield item
+            future.result()
+        except asyncio.TimeoutError:
+            console.print("[red]❌ The search timed out.[/red]")
         finally:
-            if download_progress.tasks and not download_progress.tasks[task].finished:
-                download_progress.update(task, completed=download_progress.tasks[task].total or 1)
-            console.print(Panel(f"Find your downloads in: {download_path}", title="[b]Download Location[/b]", border_style="blue", expand=False))
-    time.sleep(2)
+            future.cancel()
+
+    def running_tasks(self):
+        return [task for task in self.tasks if task.running]
+
+    # -- operations (coroutines, run on the loop) --
+    async def call(self, function, *args, timeout=None, **kwargs):
+        """Runs a blocking function on the executor, giving up after timeout seconds."""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(None, lambda: function(*args, **kwargs)), timeout)
+
+    async def _pull(self, iterator, items, finished, timeout):
+        """Feeds items with next(iterator), one executor step at a time. A step still inside yt-dlp
+        when the pull is cancelled or times out is left to finish; the iterator is closed after it."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        step = None
+        try:
+            while True:
+                step = self._executor.submit(next, iterator, finished)
+                item = await asyncio.wait_for(asyncio.wrap_future(step), deadline - asyncio.get_running_loop().time())
+                if item is finished:
+                    return
+                items.put(item)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                if step is None or step.done():
+                    close()
+                else:
+                    step.add_done_callback(lambda _step: close())
+            items.put(finished)
+
+    async def download(self, job, timeout=None):
+        """Runs one DownloadJob the way DownloadManager does (archive check, naming, pending journal)."""
+        manager = DownloadManager(workers=1)
+        with self._lock:
+            self._managers.add(manager)
+        try:
+            return await self.call(manager.run_single, job, timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            manager.cancel()
+            raise
+        finally:
+            with self._lock:
+                self._managers.discard(manager)
+
+    async def player_command(self, *args, timeout=MPV_IPC_TIMEOUT):
+        """Sends an mpv command over the player's IPC connection. Like MpvPlayer.command(), returns
+        the reply's data, True for a command without data, or False if mpv isn't running or the
+        command failed."""
+        if not player.is_running():
+            return False
+        try:
+            result = await player.ipc.command_async(*args, timeout=timeout)
+        except MpvIpcError:
+            return False
+        return True if result is None else result
+
+    async def _cancel_all(self, timeout):
+        """Cancels every other task on the loop and gives them up to timeout seconds to unwind."""
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+            self.tasks = []
+            managers = list(self._managers)
+        if loop is None:
+            return
+        # Downloads are told to stop first: their task's cancel handler only runs once the loop
+        # gets to it, and the transfer itself is on an executor thread the loop can't interrupt.
+        for manager in managers:
+            manager.cancel()
+        with contextlib.suppress(Exception):
+            asyncio.run_coroutine_threadsafe(self._cancel_all(timeout=2), loop).result(timeout=3)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=2)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+engine = AsyncEngine()
 
 
 # --- UI Functions ---
@@ -274,65 +3353,216 @@ def display_main_menu():
         Text.assemble(
             ("1.", "bold cyan"), " Search and Stream Song\n",
             ("2.", "bold green"), " Search and Download Media\n",
-            ("3.", "bold yellow"), " Settings (View Download Path)\n",
+            ("3.", "bold magenta"), " Batch Download (URLs from a file)\n",
+            ("4.", "bold yellow"), " Settings (View Download Path)\n",
+            ("5.", "bold blue"), f" Background Tasks ({len(engine.running_tasks())} running)\n",
             ("0.", "bold red"),  " Exit"
         ), title="[b]Main Menu[/b]", border_style="bright_blue", padding=(1, 2), expand=False)
     console.print(Align.center(menu_panel))
-    choice = Prompt.ask(Text("\nEnter your choice", style="bold yellow"), choices=["1", "2", "3", "0"], show_choices=False)
+    choice = Prompt.ask(Text("\nEnter your choice", style="bold yellow"), choices=["1", "2", "3", "4", "5", "0"], show_choices=False)
     return choice
 
-def select_media_from_results(results, action_verb="process"):
-    if not results:
-        console.print("[red]No results to select from.[/red]"); time.sleep(1); return None
-    table = Table(title=f"Search Results - Select media to {action_verb}",
+def format_duration(seconds):
+    return format_eta(seconds) if seconds else ""
+
+
+def format_views(count):
+    for divisor, suffix in ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")):
+        if count >= divisor:
+            return f"{count / divisor:.1f}".rstrip("0").rstrip(".") + suffix
+    return str(count)
+
+
+class MetadataCell:
+    """Results table cell that reads its value from metadata_enricher each time it is drawn,
+    so a table on a Live view fills in as details arrive."""
+
+    def __init__(self, video_id, field, formatter=str):
+        self.video_id = video_id
+        self.field = field
+        self.formatter = formatter
+
+    def __rich__(self):
+        metadata = metadata_enricher.get(self.video_id)
+        value = metadata.get(self.field) if metadata else None
+        if value is None:
+            return Text("…" if metadata_enricher.is_pending(self.video_id) else "", style="grey50")
+        return Text(self.formatter(value))
+
+
+def build_results_table(action_verb):
+    table = rich_table.Table(title=f"Search Results - Select media to {action_verb}",
                   header_style="bold magenta", show_lines=True, border_style="dim blue", min_width=60)
     table.add_column("No.", justify="right", style="bold yellow", width=5)
     table.add_column("Title", style="cyan", overflow="fold")
-    for i, (title, _url, _id) in enumerate(results, start=1): table.add_row(str(i), title)
+    table.add_column("Channel", style="magenta", max_width=20, no_wrap=True, overflow="ellipsis")
+    table.add_column("Length", justify="right", width=8)
+    table.add_column("Views", justify="right", style="grey70", width=6)
+    table.add_column("Source", style="green", width=8)
+    return table
+
+def add_result_row(table, number, result):
+    title, url, video_id = result
+    metadata_enricher.request(result)
+    table.add_row(str(number), title, MetadataCell(video_id, 'channel'), MetadataCell(video_id, 'duration', format_duration),
+                  MetadataCell(video_id, 'view_count', format_views), "💾 Local" if is_local_media(url) else "YouTube")
+
+def details_pending(results):
+    return any(metadata_enricher.is_pending(video_id) for _title, _url, video_id in results)
+
+def set_details_caption(table, results):
+    # The prompt never waits for details; what arrives later is shown when the page is drawn again
+    table.caption = "[italic grey50]Some details are still loading: enter r to show them.[/italic grey50]" if details_pending(results) else None
+
+def collect_results_live(result_iter, action_verb="process"):
+    """Draws the results table while results are still arriving; returns the collected list.
+    Details fetched in the background fill in the table's columns as they arrive."""
+    results = []
+    table = build_results_table(action_verb)
+    table.caption = "[italic grey50]Searching...[/italic grey50]"
+    with rich_live.Live(table, console=console, refresh_per_second=12, transient=False):
+        for result in result_iter:
+            results.append(result)
+            add_result_row(table, len(results), result)
+        set_details_caption(table, results)
+    return results
+
+def show_results_table(results, first_number, action_verb="process"):
+    table = build_results_table(action_verb)
+    for number, result in enumerate(results, start=first_number): add_result_row(table, number, result)
+    set_details_caption(table, results)
     console.print(table)
-    console.print(f"[italic grey50]Found {len(results)} result(s).[/italic grey50]")
-    try:
-        song_choice_prompt = Text.assemble(
-            Text(f"Enter number to {action_verb} (or ", style="bold green"),
-            Text("0", style="bold yellow"), Text(" to return): ", style="bold green"))
+
+def select_media_from_results(results, action_verb="process", pager=None):
+    """Shows results and asks for a choice. With a SearchPager, 'n'/'p' page through further results;
+    numbering continues across pages, and the next page is prefetched while this one is on screen."""
+    if not isinstance(results, list):
+        results = collect_results_live(results, action_verb)
+        table_shown = True
+    else:
+        results = list(results)
+        table_shown = False
+    if not results:
+        console.print("[red]No results to select from.[/red]"); time.sleep(1); return None
+    if not table_shown:
+        show_results_table(results, 1, action_verb)
+    # Each shown page is a slice of `results`; pager page k holds search results k*page_size onwards
+    page_bounds = [(0, len(results))]
+    page_index = 0
+    seen_ids = {result[2] for result in results}
+    if pager:
+        pager.prefetch(1)
+    selection_started = time.perf_counter()
+    while True:
+        start, end = page_bounds[page_index]
+        console.print(f"[italic grey50]Showing result(s) {start + 1}-{end} of {len(results)} loaded.[/italic grey50]")
         valid_choices = ["0"] + [str(i) for i in range(1, len(results) + 1)]
-        choice_num = IntPrompt.ask(song_choice_prompt, choices=valid_choices, show_choices=False)
+        nav_text = []
+        if pager and (page_index + 1 < len(page_bounds) or pager.has_page(len(page_bounds))):
+            valid_choices.append("n"); nav_text.append(("n", "bold yellow")); nav_text.append(" next page, ")
+        if page_index > 0:
+            valid_choices.append("p"); nav_text.append(("p", "bold yellow")); nav_text.append(" previous page, ")
+        if details_pending(results[start:end]):
+            valid_choices.append("r"); nav_text.append(("r", "bold yellow")); nav_text.append(" refresh details, ")
+        try:
+            song_choice_prompt = Text.assemble(
+                Text(f"Enter number to {action_verb} (", style="bold green"), *nav_text,
+                Text("0", style="bold yellow"), Text(" to return): ", style="bold green"))
+            choice = Prompt.ask(song_choice_prompt, choices=valid_choices, show_choices=False).strip().lower()
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Selection cancelled.[/yellow]"); time.sleep(1); return None
+        except Exception as e:
+            console.print(f"\n[red]Error during selection: {e}[/red]"); time.sleep(1); return None
+
+        if choice == "r":
+            show_results_table(results[start:end], start + 1, action_verb)
+            continue
+        if choice in ("n", "p"):
+            if choice == "p":
+                page_index -= 1
+            elif page_index + 1 < len(page_bounds):
+                page_index += 1
+            else:
+                try:
+                    with console.status("[bold green]Loading more results..."):
+                        page = engine.run(engine.call(pager.page, len(page_bounds), timeout=ENGINE_SEARCH_TIMEOUT))
+                except (KeyboardInterrupt, asyncio.TimeoutError) as e:
+                    console.print("[yellow]Stopped loading more results.[/yellow]" if isinstance(e, KeyboardInterrupt)
+                                  else "[red]❌ Timed out loading more results.[/red]")
+                    continue
+                new_results = [result for result in page if result[2] not in seen_ids]
+                if not new_results:
+                    console.print("[orange3]No more results.[/orange3]"); continue
+                seen_ids.update(result[2] for result in new_results)
+                page_bounds.append((len(results), len(results) + len(new_results)))
+                results.extend(new_results)
+                page_index += 1
+                pager.prefetch(len(page_bounds))
+            start, end = page_bounds[page_index]
+            show_results_table(results[start:end], start + 1, action_verb)
+            continue
+        choice_num = int(choice)
+        tracer.record_selection((time.perf_counter() - selection_started) * 1000)
         if choice_num == 0: return None
         return results[choice_num - 1]
-    except KeyboardInterrupt:
-        console.print("\n[yellow]Selection cancelled.[/yellow]"); time.sleep(1); return None
-    except Exception as e:
-        console.print(f"\n[red]Error during selection: {e}[/red]"); time.sleep(1); return None
 
 def handle_search_and_stream():
     console.clear(); display_header()
     console.print(Panel(Text("🎵 Search and Stream 🎵", justify="center", style="bold blue_violet"), border_style="blue_violet", expand=False))
     query = Prompt.ask("\n[bold yellow]Enter song name or YouTube URL to stream[/bold yellow]")
     if not query.strip(): console.print("[orange3]Search query cannot be empty.[/orange3]"); time.sleep(2); return
-    results = search_youtube(query)
-    if not results: time.sleep(2); return
-    selected_media = select_media_from_results(results, action_verb="stream")
+    tracer.begin("stream")
+    # A watch URL from inside a playlist plays on its own unless the user asks for the whole list
+    if is_collection_url(query) and Confirm.ask("[cyan]That's a playlist or channel. Play all of it?[/cyan]",
+                                                default=not is_collection_url(query, watch_lists=False)):
+        playback_queue.clear()
+        with console.status("[bold green]Listing playlist..."):
+            playback_queue.add_lazily(iter_collection_entries(query.strip())).wait()
+        if len(playback_queue):
+            run_playback_queue()
+        else:
+            time.sleep(2)
+        return
+    local_results = local_library.search(query)
+    # Local copies are listed first, straight away, and replace their YouTube duplicates as those arrive
+    local_ids = {video_id for _title, _path, video_id in local_results}
+    pager = SearchPager(query)
+    try:
+        results = itertools.chain(local_results, (result for result in engine.stream(pager.iter_first_page()) if result[2] not in local_ids))
+        selected_media = select_media_from_results(results, action_verb="stream", pager=pager)
+    finally:
+        pager.close()
     if selected_media:
-        selected_title, selected_url, _ = selected_media
+        selected_title, selected_url, selected_id = selected_media
         console.print(f"\n[bold blue]▶️ Selected for streaming:[/bold blue] [italic]{selected_title}[/italic]")
-        play_song_with_mpv(selected_url, selected_title)
+        play_song_with_mpv(selected_url, selected_title, selected_id)
 
 def handle_search_and_download():
     console.clear(); display_header()
     console.print(Panel(Text("💾 Search and Download 💾", justify="center", style="bold dark_green"), border_style="dark_green", expand=False))
     query = Prompt.ask("\n[bold yellow]Enter song/video name or YouTube URL to download[/bold yellow]")
     if not query.strip(): console.print("[orange3]Search query cannot be empty.[/orange3]"); time.sleep(2); return
-    results = search_youtube(query)
-    if not results: time.sleep(2); return
-    selected_media = select_media_from_results(results, action_verb="download")
-    if selected_media:
-        selected_title, selected_url, selected_id = selected_media
-        console.print(f"\n[bold green]🔽 Selected for download:[/bold green] [italic]{selected_title}[/italic]")
+    whole_collection = is_collection_url(query) and Confirm.ask("[cyan]That's a playlist or channel. Download every video in it?[/cyan]",
+                                                                default=not is_collection_url(query, watch_lists=False))
+    selected_media = None
+    if whole_collection:
+        console.print(f"\n[bold green]🔽 Selected for download:[/bold green] every video in [italic]{query.strip()}[/italic]")
+    else:
+        pager = SearchPager(query)
+        try:
+            selected_media = select_media_from_results(engine.stream(pager.iter_first_page()), action_verb="download", pager=pager)
+        finally:
+            pager.close()
+    if selected_media or whole_collection:
+        if selected_media:
+            selected_title, selected_url, selected_id = selected_media
+            console.print(f"\n[bold green]🔽 Selected for download:[/bold green] [italic]{selected_title}[/italic]")
         console.print("\nChoose download type:")
         download_type_choice = Prompt.ask(
-            Text.assemble("  (", ("A", "bold cyan"), ")udio (MP3) or (", ("V", "bold magenta"), ")ideo (MP4)? "),
-            choices=["a", "v"], default="a").lower()
-        download_type = 'audio' if download_type_choice == 'a' else 'video'
+            Text.assemble("  (", ("A", "bold cyan"), ")udio (MP3), (", ("N", "bold green"), ")ative audio (Opus/M4A, no re-encode) or (",
+                          ("V", "bold magenta"), ")ideo (MP4)? "),
+            choices=["a", "n", "v"], default="a").lower()
+        download_type = {'a': 'audio', 'n': 'native', 'v': 'video'}[download_type_choice]
         custom_path_str = Prompt.ask(
             f"[cyan]Enter download path or press Enter for default[/cyan] ([italic yellow]{DOWNLOAD_PATH}[/italic yellow])")
         current_download_path = Path(custom_path_str).expanduser() if custom_path_str.strip() else DOWNLOAD_PATH
@@ -340,26 +3570,137 @@ def handle_search_and_download():
         except OSError as e:
             console.print(f"[red]Error creating path {current_download_path}: {e}. Using default: {DOWNLOAD_PATH}[/red]")
             current_download_path = DOWNLOAD_PATH
-        download_media(selected_url, selected_title, selected_id, download_type, current_download_path)
+        if whole_collection:
+            manager = DownloadManager()
+            manager.run(iter_download_jobs([query.strip()], download_type, current_download_path, whole_lists=True))
+            manager.print_summary()
+            Prompt.ask(Text("\nPress Enter to return to the main menu...", style="dim"))
+        elif Confirm.ask("[cyan]Download in the background and go back to the menu?[/cyan]", default=True):
+            job = DownloadJob(selected_url, download_type, current_download_path, title=selected_title, video_id=selected_id,
+                              filename_base=safe_filename_base(selected_title, selected_id))
+            engine.submit(engine.download(job), name=selected_title, kind=download_type, job=job)
+            console.print("[green]⏬ Downloading in the background.[/green] [dim]Follow it under Background Tasks.[/dim]")
+            time.sleep(1)
+        else:
+            download_media(selected_url, selected_title, selected_id, download_type, current_download_path)
+
+def handle_background_tasks():
+    """Lists what the async engine is running or has run, and lets the user cancel a running task."""
+    while True:
+        console.clear(); display_header()
+        tasks = list(engine.tasks)
+        if not tasks:
+            console.print("[orange3]No background tasks.[/orange3]"); time.sleep(1.5); return
+        table = rich_table.Table(title="Background Tasks", header_style="bold magenta", border_style="dim blue")
+        table.add_column("No.", justify="right", style="bold yellow")
+        table.add_column("Task", style="cyan", overflow="fold")
+        table.add_column("Type")
+        table.add_column("Status")
+        table.add_column("Progress", justify="right")
+        table.add_column("Time", justify="right")
+        for number, task in enumerate(tasks, start=1):
+            status = task.status
+            style = {"done": "green", "skipped": "blue", "failed": "red", "timed out": "red"}.get(status, "yellow")
+            job = task.job
+            progress = ""
+            if job is not None and job.downloaded_bytes:
+                progress = format_size(job.downloaded_bytes) + (f" / {format_size(job.total_bytes)}" if job.total_bytes else "")
+            elapsed = job.elapsed if job is not None and job.started else time.monotonic() - task.started
+            table.add_row(str(number), task.name, task.kind, f"[{style}]{status}[/{style}]", progress, format_eta(elapsed))
+        console.print(table)
+        running = [str(number) for number, task in enumerate(tasks, start=1) if task.running]
+        if not running:
+            Prompt.ask(Text("\nPress Enter to return to the main menu...", style="dim")); return
+        choice = Prompt.ask("[bold yellow]Enter a number to cancel that task, R to refresh, or Enter to return[/bold yellow]",
+                            choices=running + ["r", ""], show_choices=False, default="", show_default=False).strip().lower()
+        if choice == "":
+            return
+        if choice != "r":
+            tasks[int(choice) - 1].future.cancel()
+            console.print(f"[yellow]⏹️ Cancelled:[/yellow] {tasks[int(choice) - 1].name}"); time.sleep(1)
+
+def handle_batch_download():
+    console.clear(); display_header()
+    console.print(Panel(Text("📦 Batch Download 📦", justify="center", style="bold magenta"), border_style="magenta", expand=False))
+    file_path = Prompt.ask("\n[bold yellow]Enter path to a text file with one YouTube URL per line[/bold yellow]")
+    try:
+        urls = read_url_file(Path(file_path.strip()).expanduser())
+    except OSError as e:
+        console.print(f"[red]Could not read {file_path}: {e}[/red]"); time.sleep(2); return
+    if not urls:
+        console.print("[orange3]No URLs found in that file.[/orange3]"); time.sleep(2); return
+    download_type_choice = Prompt.ask(
+        Text.assemble("  (", ("A", "bold cyan"), ")udio (MP3), (", ("N", "bold green"), ")ative audio (Opus/M4A, no re-encode) or (",
+                      ("V", "bold magenta"), ")ideo (MP4)? "),
+        choices=["a", "n", "v"], default="a").lower()
+    download_type = {'a': 'audio', 'n': 'native', 'v': 'video'}[download_type_choice]
+    workers = IntPrompt.ask("[cyan]Parallel downloads[/cyan]", default=DOWNLOAD_WORKERS)
+    pipelined = Confirm.ask("[cyan]Transcode on all CPU cores while downloading (pipelined)?[/cyan]", default=True)
+    custom_path_str = Prompt.ask(
+        f"[cyan]Enter download path or press Enter for default[/cyan] ([italic yellow]{DOWNLOAD_PATH}[/italic yellow])")
+    current_download_path = Path(custom_path_str).expanduser() if custom_path_str.strip() else DOWNLOAD_PATH
+    try: current_download_path.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        console.print(f"[red]Error creating path {current_download_path}: {e}. Using default: {DOWNLOAD_PATH}[/red]")
+        current_download_path = DOWNLOAD_PATH
+    manager = DownloadManager(workers=workers, pipelined=pipelined)
+    manager.run(iter_download_jobs(urls, download_type, current_download_path))
+    manager.print_summary()
+    Prompt.ask(Text("\nPress Enter to return to the main menu...", style="dim"))
 
 def handle_settings():
     console.clear(); display_header()
+    hits, misses, saved, total_hits, total_misses, total_saved = search_cache.stats()
+    cached_tracks, cached_bytes = audio_cache.stats()
     settings_panel = Panel(
-        Text(f"🛠️ Application Info 🛠️\n\nDefault download path: [yellow link=file://{DOWNLOAD_PATH}]{DOWNLOAD_PATH}[/yellow]\n\n"
+        Text.from_markup(f"🛠️ Application Info 🛠️\n\nDefault download path: [yellow link=file://{DOWNLOAD_PATH}]{DOWNLOAD_PATH}[/yellow]\n"
+             f"Cache path: [yellow]{CACHE_PATH}[/yellow]\n\n"
+             f"Search cache (this session): {hits} hit(s), {misses} miss(es), ~{saved:.1f}s saved\n"
+             f"Search cache (all time): {total_hits} hit(s), {total_misses} miss(es), ~{total_saved:.1f}s saved\n"
+             f"Download archive: {download_archive.count()} file(s) indexed\n"
+             f"Streamed audio cache: {cached_tracks} track(s), {cached_bytes / 1048576:.1f} of {AUDIO_CACHE_MAX_BYTES / 1048576:.0f} MiB\n\n"
              "[italic dim]More settings will be configurable in future versions.[/italic dim]", justify="center"),
         title="[b]Current Settings[/b]", border_style="cyan", padding=(1,2))
     console.print(Align.center(settings_panel))
-    Prompt.ask(Text("\nPress Enter to return to the main menu...", style="dim"))
+    choice = Prompt.ask(Text("\nPress R to rebuild the download archive from the download folder, C to clear the streamed audio cache, "
+                             "or Enter to return to the main menu...", style="dim"),
+                        default="", show_default=False)
+    if choice.strip().lower() == "c":
+        audio_cache.clear()
+        console.print("[green]✅ Streamed audio cache cleared.[/green]"); time.sleep(2)
+    if choice.strip().lower() == "r":
+        with console.status("[bold green]Scanning download folder..."):
+            indexed = download_archive.rebuild(DOWNLOAD_PATH)
+            local_library.rebuild(DOWNLOAD_PATH)
+        console.print(f"[green]✅ Indexed {indexed} file(s).[/green]"); time.sleep(2)
 
 # --- Main Application Loop ---
+def resume_pending_downloads():
+    jobs = pending_download_jobs()
+    if not jobs:
+        return
+    console.clear(); display_header()
+    if not Confirm.ask(f"[yellow]{len(jobs)} download(s) were interrupted last time. Resume them now?[/yellow]", default=True):
+        return
+    manager = DownloadManager()
+    manager.run(jobs)
+    manager.print_summary()
+    Prompt.ask(Text("\nPress Enter to continue to the main menu...", style="dim"))
+
 def app():
     try:
+        resume_pending_downloads()
         while True:
             user_choice = display_main_menu()
             if user_choice == '1': handle_search_and_stream()
             elif user_choice == '2': handle_search_and_download()
-            elif user_choice == '3': handle_settings()
+            elif user_choice == '3': handle_batch_download()
+            elif user_choice == '4': handle_settings()
+            elif user_choice == '5': handle_background_tasks()
             elif user_choice == '0':
+                running = engine.running_tasks()
+                if running and not Confirm.ask(f"[yellow]{len(running)} background task(s) still running. Cancel them and exit?[/yellow]", default=False):
+                    continue
                 console.clear(); display_header()
                 console.print(Align.center(Text("\n👋 Goodbye! Thanks for using the CLI! 👋\n", style="bold bright_magenta")))
                 time.sleep(1.5); console.clear(); break
@@ -372,12 +3713,613 @@ def app():
         console.print_exception(show_locals=False)
         time.sleep(5)
     finally:
+        playback_queue.shutdown()
+        metadata_enricher.shutdown()
+        player.shutdown()  # before the engine: its IPC connection is on the engine's loop
+        engine.shutdown()
+        stream_proxy.close()
+        ydl_pool.close()
         console.print("Exited.", style="dim")
 
-if __name__ == "__main__":
+# --- Headless Command Line ---
+EXIT_OK, EXIT_FAILURE, EXIT_USAGE, EXIT_INTERRUPTED = 0, 1, 2, 130
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="YouTube Music Streamer & Downloader. Run without arguments for the interactive menu.")
+    parser.add_argument("--no-daemon", action="store_true", help="run the command in this process even if a daemon is running")
+    subparsers = parser.add_subparsers(dest="command", metavar="{search,stream,download,daemon,trace-summary}")
+
+    search_parser = subparsers.add_parser("search", help="Search YouTube and print the results")
+    search_parser.add_argument("query", nargs="+", help="search terms or a YouTube URL")
+    search_parser.add_argument("-n", "--max-results", type=int, default=MAX_SEARCH_RESULTS, help="number of results (default: %(default)s)")
+    search_parser.add_argument("--json", action="store_true", help="print results as a JSON array")
+    search_parser.add_argument("--no-cache", action="store_true", help="bypass the search cache")
+    search_parser.add_argument("--details", action="store_true", help="also print duration, channel and view count, fetching them where needed")
+
+    stream_parser = subparsers.add_parser("stream", help="Stream audio without any menus")
+    stream_parser.add_argument("query", nargs="+", help="search terms or a YouTube URL")
+    stream_parser.add_argument("--pick", type=int, default=1, help="play this search result (default: %(default)s)")
+    stream_parser.add_argument("--count", type=int, default=1, help="queue this many results starting at --pick (default: %(default)s)")
+    stream_parser.add_argument("--append", action="store_true", help="add to the daemon's play queue instead of replacing it")
+    stream_parser.add_argument("--playlist", action="store_true", help="for a watch?v=...&list=... URL, queue the whole list, not just that video")
+
+    download_parser = subparsers.add_parser("download", help="Download one or more URLs, playlists, channels or search terms")
+    download_parser.add_argument("items", nargs="*", help="YouTube video, playlist or channel URLs (or search terms: the first result is downloaded)")
+    download_parser.add_argument("-f", "--from-file", help="read URLs from this file, one per line ('-' for stdin)")
+    download_parser.add_argument("-t", "--type", choices=DOWNLOAD_TYPES, default="audio",
+                                 help="audio = MP3, native = best audio in its original codec (no re-encode), video = MP4 (default: %(default)s)")
+    download_parser.add_argument("-o", "--output", type=Path, default=DOWNLOAD_PATH, help="download folder (default: %(default)s)")
+    download_parser.add_argument("-w", "--workers", type=int, default=DOWNLOAD_WORKERS, help="parallel downloads (default: %(default)s)")
+    download_parser.add_argument("--pipelined", action="store_true", help="transcode on a process pool while downloading")
+    download_parser.add_argument("--resume", action="store_true", help="also resume downloads an earlier run left unfinished")
+    download_parser.add_argument("--playlist", action="store_true", help="for a watch?v=...&list=... URL, download the whole list, not just that video")
+
+    daemon_parser = subparsers.add_parser("daemon", help="Run or control the background daemon that keeps extractors, caches, mpv and downloads warm")
+    daemon_parser.add_argument("action", nargs="?", choices=("run", "start", "stop", "status"), default="run",
+                               help="run in the foreground, start in the background, stop, or print status as JSON (default: %(default)s)")
+    daemon_parser.add_argument("--socket", type=Path, default=DAEMON_SOCKET_PATH, help="Unix socket path (default: %(default)s)")
+
+    trace_parser = subparsers.add_parser("trace-summary", help="Print p50/p95/p99 latency per stage from recorded traces")
+    trace_parser.add_argument("--file", type=Path, default=TRACE_PATH, help="trace file (default: %(default)s)")
+    return parser
+
+
+def search_records(query, max_results=MAX_SEARCH_RESULTS, use_cache=True, details=False):
+    """Search results as JSON-ready dicts (title, url, id), plus duration, channel and view_count with details."""
+    results = list(iter_search_youtube(query, max_results, use_cache=use_cache))
+    if details:
+        for result in results:
+            metadata_enricher.request(result)
+        metadata_enricher.wait([video_id for _title, _url, video_id in results])
+    records = []
+    for title, url, video_id in results:
+        record = {"title": title, "url": url, "id": video_id}
+        if details:
+            metadata = metadata_enricher.get(video_id) or {}
+            record.update((field, metadata.get(field)) for field in MetadataCache.FIELDS)
+        records.append(record)
+    return records
+
+
+def print_search_records(records, as_json=False):
+    if as_json:
+        print(json.dumps(records, ensure_ascii=False))
+        return
+    for record in records:
+        extra = "".join(f"\t{record[field] or ''}" for field in MetadataCache.FIELDS if field in record)
+        print(f"{record['id']}\t{record['title']}\t{record['url']}{extra}")
+
+
+def cli_search(args):
+    records = search_records(" ".join(args.query), args.max_results, use_cache=not args.no_cache, details=args.details)
+    print_search_records(records, args.json)
+    return EXIT_OK if records else EXIT_FAILURE
+
+
+def queue_for_streaming(query, pick=1, count=1, append=False, whole_lists=False):
+    """Puts what `query` names on playback_queue: a playlist/channel URL (listed lazily), a single
+    video URL, or `count` search results starting at the `pick`-th. Without append the queue is
+    cleared first. A `watch?v=...&list=...` URL is just its video unless whole_lists is set.
+    Returns the queue index of the first track added, or None if nothing was found."""
+    video_id = video_id_from_url(query) if "://" in query else None
+    if is_collection_url(query, watch_lists=whole_lists):
+        tracks = None  # queued lazily below, while the playlist is still being listed
+    elif video_id:
+        tracks = [(query, query, video_id)]
+    else:
+        results = list(iter_search_youtube(query, max(MAX_SEARCH_RESULTS, pick + count - 1)))
+        tracks = results[max(pick, 1) - 1:max(pick, 1) - 1 + max(count, 1)]
+    if not append:
+        playback_queue.clear()
+    first_index = len(playback_queue)
+    if tracks is None:
+        playback_queue.add_lazily(iter_collection_entries(query)).wait()
+    elif tracks:
+        playback_queue.add(tracks)
+    return first_index if len(playback_queue) > first_index else None
+
+
+def cli_stream(args):
+    if args.append:
+        # A queue in this process starts out empty, so there would be nothing to append to
+        console.print("[red]--append adds to the daemon's play queue: start one with `daemon start` (and leave out --no-daemon).[/red]")
+        return EXIT_USAGE
+    query = " ".join(args.query)
+    tracer.begin("headless-stream")
+    try:
+        if queue_for_streaming(query, args.pick, args.count, whole_lists=args.playlist) is None:
+            console.print(f"[red]Nothing to stream for '{query}'.[/red]")
+            return EXIT_FAILURE
+        console.print(f"[green]🎵 Streaming:[/green] {playback_queue.tracks[0]['title']}")
+        if not playback_queue.play(0):
+            console.print("[red]❌ Could not start playback.[/red]")
+            return EXIT_FAILURE
+        # finished is set when mpv goes idle after playing the queue, not by the idle state it starts in
+        while player.is_running() and not playback_queue.finished.wait(timeout=0.5):
+            pass
+    except FileNotFoundError:
+        console.print("[bold red]❌ MPV or yt-dlp not found. Please ensure they are installed and in your system's PATH.[/bold red]")
+        return EXIT_FAILURE
+    return EXIT_OK if player.is_running() else EXIT_FAILURE
+
+
+def download_items_from_args(args):
+    """The download command's items plus those read from --from-file; None if the file can't be read."""
+    items = list(args.items)
+    if args.from_file:
+        try:
+            if args.from_file == "-":
+                items += [line.strip() for line in sys.stdin if line.strip() and not line.lstrip().startswith('#')]
+            else:
+                items += read_url_file(Path(args.from_file).expanduser())
+        except OSError as e:
+            console.print(f"[red]Could not read {args.from_file}: {e}[/red]")
+            return None
+    return items
+
+
+def cli_download(args):
+    items = download_items_from_args(args)
+    if items is None:
+        return EXIT_USAGE
+    jobs = pending_download_jobs() if args.resume else []
+    if not items and not jobs:
+        if args.resume:
+            console.print("[green]No interrupted downloads to resume.[/green]")
+            return EXIT_OK
+        console.print("[red]Nothing to download: pass URLs or --from-file.[/red]")
+        return EXIT_USAGE
+    download_path = args.output.expanduser()
+    download_path.mkdir(parents=True, exist_ok=True)
+    manager = DownloadManager(workers=args.workers, pipelined=args.pipelined)
+    jobs = manager.run(itertools.chain(jobs, iter_download_jobs(items, args.type, download_path, args.playlist)))
+    manager.print_summary()
+    if any(job.status == "cancelled" for job in jobs):
+        return EXIT_INTERRUPTED
+    return EXIT_FAILURE if any(job.status == "failed" for job in jobs) else EXIT_OK
+
+
+def cli_trace_summary(args):
+    # The summary is this command's result, so it goes to stdout
+    return EXIT_OK if print_trace_summary(args.file, output_console=Console()) else EXIT_FAILURE
+
+
+# --- Daemon ---
+class DaemonError(Exception):
+    """An error reply from the daemon, or a daemon that can't be reached."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def daemon_supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+class DaemonClient:
+    """Client side of the daemon's JSON-RPC 2.0 socket: one JSON object per line each way.
+
+    Connecting takes a couple of milliseconds, so the CLI tries the daemon first and only falls
+    back to doing the work itself when nothing answers within DAEMON_CONNECT_TIMEOUT.
+    """
+
+    def __init__(self, path=DAEMON_SOCKET_PATH, timeout=DAEMON_CONNECT_TIMEOUT):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+        self._ids = itertools.count(1)
+
+    def connect(self):
+        """Raises DaemonError if no daemon is listening on the socket."""
+        if not daemon_supported() or not self.path.exists():
+            raise DaemonError("daemon is not running")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.path))
+        except OSError as e:
+            sock.close()
+            raise DaemonError(f"daemon is not running ({e})") from e
+        # Calls such as a cold search legitimately take seconds; only the connect is bounded
+        sock.settimeout(None)
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        return self
+
+    def call(self, method, **params):
+        request_id = next(self._ids)
+        request = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        try:
+            self.sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            line = self.reader.readline()
+        except OSError as e:
+            raise DaemonError(f"lost connection to the daemon ({e})") from e
+        if not line:
+            raise DaemonError("the daemon closed the connection")
+        response = json.loads(line)
+        if response.get("error"):
+            raise DaemonError(response["error"].get("message", "daemon error"), response["error"].get("code"))
+        return response.get("result")
+
+    def close(self):
+        if self.reader:
+            self.reader.close()
+        if self.sock:
+            self.sock.close()
+        self.sock = self.reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def connect_daemon(path=DAEMON_SOCKET_PATH):
+    """Returns a connected DaemonClient, or None if no daemon is running."""
+    try:
+        return DaemonClient(path).connect()
+    except DaemonError:
+        return None
+
+
+def job_record(job):
+    return {"name": job.name, "url": job.url, "status": job.status, "downloaded_bytes": job.downloaded_bytes,
+            "total_bytes": job.total_bytes, "filepath": str(job.filepath) if job.filepath else None,
+            "error": job.error, "elapsed": round(job.elapsed, 3)}
+
+
+class MusicDaemon:
+    """Resident process that owns the warm extractor pool, the caches, mpv with its play queue and
+    a download queue, and serves them to any number of CLI clients over a Unix socket.
+
+    The protocol is JSON-RPC 2.0 with one request or response per line. Each rpc_<name> method is
+    callable as <name>, with its keyword arguments as the request's params object. Every client
+    connection gets a thread of its own, so a long download or search never holds up another
+    terminal's `status`. Downloads from all clients run on one DownloadManager, fed as batches
+    through a queue; a client gets a batch id back and polls `downloads` for its jobs.
+    """
+
+    FINAL_STATUSES = ("done", "skipped", "failed", "cancelled")
+
+    def __init__(self, path=DAEMON_SOCKET_PATH):
+        self.path = Path(path)
+        self.started = time.time()
+        self.requests = 0
+        self.stopped = threading.Event()
+        self.downloads = DownloadManager()
+        self._batches = {}  # batch id -> {'jobs': [DownloadJob], 'listed': bool}
+        self._batch_ids = itertools.count(1)
+        self._download_queue = queue.Queue()
+        self._download_thread = None
+        self._play_lock = threading.Lock()
+        self._server = None
+
+    # -- server --
+    def _start_server(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = daemon.dispatch(line)
+                    try:
+                        self.wfile.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                    except OSError:
+                        return
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        self._server = Server(str(self.path), Handler)
+        os.chmod(self.path, 0o600)
+
+    def serve_forever(self):
+        """Binds the socket and serves until `shutdown` is called. Raises DaemonError if another
+        daemon already answers on the socket."""
+        if not daemon_supported():
+            raise DaemonError("the daemon needs Unix domain sockets, which this platform lacks")
+        if self.path.exists():
+            client = connect_daemon(self.path)
+            if client is not None:
+                client.close()
+                raise DaemonError(f"a daemon is already running on {self.path}")
+            self.path.unlink()  # left behind by a daemon that didn't exit cleanly
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._start_server()
+        self._download_thread = threading.Thread(target=self._run_downloads, name="daemon-downloads", daemon=True)
+        self._download_thread.start()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.rpc_shutdown())
+        console.print(f"[green]Daemon {os.getpid()} listening on {self.path}[/green]")
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._server.server_close()
+            with contextlib.suppress(OSError):
+                self.path.unlink()
+            self.downloads.cancel()
+            self._download_queue.put(None)
+            self._download_thread.join(timeout=5)
+            console.print("[yellow]Daemon stopped.[/yellow]")
+
+    def dispatch(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            name = request["method"]
+            params = request.get("params") or {}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return self._error(request_id, -32700, "parse error")
+        method = getattr(self, f"rpc_{name}", None) if isinstance(name, str) and name.isidentifier() else None
+        if method is None:
+            return self._error(request_id, -32601, f"unknown method: {name}")
+        try:
+            inspect.signature(method).bind(**params)
+        except TypeError as e:
+            return self._error(request_id, -32602, f"invalid params for {name}: {e}")
+        self.requests += 1
+        try:
+            result = method(**params)
+        except Exception as e:
+            return self._error(request_id, -32000, str(e).split('\n')[-1] or type(e).__name__)
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    @staticmethod
+    def _error(request_id, code, message):
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+    def _run_downloads(self):
+        # One long-running batch: the job iterator blocks on the queue between client requests
+        batches = iter(self._download_queue.get, None)
+        self.downloads.run(itertools.chain.from_iterable(batches))
+
+    def _batch_jobs(self, batch, jobs):
+        try:
+            for job in jobs:
+                batch['jobs'].append(job)
+                yield job
+        except Exception as e:
+            # Must not escape: it would end the download thread for every client
+            console.print(f"[red]Listing a download batch failed: {e}[/red]")
+        finally:
+            batch['listed'] = True
+
+    # -- methods --
+    def rpc_ping(self):
+        return {"pid": os.getpid()}
+
+    def rpc_status(self):
+        current = playback_queue.current()
+        statuses = collections.Counter(job.status for job in self.downloads.jobs)
+        hits, misses, saved_seconds = search_cache.stats()[:3]
+        return {
+            "pid": os.getpid(), "socket": str(self.path), "uptime": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "player": {"running": player.is_running(), "track": current['title'] if current else None,
+                       "queued": len(playback_queue), "status": player.status_line() if player.is_running() else ""},
+            "downloads": dict(statuses),
+            "search_cache": {"hits": hits, "misses": misses, "saved_seconds": round(saved_seconds, 1)},
+        }
+
+    def rpc_search(self, query, max_results=MAX_SEARCH_RESULTS, use_cache=True, details=False):
+        return search_records(query, max_results, use_cache, details)
+
+    def rpc_play(self, query, pick=1, count=1, append=False, playlist=False):
+        """Queues what `query` names (see queue_for_streaming). Playback starts unless the tracks were
+        appended while something is already playing."""
+        tracer.begin("daemon-stream")
+        with self._play_lock:
+            busy = append and player.is_running() and not player.ipc.properties.get("idle-active", True)
+            first_index = queue_for_streaming(query, pick, count, append=append, whole_lists=playlist)
+            if first_index is None:
+                raise ValueError(f"nothing to stream for '{query}'")
+            title = playback_queue.tracks[first_index]['title']
+            if not busy and not playback_queue.play(first_index):
+                raise RuntimeError("could not start playback")
+        return {"title": title, "queued": len(playback_queue) - first_index, "started": not busy}
+
+    def rpc_queue(self):
+        index = playback_queue.current_index
+        return {"current": index, "tracks": [track['title'] for track in playback_queue.tracks],
+                "status": player.status_line() if player.is_running() else ""}
+
+    def rpc_next(self):
+        return bool(playback_queue.next())
+
+    def rpc_pause(self):
+        return bool(player.command("cycle", "pause"))
+
+    def rpc_stop(self):
+        playback_queue.clear()
+        return bool(player.command("stop"))
+
+    def rpc_download(self, items=(), download_type='audio', output=str(DOWNLOAD_PATH), resume=False, playlist=False):
+        """Queues a batch of URLs, playlists, channels or search terms; returns its batch id."""
+        if download_type not in DOWNLOAD_TYPES:
+            raise ValueError(f"unknown download type: {download_type}")
+        download_path = Path(output).expanduser()
+        download_path.mkdir(parents=True, exist_ok=True)
+        jobs = itertools.chain(pending_download_jobs() if resume else [], iter_download_jobs(list(items), download_type, download_path, playlist))
+        batch_id = next(self._batch_ids)
+        batch = self._batches[batch_id] = {'jobs': [], 'listed': False}
+        self._download_queue.put(self._batch_jobs(batch, jobs))
+        return {"batch": batch_id}
+
+    def rpc_downloads(self, batch=None):
+        """Progress of one batch, or of every batch this daemon has run."""
+        if batch is not None and batch not in self._batches:
+            raise ValueError(f"unknown download batch: {batch}")
+        selected = {batch: self._batches[batch]} if batch is not None else dict(self._batches)
+        return {str(batch_id): {"listed": entry['listed'],
+                                "finished": entry['listed'] and all(job.status in self.FINAL_STATUSES for job in entry['jobs']),
+                                "jobs": [job_record(job) for job in entry['jobs']]}
+                for batch_id, entry in selected.items()}
+
+    def rpc_shutdown(self):
+        self.stopped.set()
+        # serve_forever() can't be stopped from one of its own request threads without deadlocking
+        threading.Thread(target=self._server.shutdown, name="daemon-shutdown", daemon=True).start()
+        return True
+
+
+def start_daemon_process(path=DAEMON_SOCKET_PATH):
+    """Starts `daemon run` detached from this terminal and waits until it answers; returns its pid."""
+    DAEMON_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(DAEMON_LOG_PATH, "ab") as log_file:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "daemon", "run", "--socket", str(path)],
+                                   stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, start_new_session=True)
+    deadline = time.monotonic() + DAEMON_STARTUP_TIMEOUT
+    while time.monotonic() < deadline and process.poll() is None:
+        client = connect_daemon(path)
+        if client is not None:
+            with client:
+                return client.call("ping")["pid"]
+        time.sleep(0.05)
+    raise DaemonError(f"the daemon did not come up; see {DAEMON_LOG_PATH}")
+
+
+def cli_daemon(args):
+    if args.action == "run":
+        try:
+            MusicDaemon(args.socket).serve_forever()
+        except DaemonError as e:
+            console.print(f"[red]{e}[/red]")
+            return EXIT_FAILURE
+        return EXIT_OK
+    client = connect_daemon(args.socket)
+    if args.action == "start":
+        if client is not None:
+            client.close()
+            console.print(f"[yellow]A daemon is already running on {args.socket}.[/yellow]")
+            return EXIT_OK
+        try:
+            console.print(f"[green]Daemon {start_daemon_process(args.socket)} started.[/green]")
+        except DaemonError as e:
+            console.print(f"[red]{e}[/red]")
+            return EXIT_FAILURE
+        return EXIT_OK
+    if client is None:
+        console.print("[orange3]No daemon is running.[/orange3]")
+        return EXIT_FAILURE if args.action == "status" else EXIT_OK
+    with client:
+        if args.action == "stop":
+            client.call("shutdown")
+            console.print("[green]Daemon stopped.[/green]")
+        else:
+            print(json.dumps(client.call("status"), indent=2, ensure_ascii=False))
+    return EXIT_OK
+
+
+def remote_search(client, args):
+    records = client.call("search", query=" ".join(args.query), max_results=args.max_results,
+                          use_cache=not args.no_cache, details=args.details)
+    print_search_records(records, args.json)
+    return EXIT_OK if records else EXIT_FAILURE
+
+
+def remote_stream(client, args):
+    reply = client.call("play", query=" ".join(args.query), pick=args.pick, count=args.count, append=args.append,
+                        playlist=args.playlist)
+    verb = "Streaming" if reply['started'] else "Queued"
+    console.print(f"[green]🎵 {verb}:[/green] {reply['title']}" + (f" (+{reply['queued'] - 1} more)" if reply['queued'] > 1 else ""))
+    return EXIT_OK
+
+
+def remote_download(client, args):
+    items = download_items_from_args(args)
+    if items is None:
+        return EXIT_USAGE
+    if not items and not args.resume:
+        console.print("[red]Nothing to download: pass URLs or --from-file.[/red]")
+        return EXIT_USAGE
+    # Relative paths mean the client's working directory, not the daemon's
+    batch = client.call("download", items=items, download_type=args.type,
+                        output=str(args.output.expanduser().resolve()), resume=args.resume, playlist=args.playlist)["batch"]
+    try:
+        with console.status("[bold green]Waiting for the daemon...") as status:
+            while True:
+                progress = client.call("downloads", batch=batch)[str(batch)]
+                finished = sum(1 for record in progress['jobs'] if record['status'] in MusicDaemon.FINAL_STATUSES)
+                size = format_size(sum(record['downloaded_bytes'] for record in progress['jobs']))
+                status.update(f"[bold green]Daemon batch {batch}: {finished} of {len(progress['jobs'])}"
+                              f"{'' if progress['listed'] else '+'} finished, {size}")
+                if progress['finished']:
+                    break
+                time.sleep(DAEMON_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]Stopped watching; batch {batch} keeps downloading in the daemon.[/yellow]")
+        return EXIT_INTERRUPTED
+    # Rebuilt as DownloadJobs so the summary looks the same as a local run's
+    manager = DownloadManager()
+    for record in progress['jobs']:
+        job = DownloadJob(record['url'], args.type, args.output, title=record['name'])
+        job.status, job.error, job.downloaded_bytes = record['status'], record['error'], record['downloaded_bytes']
+        job.filepath = Path(record['filepath']) if record['filepath'] else None
+        job.finished = time.monotonic()
+        job.started = job.finished - record['elapsed']
+        manager.jobs.append(job)
+    manager.print_summary()
+    if any(job.status == "cancelled" for job in manager.jobs):
+        return EXIT_INTERRUPTED
+    return EXIT_FAILURE if any(job.status == "failed" for job in manager.jobs) else EXIT_OK
+
+
+def run_headless(argv):
+    """Runs one subcommand with no menus, screen clearing or pauses, and returns a process exit code."""
+    global console
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return EXIT_USAGE
+    # Keep stdout for results (e.g. `search --json | jq`); progress and messages go to stderr
+    console = Console(stderr=True)
+    handlers = {"search": cli_search, "stream": cli_stream, "download": cli_download, "daemon": cli_daemon,
+                "trace-summary": cli_trace_summary}
+    remote_handlers = {"search": remote_search, "stream": remote_stream, "download": remote_download}
+    try:
+        client = None if args.no_daemon or args.command not in remote_handlers else connect_daemon()
+        if client is not None:
+            with client:
+                try:
+                    return remote_handlers[args.command](client, args)
+                except DaemonError as e:
+                    console.print(f"[red]Daemon: {e}[/red]")
+                    return EXIT_FAILURE
+        return handlers[args.command](args)
+    except KeyboardInterrupt:
+        console.print("[yellow]Interrupted.[/yellow]")
+        return EXIT_INTERRUPTED
+    finally:
+        playback_queue.shutdown()
+        metadata_enricher.shutdown()
+        player.shutdown()  # before the engine: its IPC connection is on the engine's loop
+        engine.shutdown()
+        stream_proxy.close()
+        ydl_pool.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_headless(argv)
     if not Path(DOWNLOAD_PATH).exists():
         try:
             Path(DOWNLOAD_PATH).mkdir(parents=True, exist_ok=True)
         except Exception as e:
             console.print(f"[red]Could not create default download directory {DOWNLOAD_PATH}: {e}[/red]")
-    app()
\ No newline at end of file
+    app()
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
 import yt_dlp
 import subprocess
+import re
+import time
+from urllib.parse import urlparse, parse_qs
 
 def search_youtube(query, max_results=5):
     """Search YouTube and return a list of video titles and URLs."""
@@ -21,10 +24,32 @@ def search_youtube(query, max_results=5):
     videos = search_results.get('entries', [])
     return [(video['title'], video['url']) for video in videos if video]
 
+AUDIO_FORMAT = 'bestaudio/best'
+STREAM_URL_EXPIRY_MARGIN = 5 * 60  # stop reusing a stream URL this many seconds before it expires
+VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+stream_urls = {}  # (video id, format) -> (stream URL, expiry time)
+
+
+def stream_url_expiry(stream_url):
+    """When googlevideo stops serving the URL: its `expire` query parameter, or the /expire/<time>/
+    path segment of manifest URLs. Unknown expiries are given 30 minutes."""
+    parsed = urlparse(stream_url)
+    expire = parse_qs(parsed.query).get('expire', [None])[0]
+    if expire is None:
+        match = re.search(r"/expire/(\d+)", parsed.path)
+        expire = match.group(1) if match else None
+    return float(expire) if expire and expire.isdigit() else time.time() + 30 * 60
+
+
 def get_audio_url(video_url):
-    """Extract the best audio URL using yt-dlp."""
+    """Extract the best audio URL using yt-dlp. A URL already found for the same video is reused
+    until shortly before it expires, whichever form of the video's link was given."""
+    match = VIDEO_ID_RE.search(video_url)
+    cached = stream_urls.get((match.group(1), AUDIO_FORMAT)) if match else None
+    if cached and cached[1] - STREAM_URL_EXPIRY_MARGIN > time.time():
+        return cached[0]
     ydl_opts = {
-        'format': 'bestaudio/best',  # Extract only audio
+        'format': AUDIO_FORMAT,  # Extract only audio
         'quiet': True,
         'noplaylist': True
     }
@@ -32,10 +57,13 @@ def get_audio_url(video_url):
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
             info = ydl.extract_info(video_url, download=False)
-            return info['url']  # Return direct audio stream URL
+            audio_url = info['url']  # Direct audio stream URL
         except Exception as e:
             print(f"❌ Error extracting audio URL: {e}")
             return None
+    if info.get('id'):
+        stream_urls[(info['id'], AUDIO_FORMAT)] = (audio_url, stream_url_expiry(audio_url))
+    return audio_url
 
 def play_song(audio_url):
     """Play the song using MPV."""